@@ -1 +1 @@
-# TimeTracker Backend Package
\ No newline at end of file
+# TimeTracker Backend Package
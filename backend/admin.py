@@ -0,0 +1,13 @@
+import hmac
+from typing import Optional
+
+from fastapi import Header, HTTPException, Request
+
+
+async def require_admin(request: Request, x_admin_token: Optional[str] = Header(None)):
+    """Allow the request only if X-Admin-Token matches ADMIN_TOKEN"""
+    admin_token = request.app.state.settings.admin_token
+    if not admin_token:
+        raise HTTPException(status_code=403, detail="Admin API is disabled")
+    if not x_admin_token or not hmac.compare_digest(x_admin_token, admin_token):
+        raise HTTPException(status_code=401, detail="Invalid admin token")
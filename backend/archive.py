@@ -0,0 +1,208 @@
+"""Hot/cold archival of time entries.
+
+Entries dated before a cutoff whose invoice has been paid can no longer
+change, so they move from time_entries into one collection per year
+(time_entries_archive_2023, ...). The archive_catalog document records which
+years exist and the cutoff below which archives may hold entries; readers use
+it to query an archive only when a requested date range reaches into it.
+"""
+import asyncio
+import logging
+import time
+from datetime import date, timedelta
+
+from pymongo import ASCENDING, DESCENDING, IndexModel
+from pymongo.errors import BulkWriteError
+
+from .storage import date_filter, from_storage, id_match, id_values
+
+ARCHIVE_PREFIX = "time_entries_archive_"
+CATALOG_ID = "time_entries"
+# Readers re-read the catalog at most this often
+CATALOG_CACHE_SECONDS = 60
+# Widest date range, in calendar years, a listing may read from the archives
+MAX_LISTED_ARCHIVE_YEARS = 5
+
+ARCHIVE_INDEXES = [
+    IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+    IndexModel([("project_id", ASCENDING), ("date", DESCENDING)], name="project_id_date"),
+    IndexModel([("date", DESCENDING)], name="date"),
+    IndexModel([("client_id", ASCENDING)], name="client_id"),
+]
+
+_catalog_cache = {"value": None, "loaded_at": 0.0}
+
+
+class ArchiveRangeError(ValueError):
+    """A listing would have to read too many archive years"""
+
+
+def archive_collection_name(year: int) -> str:
+    return f"{ARCHIVE_PREFIX}{year}"
+
+
+async def load_catalog(db, max_age: float = CATALOG_CACHE_SECONDS):
+    """The archive catalog ({"archived_before": "YYYY-MM-DD", "years": [...]}), cached briefly"""
+    if _catalog_cache["value"] is None or time.monotonic() - _catalog_cache["loaded_at"] > max_age:
+        catalog = await db.archive_catalog.find_one({"_id": CATALOG_ID})
+        _catalog_cache["value"] = catalog or {"archived_before": None, "years": []}
+        _catalog_cache["loaded_at"] = time.monotonic()
+    return _catalog_cache["value"]
+
+
+def archive_years(catalog, start_date=None, end_date=None):
+    """Archive years a YYYY-MM-DD date range (inclusive, open ended if None) needs to read"""
+    archived_before = catalog.get("archived_before")
+    if not archived_before or (start_date and start_date >= archived_before):
+        return []
+    first = int(start_date[:4]) if start_date else None
+    last = int(end_date[:4]) if end_date else None
+    return [
+        year for year in sorted(catalog.get("years", []))
+        if (first is None or year >= first) and (last is None or year <= last)
+    ]
+
+
+async def find_entries(hot, archive_db, catalog, query, fields, start_date=None, end_date=None, limit=1000):
+    """Time entries matching query within a date range, from the hot collection plus needed archives.
+
+    A range with a start or an end date reads the archive years it reaches,
+    at most MAX_LISTED_ARCHIVE_YEARS of them (an open start counts from the
+    earliest archive year it reaches); without any date the listing covers
+    the hot collection only. archive_db should be the database hot is read
+    from, so entries being archived are never missing from both.
+    """
+    if start_date or end_date:
+        in_range = date_filter("date", start_date, end_date)
+        query = {"$and": [query, in_range]} if query else in_range
+    years = archive_years(catalog, start_date, end_date) if start_date or end_date else []
+    if years:
+        first_year = int(start_date[:4]) if start_date else years[0]
+        last_year = int(end_date[:4]) if end_date else date.today().year
+        if last_year - first_year + 1 > MAX_LISTED_ARCHIVE_YEARS:
+            raise ArchiveRangeError(
+                f"Date ranges reaching into archived entries may span at most {MAX_LISTED_ARCHIVE_YEARS} years"
+            )
+    sources = [hot] + [archive_db[archive_collection_name(year)] for year in years]
+    results = await asyncio.gather(*(source.find(query, fields).to_list(limit) for source in sources))
+    return [doc for docs in results for doc in docs][:limit]
+
+
+async def find_archived_entry(archive_db, catalog, entry_id):
+    """Look an entry up by id in the archives, newest year first"""
+    for year in sorted(catalog.get("years", []), reverse=True):
+        entry = await archive_db[archive_collection_name(year)].find_one({"id": id_match(entry_id)})
+        if entry:
+            return entry
+    return None
+
+
+async def delete_archived_entries(db, catalog, query):
+    """Delete archived entries matching query from every archive year; returns the count"""
+    deleted = 0
+    for year in catalog.get("years", []):
+        result = await db[archive_collection_name(year)].delete_many(query)
+        deleted += result.deleted_count
+    return deleted
+
+
+async def _paid_entry_ids(db, entry_ids):
+    """The subset of entry_ids referenced by a paid invoice"""
+    paid = set()
+    cursor = db.invoices.find(
+        {"status": "paid", "time_entries": {"$in": entry_ids}}, {"_id": 0, "time_entries": 1}
+    )
+    async for invoice in cursor:
+        paid.update(from_storage(invoice)["time_entries"])
+    return paid
+
+
+async def _copy_to_archive(collection, docs):
+    try:
+        await collection.insert_many(docs, ordered=False)
+    except BulkWriteError as e:
+        # A previous, interrupted run may have copied some of these already
+        if any(error["code"] != 11000 for error in e.details["writeErrors"]):
+            raise
+
+
+async def _earliest_year(db, candidates):
+    # Legacy string dates and BSON dates sort separately, so look at both
+    years = []
+    for bson_type in ("string", "date"):
+        doc = await db.time_entries.find_one(
+            {"$and": [candidates, {"date": {"$type": bson_type}}]}, {"_id": 0, "date": 1}, sort=[("date", 1)]
+        )
+        if doc:
+            years.append(int(from_storage(doc)["date"][:4]))
+    return min(years) if years else None
+
+
+async def _publish_catalog(db, cutoff_str, years):
+    """Announce the archive years and cutoff before moving anything, so readers never miss an entry"""
+    catalog = await db.archive_catalog.find_one({"_id": CATALOG_ID}) or {}
+    known = set(catalog.get("years", []))
+    if set(years) <= known and (catalog.get("archived_before") or "") >= cutoff_str:
+        return
+    update = {"$addToSet": {"years": {"$each": list(years)}}}
+    if (catalog.get("archived_before") or "") < cutoff_str:
+        update["$set"] = {"archived_before": cutoff_str}
+    await db.archive_catalog.update_one({"_id": CATALOG_ID}, update, upsert=True)
+    _catalog_cache["value"] = None
+    # Other workers cache the catalog; wait until they have all seen the new one
+    logging.info(f"Archive catalog updated, waiting {CATALOG_CACHE_SECONDS}s for readers to pick it up")
+    await asyncio.sleep(CATALOG_CACHE_SECONDS)
+
+
+async def archive_entries(db, cutoff: date, batch_size: int = 500, pause: float = 0.0, dry_run: bool = False,
+                          progress=None):
+    """Move entries dated before cutoff that belong to paid invoices into yearly archives.
+
+    Each batch is copied before it is deleted from the hot collection, so an
+    interrupted run loses nothing and can simply be started again.
+    Returns {year: archived count}.
+    """
+    cutoff_str = cutoff.isoformat()
+    candidates = date_filter("date", end=(cutoff - timedelta(days=1)).isoformat())
+    archived = {}
+    prepared = set()
+    last_id = None
+
+    first_year = await _earliest_year(db, candidates)
+    if first_year is None:
+        return archived
+    if not dry_run:
+        await _publish_catalog(db, cutoff_str, range(first_year, cutoff.year + 1))
+
+    while True:
+        query = {"$and": [candidates, {"_id": {"$gt": last_id}}]} if last_id is not None else candidates
+        docs = await db.time_entries.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+        last_id = docs[-1]["_id"]
+
+        entries = [from_storage(doc) for doc in docs]
+        paid = await _paid_entry_ids(db, [value for entry in entries for value in id_values(entry["id"])])
+        by_year = {}
+        for doc, entry in zip(docs, entries):
+            if entry["id"] in paid:
+                by_year.setdefault(int(entry["date"][:4]), []).append(doc)
+
+        for year, year_docs in by_year.items():
+            archived[year] = archived.get(year, 0) + len(year_docs)
+            if dry_run:
+                continue
+            collection = db[archive_collection_name(year)]
+            if year not in prepared:
+                await collection.create_indexes(ARCHIVE_INDEXES)
+                prepared.add(year)
+            await _copy_to_archive(collection, year_docs)
+            await db.time_entries.delete_many({"_id": {"$in": [doc["_id"] for doc in year_docs]}})
+
+        if progress:
+            progress(len(docs))
+        if pause:
+            await asyncio.sleep(pause)
+
+    logging.info(f"Archived time entries before {cutoff_str}: {archived}")
+    return archived
@@ -0,0 +1,115 @@
+"""Append-only audit log of changes to time entries and invoices.
+
+Write handlers only compute a diff and put it on an in-process queue, so
+auditing adds no database round trip to them. A background task drains the
+queue and stores the records with batched insert_many calls in audit_log,
+whose TTL index (see indexes.py) removes them after the retention period.
+Records still queued when the process dies are lost; the queue is bounded
+and drops records (counted in metrics) rather than grow without limit.
+"""
+import asyncio
+import logging
+from datetime import datetime
+from enum import Enum
+
+from .metrics import AUDIT_QUEUE_DEPTH, AUDIT_RECORDS
+from .tracing import get_request_id
+
+# Bookkeeping fields that change on every write and say nothing about it
+IGNORED_FIELDS = {"_id", "updated_at"}
+
+
+def _plain(value):
+    """Enums and nested containers as plain BSON-encodable values"""
+    if isinstance(value, Enum):
+        return value.value
+    if isinstance(value, dict):
+        return {key: _plain(item) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_plain(item) for item in value]
+    return value
+
+
+def diff(before, after) -> dict:
+    """{field: {"before": old, "after": new}} for every field that differs"""
+    before, after = before or {}, after or {}
+    changes = {}
+    for field in sorted(set(before) | set(after)):
+        if field in IGNORED_FIELDS:
+            continue
+        old, new = _plain(before.get(field)), _plain(after.get(field))
+        if old != new:
+            changes[field] = {"before": old, "after": new}
+    return changes
+
+
+class AuditLog:
+    def __init__(self, collection, batch_size: int = 200, max_queue: int = 10000):
+        self.collection = collection
+        self.batch_size = batch_size
+        self._queue = asyncio.Queue(maxsize=max_queue)
+        self._task = None
+
+    def configure(self, batch_size: int, max_queue: int):
+        """Set the batch and queue sizes; only before the writer has started"""
+        self.batch_size = batch_size
+        self._queue = asyncio.Queue(maxsize=max_queue)
+
+    def record(self, entity_type: str, action: str, entity_id: str, before=None, after=None):
+        """Queue a create, update or delete; never blocks and never raises"""
+        try:
+            changes = diff(before, after)
+            if action == "update" and not changes:
+                return
+            self._queue.put_nowait({
+                "entity_type": entity_type,
+                "entity_id": entity_id,
+                "action": action,
+                "at": datetime.utcnow(),
+                "request_id": get_request_id(),
+                "changes": changes,
+            })
+            AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+        except asyncio.QueueFull:
+            AUDIT_RECORDS.labels("dropped").inc()
+            logging.warning(f"Audit queue full, dropped {action} of {entity_type} {entity_id}")
+        except Exception as e:
+            AUDIT_RECORDS.labels("dropped").inc()
+            logging.error(f"Error recording audit entry: {e}")
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self, timeout: float = 10.0):
+        """Write what is still queued, then stop the writer"""
+        if self._task is None:
+            return
+        # None tells the writer to finish once everything before it is written
+        await self._queue.put(None)
+        try:
+            await asyncio.wait_for(self._task, timeout)
+        except asyncio.TimeoutError:
+            logging.error(f"Audit writer did not finish within {timeout}s; {self._queue.qsize()} records lost")
+        self._task = None
+
+    async def _run(self):
+        while True:
+            batch = [await self._queue.get()]
+            # Take whatever else is already waiting: busy periods give larger batches
+            while len(batch) < self.batch_size and not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+            AUDIT_QUEUE_DEPTH.set(self._queue.qsize())
+            records = [record for record in batch if record is not None]
+            if records:
+                await self._write(records)
+            if len(records) < len(batch):
+                return
+
+    async def _write(self, records):
+        try:
+            await self.collection.insert_many(records, ordered=False)
+            AUDIT_RECORDS.labels("written").inc(len(records))
+        except Exception as e:
+            AUDIT_RECORDS.labels("dropped").inc(len(records))
+            logging.error(f"Error writing {len(records)} audit records: {e}")
@@ -0,0 +1,290 @@
+"""Full backup and restore as gzip-compressed NDJSON.
+
+A backup is one gzip stream of JSON lines: a header, one line per document
+({"collection": ..., "document": ...} in MongoDB extended JSON), and a final
+manifest with per-collection counts and SHA-256 checksums of the document
+lines plus a checksum over everything before the manifest. Both directions
+stream, so memory use does not grow with the size of the dataset.
+"""
+import asyncio
+import gzip
+import hashlib
+import json
+import logging
+import os
+import tempfile
+import zlib
+from datetime import datetime
+
+from bson import json_util
+from bson.json_util import RELAXED_JSON_OPTIONS
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
+from fastapi.responses import StreamingResponse
+from pymongo import ReplaceOne
+
+from .admin import require_admin
+from .archive import ARCHIVE_PREFIX
+from .database import database
+from .storage import from_storage, id_match, to_storage
+
+BACKUP_FORMAT = "timetracker-backup"
+BACKUP_VERSION = 1
+CORE_COLLECTIONS = ("clients", "projects", "time_entries", "invoices", "active_timers")
+# Compressed output is handed to the client in chunks of about this size
+CHUNK_SIZE = 64 * 1024
+RESTORE_MODES = ("merge", "replace")
+# Document lines start with this; the manifest line does not
+DOCUMENT_PREFIX = b'{"collection"'
+
+# (collection, field, referenced collection) pairs checked after a restore
+REFERENCES = [
+    ("projects", "client_id", "clients"),
+    ("time_entries", "project_id", "projects"),
+    ("invoices", "client_id", "clients"),
+    ("invoices", "project_id", "projects"),
+    ("active_timers", "project_id", "projects"),
+]
+
+
+class BackupError(ValueError):
+    pass
+
+
+# Kept only when they exist: the archive catalog and closed periods with their snapshots
+OPTIONAL_COLLECTIONS = ("archive_catalog", "periods", "period_snapshots")
+
+
+async def backup_collection_names(db):
+    """Core collections plus the time entry archives, their catalog and closed periods"""
+    names = await db.list_collection_names()
+    archives = sorted(name for name in names if name.startswith(ARCHIVE_PREFIX))
+    extra = [name for name in OPTIONAL_COLLECTIONS if name in names]
+    return list(CORE_COLLECTIONS) + archives + extra
+
+
+async def backup_stream(db, batch_size: int = 1000):
+    """Yield a complete backup as gzip-compressed chunks"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 31)  # wbits 31: gzip container
+    overall = hashlib.sha256()
+    pending = []
+    pending_size = 0
+
+    def write(line: str):
+        nonlocal pending_size
+        data = line.encode() + b"\n"
+        overall.update(data)
+        compressed = compressor.compress(data)
+        if compressed:
+            pending.append(compressed)
+            pending_size += len(compressed)
+        return data
+
+    names = await backup_collection_names(db)
+    write(json.dumps({
+        "type": "header",
+        "format": BACKUP_FORMAT,
+        "version": BACKUP_VERSION,
+        "created_at": datetime.utcnow().isoformat(),
+        "collections": names,
+    }))
+
+    collections = {}
+    for name in names:
+        digest = hashlib.sha256()
+        count = 0
+        async for doc in db[name].find().sort("_id", 1).batch_size(batch_size):
+            line = json_util.dumps({"collection": name, "document": doc}, json_options=RELAXED_JSON_OPTIONS)
+            digest.update(write(line))
+            count += 1
+            if pending_size >= CHUNK_SIZE:
+                yield b"".join(pending)
+                pending.clear()
+                pending_size = 0
+        collections[name] = {"count": count, "sha256": digest.hexdigest()}
+
+    manifest = {"type": "manifest", "collections": collections, "sha256": overall.hexdigest()}
+    pending.append(compressor.compress(json.dumps(manifest).encode() + b"\n"))
+    pending.append(compressor.flush())
+    yield b"".join(pending)
+    counts = ", ".join("%s=%d" % (name, info["count"]) for name, info in collections.items())
+    logging.info(f"Backup streamed: {counts}")
+
+
+def _parse_header(line: bytes):
+    try:
+        header = json.loads(line)
+    except ValueError:
+        raise BackupError("Not a TimeTracker backup")
+    if header.get("type") != "header" or header.get("format") != BACKUP_FORMAT:
+        raise BackupError("Not a TimeTracker backup")
+    if header.get("version") != BACKUP_VERSION:
+        raise BackupError(f"Unsupported backup version {header.get('version')}")
+    return header
+
+
+def verify_backup(path: str):
+    """Check the manifest checksums of a backup file; returns the manifest"""
+    overall = hashlib.sha256()
+    digests = {}
+    counts = {}
+    manifest = None
+    try:
+        with gzip.open(path, "rb") as f:
+            header_line = f.readline()
+            header = _parse_header(header_line)
+            overall.update(header_line)
+            for line in f:
+                if not line.startswith(DOCUMENT_PREFIX):
+                    manifest = json.loads(line)
+                    break
+                overall.update(line)
+                name = json.loads(line)["collection"]
+                digests.setdefault(name, hashlib.sha256()).update(line)
+                counts[name] = counts.get(name, 0) + 1
+    except (OSError, EOFError, ValueError, zlib.error) as e:
+        if isinstance(e, BackupError):
+            raise
+        raise BackupError(f"Backup file is damaged: {e}")
+
+    if manifest is None or manifest.get("type") != "manifest":
+        raise BackupError("Backup is incomplete: no manifest")
+    if manifest["sha256"] != overall.hexdigest():
+        raise BackupError("Backup checksum mismatch")
+    for name, expected in manifest["collections"].items():
+        if name not in header["collections"]:
+            raise BackupError(f"Manifest lists unknown collection {name}")
+        if counts.get(name, 0) != expected["count"]:
+            raise BackupError(f"{name}: expected {expected['count']} documents, found {counts.get(name, 0)}")
+        if expected["count"] and digests[name].hexdigest() != expected["sha256"]:
+            raise BackupError(f"{name}: checksum mismatch")
+    return manifest
+
+
+def _read_documents(f, count: int):
+    """Read up to count document lines as (collection, document); stops at the manifest"""
+    documents = []
+    for line in f:
+        if not line.startswith(DOCUMENT_PREFIX):
+            break
+        record = json_util.loads(line, json_options=RELAXED_JSON_OPTIONS)
+        documents.append((record["collection"], record["document"]))
+        if len(documents) >= count:
+            break
+    return documents
+
+
+async def _write_batch(db, name, docs, mode):
+    # Normalise to the current storage format, whatever the backup was written with
+    docs = [from_storage(doc) for doc in docs]
+    if mode == "replace":
+        await db[name].insert_many([to_storage(doc) for doc in docs], ordered=False)
+        return
+    operations = []
+    for doc in docs:
+        if "id" in doc:
+            # Matched by id; an existing document keeps its own _id
+            doc.pop("_id", None)
+            key = {"id": id_match(doc["id"])}
+        else:
+            key = {"_id": doc["_id"]}
+        operations.append(ReplaceOne(key, to_storage(doc), upsert=True))
+    await db[name].bulk_write(operations, ordered=False)
+
+
+async def check_integrity(db):
+    """Count references that point at missing documents"""
+    orphans = []
+    for collection, field, target in REFERENCES:
+        result = await db[collection].aggregate([
+            {"$project": {"_id": 0, "id": 1, field: 1}},
+            {"$lookup": {"from": target, "localField": field, "foreignField": "id", "as": "_ref"}},
+            {"$match": {"_ref": {"$size": 0}}},
+            {"$group": {"_id": None, "count": {"$sum": 1}, "sample": {"$push": "$id"}}},
+            {"$project": {"_id": 0, "count": 1, "sample": {"$slice": ["$sample", 10]}}},
+        ], allowDiskUse=True).to_list(1)
+        if result:
+            orphans.append({
+                "collection": collection,
+                "field": field,
+                "references": target,
+                "count": result[0]["count"],
+                "sample": from_storage({"id": result[0]["sample"]})["id"],
+            })
+    return {"ok": not orphans, "orphans": orphans}
+
+
+async def restore_backup(db, path: str, mode: str = "merge", batch_size: int = 500, progress=None):
+    """Verify and restore a backup file.
+
+    merge upserts every document by id and leaves other documents alone;
+    replace empties the backed-up collections first and inserts in batches.
+    """
+    if mode not in RESTORE_MODES:
+        raise BackupError(f"Unknown restore mode {mode}")
+    manifest = await asyncio.to_thread(verify_backup, path)
+    names = list(manifest["collections"])
+    if mode == "replace":
+        for name in names:
+            await db[name].delete_many({})
+
+    restored = {name: 0 for name in names}
+    with gzip.open(path, "rb") as f:
+        f.readline()
+        while True:
+            documents = await asyncio.to_thread(_read_documents, f, batch_size)
+            if not documents:
+                break
+            by_collection = {}
+            for name, doc in documents:
+                by_collection.setdefault(name, []).append(doc)
+            for name, docs in by_collection.items():
+                await _write_batch(db, name, docs, mode)
+                restored[name] += len(docs)
+            if progress:
+                progress(len(documents))
+            if len(documents) < batch_size:
+                break
+
+    integrity = await check_integrity(db)
+    logging.info(f"Backup restored ({mode}): {restored}, integrity ok: {integrity['ok']}")
+    return {"mode": mode, "restored": restored, "integrity": integrity}
+
+
+backup_router = APIRouter(prefix="/api/admin", dependencies=[Depends(require_admin)])
+
+# One restore at a time; a second one would interleave with the first
+_restore_lock = asyncio.Lock()
+
+
+@backup_router.get("/backup")
+async def download_backup():
+    """Stream a complete gzip-compressed NDJSON backup"""
+    filename = "timetracker-backup-%s.ndjson.gz" % datetime.utcnow().strftime("%Y%m%d-%H%M%S")
+    return StreamingResponse(
+        backup_stream(database.analytics),
+        media_type="application/gzip",
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
+
+
+@backup_router.post("/restore")
+async def upload_restore(request: Request, mode: str = Query("merge", pattern="^(merge|replace)$")):
+    """Restore a backup sent as the raw request body; nothing is written unless all checksums match"""
+    if _restore_lock.locked():
+        raise HTTPException(status_code=409, detail="A restore is already running")
+    async with _restore_lock:
+        # Spool to disk so the checksums can be verified before anything is written
+        fd, path = tempfile.mkstemp(suffix=".ndjson.gz")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                async for chunk in request.stream():
+                    f.write(chunk)
+            return await restore_backup(database.db, path, mode)
+        except BackupError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        except Exception as e:
+            logging.error(f"Error restoring backup: {e}")
+            raise HTTPException(status_code=500, detail="Internal server error")
+        finally:
+            os.unlink(path)
+
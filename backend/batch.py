@@ -0,0 +1,79 @@
+import asyncio
+import json
+import logging
+from urllib.parse import urlsplit
+
+from starlette.exceptions import HTTPException
+
+from .rate_limit import ADMIT_SCOPE_KEY
+
+MAX_BATCH_SIZE = 10
+
+# Parent scope keys a sub-request inherits; everything request specific is rebuilt
+INHERITED_SCOPE_KEYS = ("asgi", "http_version", "scheme", "server", "client", "app", "starlette.exception_handlers")
+
+
+async def dispatch(parent_scope, method: str, path: str):
+    """Run one GET /api sub-request through the router and return (status, body).
+
+    The router is called directly, so the sub-request skips the middleware
+    stack; the enclosing batch request has already been traced and will be
+    compressed as a whole. Each sub-request is still charged to the client's
+    rate limit as if it had been sent on its own.
+    """
+    url = urlsplit(path)
+    full_path = "/api" + url.path
+    scope = {key: parent_scope[key] for key in INHERITED_SCOPE_KEYS if key in parent_scope}
+    scope.update({
+        "type": "http",
+        "method": method,
+        "root_path": "",
+        "path": full_path,
+        "raw_path": full_path.encode(),
+        "query_string": url.query.encode(),
+        "headers": [(b"accept", b"application/json")],
+    })
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    status = 500
+    headers = {}
+    chunks = []
+
+    async def send(message):
+        nonlocal status, headers
+        if message["type"] == "http.response.start":
+            status = message["status"]
+            headers = {k.decode("latin-1").lower(): v.decode("latin-1") for k, v in message.get("headers", [])}
+        elif message["type"] == "http.response.body":
+            chunks.append(message.get("body", b""))
+
+    admitted = parent_scope.get(ADMIT_SCOPE_KEY)
+    if admitted is None:
+        await parent_scope["app"].router(scope, receive, send)
+    else:
+        async with admitted(scope) as rejection:
+            await (rejection or parent_scope["app"].router)(scope, receive, send)
+
+    body = b"".join(chunks)
+    if headers.get("content-type", "").startswith("application/json") and body:
+        return status, json.loads(body)
+    return status, body.decode("utf-8", errors="replace") or None
+
+
+async def run_batch(parent_scope, sub_requests):
+    """Run all sub-requests concurrently, returning responses in request order"""
+
+    async def run_one(sub):
+        try:
+            status, body = await dispatch(parent_scope, sub.method, sub.path)
+        except HTTPException as e:
+            # Raised by the router itself, e.g. for unknown paths
+            status, body = e.status_code, {"detail": e.detail}
+        except Exception as e:
+            logging.error(f"Error in batch sub-request {sub.path}: {e}")
+            status, body = 500, {"detail": "Internal server error"}
+        return {"id": sub.id, "status": status, "body": body}
+
+    return await asyncio.gather(*(run_one(sub) for sub in sub_requests))
@@ -0,0 +1,380 @@
+#!/usr/bin/env python3
+"""TimeTracker maintenance commands.
+
+Uses the same .env (MONGO_URL, DB_NAME) and models as the API server:
+
+    scripts/timetracker indexes build
+    scripts/timetracker seed --clients 50 --entries-per-project 2000
+    scripts/timetracker stats
+"""
+import asyncio
+import logging
+import random
+import time
+from datetime import date, datetime, timedelta
+from functools import wraps
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import List, Optional
+
+import typer
+
+from .models import Client, Project, TimeEntry, Invoice
+from .archive import archive_entries
+from .backup import backup_stream, restore_backup, BackupError, RESTORE_MODES
+from .database import database
+from .denormalize import entry_names
+from .indexes import configure_indexes, ensure_indexes, missing_indexes, INDEXES
+from .migrations import migrate_storage, STORAGE_COLLECTIONS
+from .periods import locked_periods
+from .rates import billing, initial_history, reprice_entries
+from .rounding import entry_durations
+from .settings import Settings
+from .storage import storage_format, to_storage, from_storage, id_match
+from .synthetic import ANCHOR_DATE, DaySlots, Scale, client_payload, project_payload, time_entry_payload, entry_days, invoice_payload
+from .webhooks import verify_signature
+
+app = typer.Typer(help="TimeTracker maintenance commands", no_args_is_help=True)
+indexes_app = typer.Typer(help="Build or verify the indexes the API relies on", no_args_is_help=True)
+rebuild_app = typer.Typer(help="Rebuild derived (denormalized) data", no_args_is_help=True)
+webhooks_app = typer.Typer(help="Outbound webhook tools", no_args_is_help=True)
+app.add_typer(indexes_app, name="indexes")
+app.add_typer(rebuild_app, name="rebuild")
+app.add_typer(webhooks_app, name="webhooks")
+
+DATA_COLLECTIONS = ("clients", "projects", "time_entries", "invoices")
+
+
+def get_db():
+    settings = Settings.from_env()
+    database.configure(settings)
+    storage_format.configure(settings.storage_format == "compact", settings.storage_legacy_reads)
+    configure_indexes(settings.search_language, settings.idempotency_key_ttl_hours, settings.audit_retention_days)
+    return database
+
+
+def run_async(func):
+    """Let typer call an async command"""
+    @wraps(func)
+    def wrapper(*args, **kwargs):
+        return asyncio.run(func(*args, **kwargs))
+    return wrapper
+
+
+class Progress:
+    """Print a progress line at most once per second"""
+
+    def __init__(self, label: str, total: Optional[int] = None):
+        self.label = label
+        self.total = total
+        self.done = 0
+        self.started = time.monotonic()
+        self._printed = 0.0
+
+    def advance(self, count: int):
+        self.done += count
+        now = time.monotonic()
+        if now - self._printed >= 1:
+            self._printed = now
+            self._print()
+
+    def finish(self):
+        self._print()
+
+    def _print(self):
+        elapsed = time.monotonic() - self.started
+        total = f"/{self.total}" if self.total is not None else ""
+        rate = self.done / elapsed if elapsed > 0 else 0
+        typer.echo(f"{self.label}: {self.done}{total} ({rate:.0f}/s)")
+
+
+async def batches(cursor, batch_size: int):
+    """Yield lists of at most batch_size documents from a cursor"""
+    batch = []
+    async for doc in cursor.batch_size(batch_size):
+        batch.append(doc)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+@indexes_app.command("build")
+@run_async
+async def indexes_build():
+    """Create any missing indexes"""
+    await ensure_indexes(get_db())
+    typer.echo(f"Indexes ensured on {len(INDEXES)} collections")
+
+
+@indexes_app.command("verify")
+@run_async
+async def indexes_verify():
+    """Exit with status 1 if a required index is missing"""
+    missing = await missing_indexes(get_db())
+    for collection_name, names in missing.items():
+        typer.echo(f"{collection_name}: missing {', '.join(names)}")
+    if missing:
+        raise typer.Exit(1)
+    typer.echo("All required indexes exist")
+
+
+@rebuild_app.command("names")
+@run_async
+async def rebuild_names(batch_size: int = typer.Option(500, min=1)):
+    """Recompute the project/client names stored on time entries and invoices"""
+    db = get_db()
+    progress = Progress("projects", await db.projects.count_documents({}))
+    entries = invoices = 0
+    async for projects in batches(db.projects.find({}, {"_id": 0, "id": 1, "name": 1, "client_id": 1}), batch_size):
+        for project in projects:
+            project = from_storage(project)
+            names = await entry_names(db, project)
+            result = await db.time_entries.update_many(
+                {"project_id": id_match(project["id"])}, {"$set": to_storage(names)}
+            )
+            entries += result.modified_count
+            result = await db.invoices.update_many(
+                {"project_id": id_match(project["id"])},
+                {"$set": {"project_name": names["project_name"], "client_name": names["client_name"]}}
+            )
+            invoices += result.modified_count
+        progress.advance(len(projects))
+    progress.finish()
+    typer.echo(f"Updated {entries} time entries and {invoices} invoices")
+
+
+@rebuild_app.command("billing")
+@run_async
+async def rebuild_billing(batch_size: int = typer.Option(500, min=1)):
+    """Recompute stored billable amounts from each project's rate history, except in closed months"""
+    db = get_db()
+    closed = await locked_periods(db)
+    progress = Progress("projects", await db.projects.count_documents({}))
+    entries = 0
+    fields = {"_id": 0, "id": 1, "hourly_rate": 1, "currency": 1, "rate_history": 1}
+    async for projects in batches(db.projects.find({}, fields), batch_size):
+        for project in projects:
+            entries += await reprice_entries(db, from_storage(project), batch_size=batch_size, skip_periods=closed) or 0
+        progress.advance(len(projects))
+    progress.finish()
+    typer.echo(f"Repriced {entries} time entries")
+
+
+@app.command()
+@run_async
+async def seed(
+    clients: int = typer.Option(10, min=1),
+    projects_per_client: int = typer.Option(3, min=1),
+    entries_per_project: int = typer.Option(200, min=0),
+    invoices_per_project: int = typer.Option(2, min=0),
+    batch_size: int = typer.Option(1000, min=1),
+    seed: int = typer.Option(42, help="random seed, the same seed produces the same data"),
+    tag: str = typer.Option("synthetic", help="prefix for names and emails"),
+    anchor_date: datetime = typer.Option(
+        ANCHOR_DATE.isoformat(), formats=["%Y-%m-%d"], help="generated dates count back from this day"
+    ),
+):
+    """Insert synthetic clients, projects, time entries and invoices directly into the database"""
+    db = get_db()
+    rng = random.Random(seed)
+    anchor = anchor_date.date()
+    scale = Scale(clients, projects_per_client, entries_per_project, invoices_per_project)
+    progress = Progress("time entries", scale.total_entries)
+    invoice_count = 0
+    # Entries of all projects share one timeline, so none of them overlap
+    slots = DaySlots()
+
+    for client_index in range(scale.clients):
+        client = Client(**client_payload(rng, client_index, tag)).dict()
+        await db.clients.insert_one(to_storage(client))
+        for project_index in range(scale.projects_per_client):
+            number = client_index * scale.projects_per_client + project_index
+            project = Project(**project_payload(rng, client["id"], number, tag)).dict()
+            project["rate_history"] = initial_history(project)
+            await db.projects.insert_one(to_storage(project))
+            names = {"project_name": project["name"], "client_id": client["id"], "client_name": client["name"]}
+
+            # Invoices reference a few entries each; only those ids are kept in memory
+            invoice_entries = []
+            days = entry_days(rng, scale.entries_per_project, anchor)
+            for start in range(0, len(days), batch_size):
+                payloads = [
+                    time_entry_payload(rng, project["id"], day, slots) for day in days[start:start + batch_size]
+                ]
+                for payload in payloads:
+                    payload.update(await entry_durations(db, project, payload["duration"] * 60))
+                docs = [
+                    TimeEntry(**payload, **names, **billing(project, payload["duration"], payload["date"])).dict()
+                    for payload in payloads
+                ]
+                await db.time_entries.insert_many([to_storage(doc) for doc in docs], ordered=False)
+                if len(invoice_entries) < scale.invoices_per_project:
+                    invoice_entries.extend(docs[:scale.invoices_per_project - len(invoice_entries)])
+                progress.advance(len(docs))
+
+            for invoice_index, entry in enumerate(invoice_entries):
+                invoice = Invoice(
+                    **invoice_payload(
+                        rng, client["id"], project["id"], [entry["id"]], entry["duration"] / 60,
+                        project["hourly_rate"], project["currency"],
+                        f"{tag.upper()}-{number}-{invoice_index}", anchor
+                    ),
+                    project_name=project["name"],
+                    client_name=client["name"],
+                ).dict()
+                await db.invoices.insert_one(to_storage(invoice))
+                invoice_count += 1
+    progress.finish()
+    typer.echo(
+        f"Seeded {scale.clients} clients, {scale.clients * scale.projects_per_client} projects "
+        f"and {invoice_count} invoices"
+    )
+
+
+@app.command()
+@run_async
+async def stats():
+    """Print document counts and storage sizes per collection"""
+    db = get_db()
+    typer.echo(f"{'collection':<20}{'documents':>12}{'avg doc':>10}{'data':>12}{'storage':>12}{'indexes':>12}")
+    for name in sorted(await db.list_collection_names()):
+        result = await db[name].aggregate([{"$collStats": {"storageStats": {}}}]).to_list(1)
+        storage = result[0]["storageStats"] if result else {}
+        typer.echo(
+            f"{name:<20}{storage.get('count', 0):>12}{storage.get('avgObjSize', 0):>10}"
+            f"{_size(storage.get('size', 0)):>12}{_size(storage.get('storageSize', 0)):>12}"
+            f"{_size(storage.get('totalIndexSize', 0)):>12}"
+        )
+
+
+def _size(num_bytes) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} TB"
+
+
+@app.command()
+@run_async
+async def compact(collections: Optional[List[str]] = typer.Argument(None, help="defaults to all data collections")):
+    """Release unused disk space; blocks writes to each collection while it runs on older servers"""
+    db = get_db()
+    for name in collections or DATA_COLLECTIONS:
+        typer.echo(f"Compacting {name}...")
+        result = await db.command("compact", name)
+        freed = result.get("bytesFreed")
+        typer.echo(f"{name}: done" + (f", freed {_size(freed)}" if freed is not None else ""))
+
+
+@app.command()
+@run_async
+async def archive(
+    older_than_days: int = typer.Option(None, min=1, help="archive entries older than this many days"),
+    before: Optional[str] = typer.Option(None, help="archive entries dated before YYYY-MM-DD"),
+    batch_size: int = typer.Option(500, min=1),
+    pause_ms: float = typer.Option(0, min=0, help="sleep between batches to limit load"),
+    dry_run: bool = typer.Option(False, help="only count what would be archived"),
+):
+    """Move old time entries of paid invoices into yearly archive collections"""
+    settings = Settings.from_env()
+    if before:
+        cutoff = datetime.strptime(before, "%Y-%m-%d").date()
+    else:
+        cutoff = date.today() - timedelta(days=older_than_days or settings.archive_after_days)
+    typer.echo(f"Archiving time entries of paid invoices dated before {cutoff.isoformat()}")
+    progress = Progress("time entries scanned")
+    archived = await archive_entries(get_db(), cutoff, batch_size, pause_ms / 1000, dry_run, progress.advance)
+    progress.finish()
+    for year, count in sorted(archived.items()):
+        typer.echo(f"{year}: {count} {'to archive' if dry_run else 'archived'}")
+
+
+@app.command()
+@run_async
+async def backup(output: Path = typer.Argument(..., help="file to write, e.g. backup.ndjson.gz")):
+    """Write a complete gzip-compressed NDJSON backup with manifest and checksums"""
+    written = 0
+    with open(output, "wb") as f:
+        async for chunk in backup_stream(get_db()):
+            f.write(chunk)
+            written += len(chunk)
+    typer.echo(f"Wrote {written} bytes to {output}")
+
+
+@app.command()
+@run_async
+async def restore(
+    path: Path = typer.Argument(..., exists=True, dir_okay=False),
+    mode: str = typer.Option("merge", help="merge: upsert by id; replace: empty the collections first"),
+    batch_size: int = typer.Option(500, min=1),
+):
+    """Verify a backup's checksums, restore it and check referential integrity"""
+    if mode not in RESTORE_MODES:
+        raise typer.BadParameter(f"mode must be one of {', '.join(RESTORE_MODES)}")
+    progress = Progress("documents restored")
+    try:
+        result = await restore_backup(get_db(), str(path), mode, batch_size, progress.advance)
+    except BackupError as e:
+        typer.echo(f"Backup rejected: {e}", err=True)
+        raise typer.Exit(1)
+    progress.finish()
+    for orphan in result["integrity"]["orphans"]:
+        typer.echo(
+            f"{orphan['collection']}.{orphan['field']}: {orphan['count']} references to missing "
+            f"{orphan['references']}, e.g. {', '.join(orphan['sample'])}"
+        )
+    if not result["integrity"]["ok"]:
+        raise typer.Exit(2)
+
+
+@app.command("migrate-storage")
+@run_async
+async def migrate_storage_command(
+    batch_size: int = typer.Option(500, min=1),
+    pause_ms: float = typer.Option(0, min=0, help="sleep between batches to limit load"),
+    restart: bool = typer.Option(False, help="ignore checkpoints and scan from the start"),
+):
+    """Convert stored documents to binary UUIDs and BSON dates (resumable)"""
+    results = await migrate_storage(get_db(), batch_size, pause_ms / 1000, STORAGE_COLLECTIONS, restart)
+    for name, converted in results.items():
+        typer.echo(f"{name}: converted {converted} documents")
+
+
+@webhooks_app.command("stub")
+def webhooks_stub(
+    secret: str = typer.Option(..., help="the endpoint secret configured in WEBHOOK_ENDPOINTS"),
+    port: int = typer.Option(8099),
+    fail_rate: float = typer.Option(0.0, min=0.0, max=1.0, help="answer this share of requests with 503"),
+):
+    """Run a local webhook receiver that checks signatures and prints each event"""
+    rng = random.Random()
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_POST(self):
+            body = self.rfile.read(int(self.headers.get("Content-Length", 0))).decode()
+            valid = verify_signature(
+                secret, self.headers.get("X-Webhook-Timestamp"), body, self.headers.get("X-Webhook-Signature")
+            )
+            if not valid:
+                status = 401
+            elif rng.random() < fail_rate:
+                status = 503
+            else:
+                status = 204
+            typer.echo(f"{status} {self.headers.get('X-Webhook-Event')} {self.headers.get('X-Webhook-Id')} {body}")
+            self.send_response(status)
+            self.end_headers()
+
+        def log_message(self, *args):
+            pass
+
+    typer.echo(f"Listening on http://127.0.0.1:{port}/")
+    ThreadingHTTPServer(("127.0.0.1", port), Handler).serve_forever()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    app()
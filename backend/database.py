@@ -0,0 +1,131 @@
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorClient
+from pymongo.read_preferences import read_pref_mode_from_name, make_read_preference
+
+from .metrics import MongoCommandMetrics, MongoPoolMetrics
+from .tracing import MongoCommandTracer
+
+
+def _timeout(ms: int):
+    # 0 means no timeout, which pymongo spells None
+    return ms or None
+
+
+class Database:
+    """MongoDB connections that are opened on first use instead of at import time.
+
+    Attribute and item access (db.clients, db["invoices"]) are forwarded to the
+    Motor database, so the object can be passed wherever a database is expected.
+    Reports, search and exports use `analytics`: a separate client with its own
+    small pool that prefers secondaries, so heavy reads cannot exhaust the
+    connections that timer and CRUD requests need on the primary.
+    """
+
+    def __init__(self):
+        self.settings = None
+        self._client = None
+        self._db = None
+        self._analytics_client = None
+        self._analytics_db = None
+        self.pools = {}
+
+    def configure(self, settings):
+        self.settings = settings
+
+    def _require_settings(self):
+        if self.settings is None or not self.settings.mongo_url or not self.settings.db_name:
+            raise RuntimeError("MONGO_URL and DB_NAME must be set")
+        return self.settings
+
+    def _connect(self, pool: str, max_pool_size: int, **options):
+        pool_metrics = MongoPoolMetrics(pool, max_pool_size)
+        self.pools[pool] = pool_metrics
+        return AsyncIOMotorClient(
+            self.settings.mongo_url,
+            maxPoolSize=max_pool_size,
+            minPoolSize=min(self.settings.mongo_min_pool_size, max_pool_size),
+            maxIdleTimeMS=self.settings.mongo_max_idle_time_ms,
+            maxConnecting=self.settings.mongo_max_connecting,
+            waitQueueTimeoutMS=_timeout(self.settings.mongo_wait_queue_timeout_ms),
+            connectTimeoutMS=self.settings.mongo_connect_timeout_ms,
+            serverSelectionTimeoutMS=self.settings.mongo_server_selection_timeout_ms,
+            event_listeners=[MongoCommandMetrics(), MongoCommandTracer(), pool_metrics],
+            **options,
+        )
+
+    @property
+    def client(self) -> AsyncIOMotorClient:
+        if self._client is None:
+            settings = self._require_settings()
+            self._client = self._connect(
+                "primary",
+                settings.mongo_max_pool_size,
+                socketTimeoutMS=_timeout(settings.mongo_socket_timeout_ms),
+            )
+            self._db = self._client[settings.db_name]
+        return self._client
+
+    @property
+    def db(self):
+        if self._db is None:
+            self.client
+        return self._db
+
+    @property
+    def analytics(self):
+        """Database handle for long-running reads that tolerate bounded staleness"""
+        if self._analytics_db is None:
+            settings = self._require_settings()
+            mode = read_pref_mode_from_name(settings.analytics_read_preference)
+            self._analytics_client = self._connect(
+                "analytics",
+                settings.analytics_max_pool_size,
+                socketTimeoutMS=_timeout(settings.analytics_socket_timeout_ms),
+            )
+            # maxStalenessSeconds is not allowed with the primary read preference
+            max_staleness = settings.analytics_max_staleness_seconds if mode else -1
+            self._analytics_db = self._analytics_client.get_database(
+                settings.db_name, read_preference=make_read_preference(mode, None, max_staleness)
+            )
+        return self._analytics_db
+
+    def pool_stats(self) -> dict:
+        """Utilization of the pools opened so far"""
+        return {name: pool.snapshot() for name, pool in self.pools.items()}
+
+    def __getattr__(self, name):
+        if name.startswith("_"):
+            raise AttributeError(name)
+        return getattr(self.db, name)
+
+    def __getitem__(self, name):
+        return self.db[name]
+
+    def collection(self, name: str) -> "LazyCollection":
+        return LazyCollection(self, name)
+
+    def close(self):
+        for client in (self._client, self._analytics_client):
+            if client is not None:
+                client.close()
+        if self._client is not None or self._analytics_client is not None:
+            logging.info("Closed MongoDB connections")
+        self._client = self._db = None
+        self._analytics_client = self._analytics_db = None
+        self.pools = {}
+
+
+class LazyCollection:
+    """A collection handle that can be created before the connection is opened"""
+
+    def __init__(self, database: Database, name: str):
+        self._database = database
+        self._name = name
+
+    def __getattr__(self, name):
+        return getattr(self._database.db[self._name], name)
+
+
+# Shared by the app and its helpers; configured by server.create_app
+database = Database()
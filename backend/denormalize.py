@@ -0,0 +1,47 @@
+import logging
+
+from .storage import id_match, to_storage
+
+
+async def entry_names(db, project):
+    """Denormalized project/client fields stored on time entries"""
+    client = await db.clients.find_one({"id": id_match(project["client_id"])}, {"_id": 0, "name": 1})
+    return {
+        "project_name": project["name"],
+        "client_id": project["client_id"],
+        "client_name": client["name"] if client else None,
+    }
+
+
+async def cascade_project_names(db, project):
+    """Propagate a renamed or re-assigned project to its time entries and invoices"""
+    try:
+        names = await entry_names(db, project)
+        entries = await db.time_entries.update_many(
+            {"project_id": id_match(project["id"])},
+            {"$set": to_storage(names)}
+        )
+        invoices = await db.invoices.update_many(
+            {"project_id": id_match(project["id"])},
+            {"$set": {"project_name": project["name"]}}
+        )
+        logging.info(
+            f"Cascaded project {project['id']} names to {entries.modified_count} time entries "
+            f"and {invoices.modified_count} invoices"
+        )
+    except Exception as e:
+        logging.error(f"Error cascading project names: {e}")
+
+
+async def cascade_client_name(db, client):
+    """Propagate a renamed client to its time entries and invoices"""
+    try:
+        update = {"$set": {"client_name": client["name"]}}
+        entries = await db.time_entries.update_many({"client_id": id_match(client["id"])}, update)
+        invoices = await db.invoices.update_many({"client_id": id_match(client["id"])}, update)
+        logging.info(
+            f"Cascaded client {client['id']} name to {entries.modified_count} time entries "
+            f"and {invoices.modified_count} invoices"
+        )
+    except Exception as e:
+        logging.error(f"Error cascading client name: {e}")
@@ -0,0 +1,163 @@
+"""Exchange rates for reporting in one base currency.
+
+Rates are read from a CSV file with the columns date,currency,rate, where rate
+is the number of currency units per unit of the reference currency (the way
+the ECB publishes euro rates). A rate applies from its date until the next
+one for the same currency. The table is held in memory, keyed by date, and
+re-read only when the file changes; reports embed the days they cover in
+their aggregation pipeline so conversion happens inside MongoDB.
+"""
+import bisect
+import csv
+import logging
+import os
+from datetime import datetime, timedelta
+
+# Earlier than any real date, for the reference currency's constant rate
+BEGINNING = "0000-01-01"
+MS_PER_DAY = 24 * 60 * 60 * 1000
+
+
+class ExchangeRateError(ValueError):
+    pass
+
+
+class ExchangeRates:
+    def __init__(self, path=None, reference: str = "EUR"):
+        self.path = path
+        self.reference = reference
+        self._rates = {}
+        self._mtime = None
+
+    def configure(self, path, reference: str = "EUR"):
+        self.path = path
+        self.reference = reference
+        self._rates = {}
+        self._mtime = None
+
+    def _refresh(self):
+        if not self.path:
+            return
+        try:
+            mtime = os.stat(self.path).st_mtime
+        except FileNotFoundError:
+            if self._mtime != 0:
+                logging.warning(f"Exchange rate file {self.path} not found; only same-currency totals can be converted")
+                self._rates, self._mtime = {}, 0
+            return
+        if mtime != self._mtime:
+            self._mtime = mtime
+            try:
+                self._rates = self._load(self.path)
+            except (OSError, ExchangeRateError) as e:
+                # Keep serving the previous table until the file is fixed
+                logging.error(f"Error loading exchange rates: {e}")
+                return
+            logging.info(f"Loaded exchange rates for {len(self._rates)} currencies from {self.path}")
+
+    @staticmethod
+    def _load(path):
+        by_currency = {}
+        with open(path, newline="") as f:
+            for line, row in enumerate(csv.DictReader(f), start=2):
+                try:
+                    day = datetime.strptime(row["date"].strip(), "%Y-%m-%d").strftime("%Y-%m-%d")
+                    currency = row["currency"].strip().upper()
+                    rate = float(row["rate"])
+                except (KeyError, TypeError, ValueError, AttributeError):
+                    raise ExchangeRateError(f"{path}:{line}: expected date,currency,rate")
+                if rate <= 0:
+                    raise ExchangeRateError(f"{path}:{line}: rate must be positive")
+                by_currency.setdefault(currency, {})[day] = rate
+        return {
+            currency: (sorted(rates), [rates[day] for day in sorted(rates)])
+            for currency, rates in by_currency.items()
+        }
+
+    def series(self, currency: str):
+        """(dates, rates) of a currency, ascending by date"""
+        self._refresh()
+        if currency == self.reference:
+            return [BEGINNING], [1.0]
+        return self._rates.get(currency, ([], []))
+
+    def currencies(self):
+        self._refresh()
+        return sorted(set(self._rates) | {self.reference})
+
+    def rate(self, currency: str, day: str):
+        """Units of currency per reference unit on day, or None if no rate is known yet"""
+        dates, rates = self.series(currency)
+        index = bisect.bisect_right(dates, day)
+        return rates[index - 1] if index else None
+
+    def convert(self, amount: float, currency: str, base: str, day: str):
+        if currency == base:
+            return amount
+        from_rate, to_rate = self.rate(currency, day), self.rate(base, day)
+        if from_rate is None or to_rate is None:
+            return None
+        return amount * to_rate / from_rate
+
+    def check_base(self, base: str):
+        if base not in self.currencies():
+            raise ExchangeRateError(f"No exchange rates for {base}")
+
+    def daily(self, currency: str, start: str, end: str):
+        """Rate in force on each day from start to end inclusive; None before the first known rate"""
+        dates, rates = self.series(currency)
+        day = datetime.strptime(start, "%Y-%m-%d").date()
+        last = datetime.strptime(end, "%Y-%m-%d").date()
+        index = bisect.bisect_right(dates, start) - 1
+        daily = []
+        while day <= last:
+            today = day.isoformat()
+            while index + 1 < len(dates) and dates[index + 1] <= today:
+                index += 1
+            daily.append(rates[index] if index >= 0 else None)
+            day += timedelta(days=1)
+        return daily
+
+    def factor_expression(self, currency_expr, day_expr, base: str, start: str, end: str):
+        """Aggregation expression multiplying an amount in currency_expr on day_expr into base.
+
+        Every currency's rates from start to end are embedded as one value per
+        day and looked up by the day's offset from start, so the pipeline grows
+        with the queried range rather than the rate history. Evaluates to null
+        when either rate is unknown for that day or the day is outside the range.
+        """
+        offset = {"$toLong": {"$divide": [
+            {"$subtract": [
+                {"$dateFromString": {"dateString": day_expr, "format": "%Y-%m-%d"}},
+                datetime.strptime(start, "%Y-%m-%d"),
+            ]},
+            MS_PER_DAY,
+        ]}}
+
+        def rate_of(currency):
+            if currency == self.reference:
+                return 1.0
+            return {"$arrayElemAt": [{"$literal": self.daily(currency, start, end)}, "$$offset"]}
+
+        branches = [
+            {"case": {"$eq": [currency_expr, currency]}, "then": rate_of(currency)}
+            for currency in self.currencies() if currency != base
+        ]
+        source = {"$switch": {"branches": branches, "default": None}} if branches else None
+        return {"$cond": [
+            {"$eq": [currency_expr, base]},
+            1,
+            {"$let": {
+                "vars": {"offset": offset},
+                # A negative offset would index from the end of the array
+                "in": {"$cond": [
+                    {"$lt": ["$$offset", 0]},
+                    None,
+                    {"$divide": [rate_of(base), source]},
+                ]},
+            }},
+        ]}
+
+
+# Shared by the app and the CLI; configured by server.create_app
+exchange_rates = ExchangeRates()
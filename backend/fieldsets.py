@@ -0,0 +1,45 @@
+from functools import lru_cache
+from typing import Annotated, List, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import Response
+from pydantic import TypeAdapter, create_model
+
+
+def parse_fields(fields: Optional[str], model) -> Optional[Tuple[str, ...]]:
+    """Validate a comma-separated fields= parameter against a model; id is always included"""
+    if not fields:
+        return None
+    requested = [name.strip() for name in fields.split(",") if name.strip()]
+    unknown = [name for name in requested if name not in model.model_fields]
+    if unknown:
+        raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}")
+    if "id" not in requested:
+        requested.insert(0, "id")
+    return tuple(dict.fromkeys(requested))
+
+
+def projection(field_names) -> dict:
+    """Mongo projection returning only the given fields"""
+    return {"_id": 0, **{name: 1 for name in field_names}}
+
+
+def _nullable(field):
+    """The field's type with its constraints, or None"""
+    annotation = Annotated[(field.annotation, *field.metadata)] if field.metadata else field.annotation
+    return Optional[annotation]
+
+
+@lru_cache(maxsize=128)
+def _list_adapter(model, field_names: Tuple[str, ...]) -> TypeAdapter:
+    # A model with just the selected fields, keeping their types and constraints; a field
+    # missing from a stored document is null rather than a validation error or a fresh default
+    definitions = {name: (_nullable(model.model_fields[name]), None) for name in field_names}
+    partial = create_model(f"{model.__name__}Fields", **definitions)
+    return TypeAdapter(List[partial])
+
+
+def sparse_response(model, field_names: Tuple[str, ...], docs) -> Response:
+    """Serialize projected documents through the matching partial model"""
+    adapter = _list_adapter(model, field_names)
+    return Response(adapter.dump_json(adapter.validate_python(docs)), media_type="application/json")
@@ -0,0 +1,117 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+
+from .indexes import missing_indexes
+
+
+class EventLoopLagMonitor:
+    """Measure how late a periodic sleep wakes up; a busy or blocked loop shows as lag"""
+
+    def __init__(self, interval: float = 0.5):
+        self.interval = interval
+        self.lag_ms = 0.0
+        self.max_lag_ms = 0.0
+        self._task = None
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _run(self):
+        while True:
+            expected = time.perf_counter() + self.interval
+            await asyncio.sleep(self.interval)
+            self.lag_ms = max(0.0, (time.perf_counter() - expected) * 1000)
+            self.max_lag_ms = max(self.max_lag_ms, self.lag_ms)
+
+
+class ReadinessCheck:
+    """Deep readiness probe whose result is cached, so probes never add load themselves.
+
+    Concurrent probes during a refresh wait for the same check instead of
+    starting their own.
+    """
+
+    def __init__(self, database, loop_monitor, cache_seconds=2.0, ping_timeout=1.0,
+                 max_pool_utilization=0.9, max_loop_lag_ms=500, index_cache_seconds=60.0):
+        self.database = database
+        self.loop_monitor = loop_monitor
+        self.cache_seconds = cache_seconds
+        self.ping_timeout = ping_timeout
+        self.max_pool_utilization = max_pool_utilization
+        self.max_loop_lag_ms = max_loop_lag_ms
+        self.index_cache_seconds = index_cache_seconds
+        self._lock = asyncio.Lock()
+        self._result = None
+        self._checked_at = 0.0
+        self._indexes = None
+        self._indexes_checked_at = 0.0
+
+    async def result(self):
+        """Return (ready, details), refreshing at most once per cache interval"""
+        if self._result is not None and time.monotonic() - self._checked_at < self.cache_seconds:
+            return self._result
+        async with self._lock:
+            if self._result is None or time.monotonic() - self._checked_at >= self.cache_seconds:
+                self._result = await self._check()
+                self._checked_at = time.monotonic()
+        return self._result
+
+    async def _check(self):
+        checks = {}
+        ready = True
+
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(self.database.db.command("ping"), self.ping_timeout)
+            checks["mongodb"] = {"ok": True, "latency_ms": round((time.perf_counter() - start) * 1000, 2)}
+        except Exception as e:
+            logging.error(f"Readiness ping failed: {e}")
+            checks["mongodb"] = {"ok": False, "error": type(e).__name__}
+            ready = False
+
+        if checks["mongodb"]["ok"]:
+            checks["indexes"] = await self._check_indexes()
+            ready = ready and checks["indexes"]["ok"]
+
+        pools = self.database.pool_stats()
+        saturated = [name for name, pool in pools.items() if pool["utilization"] >= self.max_pool_utilization]
+        checks["pools"] = {"ok": not saturated, "saturated": saturated, **pools}
+        ready = ready and not saturated
+
+        lag_ms = round(self.loop_monitor.lag_ms, 2)
+        checks["event_loop"] = {
+            "ok": lag_ms <= self.max_loop_lag_ms,
+            "lag_ms": lag_ms,
+            "max_lag_ms": round(self.loop_monitor.max_lag_ms, 2),
+        }
+        ready = ready and checks["event_loop"]["ok"]
+
+        return ready, {
+            "status": "ready" if ready else "unavailable",
+            "timestamp": datetime.utcnow().isoformat(),
+            "checks": checks,
+        }
+
+    async def _check_indexes(self):
+        # Indexes rarely change, so they are listed far less often than the ping runs
+        if self._indexes is None or time.monotonic() - self._indexes_checked_at >= self.index_cache_seconds:
+            try:
+                missing = await asyncio.wait_for(missing_indexes(self.database), self.ping_timeout)
+            except Exception as e:
+                logging.error(f"Readiness index check failed: {e}")
+                return {"ok": False, "error": type(e).__name__}
+            self._indexes = {"ok": not missing, "missing": missing}
+            self._indexes_checked_at = time.monotonic()
+        return self._indexes
@@ -0,0 +1,173 @@
+import hashlib
+import logging
+from datetime import datetime, timedelta
+
+from bson import Binary
+from pymongo.errors import DuplicateKeyError
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse, Response
+
+MAX_KEY_LENGTH = 255
+# Larger responses are not stored; a retry simply runs the request again
+MAX_STORED_RESPONSE_SIZE = 1024 * 1024
+# An in-progress key older than this is assumed to belong to a crashed request
+LOCK_TIMEOUT = timedelta(seconds=60)
+# Headers that describe one particular transmission and must not be replayed
+NON_REPLAYABLE_HEADERS = {"content-length", "x-request-id", "server-timing", "date", "server"}
+
+
+def _fingerprint(scope, body: bytes) -> str:
+    digest = hashlib.sha256()
+    digest.update(scope["method"].encode())
+    digest.update(scope["path"].encode())
+    digest.update(scope.get("query_string", b""))
+    digest.update(body)
+    return digest.hexdigest()
+
+
+class IdempotencyMiddleware:
+    """Replay the stored response for POST requests that repeat an Idempotency-Key.
+
+    The first request with a key claims it by inserting a document whose _id is
+    the key, so concurrent duplicates lose the race on the unique _id. Responses
+    below 500 are stored and replayed; 5xx responses release the key so the
+    client can retry. Documents expire through a TTL index on created_at.
+    """
+
+    def __init__(self, app, collection, methods=("POST",), excluded_paths=("/api/batch",)):
+        self.app = app
+        self.collection = collection
+        self.methods = set(methods)
+        # Read-only POST routes gain nothing from replay
+        self.excluded_paths = set(excluded_paths)
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] not in self.methods
+            or scope["path"] in self.excluded_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+        key = Headers(scope=scope).get("idempotency-key")
+        if key is None:
+            await self.app(scope, receive, send)
+            return
+        if not key or len(key) > MAX_KEY_LENGTH:
+            await JSONResponse({"detail": "Invalid Idempotency-Key header"}, status_code=400)(scope, receive, send)
+            return
+
+        # Buffer the request body: it is part of the fingerprint and must be
+        # handed to the application afterwards
+        chunks = []
+        more_body = True
+        while more_body:
+            message = await receive()
+            if message["type"] == "http.disconnect":
+                return
+            chunks.append(message.get("body", b""))
+            more_body = message.get("more_body", False)
+        body = b"".join(chunks)
+        fingerprint = _fingerprint(scope, body)
+
+        response = await self._claim(key, fingerprint)
+        if response is not None:
+            await response(scope, receive, send)
+            return
+
+        body_sent = False
+
+        async def replay_receive():
+            nonlocal body_sent
+            if not body_sent:
+                body_sent = True
+                return {"type": "http.request", "body": body, "more_body": False}
+            return await receive()
+
+        status_code = 500
+        response_headers = []
+        response_body = []
+
+        async def capture_send(message):
+            nonlocal status_code, response_headers
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                response_headers = [
+                    [name.decode("latin-1"), value.decode("latin-1")]
+                    for name, value in message.get("headers", [])
+                    if name.decode("latin-1").lower() not in NON_REPLAYABLE_HEADERS
+                ]
+            elif message["type"] == "http.response.body":
+                response_body.append(message.get("body", b""))
+            await send(message)
+
+        try:
+            await self.app(scope, replay_receive, capture_send)
+        except Exception:
+            await self._release(key)
+            raise
+
+        response_size = sum(len(chunk) for chunk in response_body)
+        if status_code >= 500 or response_size > MAX_STORED_RESPONSE_SIZE:
+            await self._release(key)
+            return
+        try:
+            await self.collection.update_one({"_id": key}, {"$set": {
+                "status": "completed",
+                "response": {
+                    "status": status_code,
+                    "headers": response_headers,
+                    "body": Binary(b"".join(response_body)),
+                },
+            }})
+        except Exception as e:
+            logging.error(f"Error storing idempotent response: {e}")
+
+    async def _claim(self, key, fingerprint):
+        """Claim the key, or return the response to send instead of running the request"""
+        now = datetime.utcnow()
+        try:
+            await self.collection.insert_one({
+                "_id": key, "fingerprint": fingerprint, "status": "in_progress", "created_at": now,
+            })
+            return None
+        except DuplicateKeyError:
+            pass
+
+        existing = await self.collection.find_one({"_id": key})
+        if existing is None:
+            # Expired between our insert and read; try once more
+            return await self._claim(key, fingerprint)
+        if existing["fingerprint"] != fingerprint:
+            return JSONResponse(
+                {"detail": "Idempotency-Key was already used for a different request"}, status_code=422
+            )
+        if existing["status"] == "completed":
+            stored = existing["response"]
+            body = bytes(stored["body"])
+            response = Response(body, status_code=stored["status"])
+            response.raw_headers = [
+                (name.encode("latin-1"), value.encode("latin-1")) for name, value in stored["headers"]
+            ] + [
+                (b"content-length", str(len(body)).encode("latin-1")),
+                (b"idempotent-replayed", b"true"),
+            ]
+            return response
+
+        taken_over = await self.collection.find_one_and_update(
+            {"_id": key, "status": "in_progress", "created_at": {"$lt": now - LOCK_TIMEOUT}},
+            {"$set": {"created_at": now}},
+        )
+        if taken_over is not None:
+            return None
+        return JSONResponse(
+            {"detail": "A request with this Idempotency-Key is still in progress"},
+            status_code=409,
+            headers={"Retry-After": "1"},
+        )
+
+    async def _release(self, key):
+        try:
+            await self.collection.delete_one({"_id": key, "status": "in_progress"})
+        except Exception as e:
+            logging.error(f"Error releasing idempotency key: {e}")
@@ -0,0 +1,127 @@
+import logging
+
+from pymongo import ASCENDING, DESCENDING, TEXT, IndexModel
+
+
+def build_indexes(search_language="none", idempotency_key_ttl_seconds=24 * 3600, audit_retention_seconds=730 * 86400):
+    """Collection name -> indexes the API relies on.
+
+    Text indexes tokenise without stemming by default, so German and English
+    descriptions are matched the same way; SEARCH_LANGUAGE (e.g. "german")
+    overrides that.
+    """
+    return {
+        "clients": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("email", ASCENDING)], name="email"),
+            IndexModel([("name", TEXT)], name="name_text", default_language=search_language),
+        ],
+        "projects": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("client_id", ASCENDING)], name="client_id"),
+            IndexModel([("name", TEXT)], name="name_text", default_language=search_language),
+        ],
+        "time_entries": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("project_id", ASCENDING), ("date", DESCENDING)], name="project_id_date"),
+            IndexModel([("date", DESCENDING)], name="date"),
+            IndexModel([("client_id", ASCENDING)], name="client_id"),
+            IndexModel([("start_time", ASCENDING), ("end_time", ASCENDING)], name="start_time_end_time"),
+            # Denormalized names make a project or client search find its entries too
+            IndexModel(
+                [("description", TEXT), ("project_name", TEXT), ("client_name", TEXT)],
+                name="description_names_text",
+                weights={"description": 3, "project_name": 1, "client_name": 1},
+                default_language=search_language,
+            ),
+        ],
+        "invoices": [
+            IndexModel([("id", ASCENDING)], name="id_unique", unique=True),
+            IndexModel([("invoice_number", ASCENDING)], name="invoice_number"),
+            IndexModel([("client_id", ASCENDING)], name="client_id"),
+            IndexModel([("project_id", ASCENDING)], name="project_id"),
+            # Date range filters and the bounds of unbounded invoice reports
+            IndexModel([("issue_date", DESCENDING)], name="issue_date"),
+            # Multikey; archival looks up which entries belong to paid invoices
+            IndexModel([("time_entries", ASCENDING), ("status", ASCENDING)], name="time_entries_status"),
+            IndexModel(
+                [("custom_description", TEXT), ("invoice_number", TEXT)],
+                name="description_text",
+                weights={"invoice_number": 5, "custom_description": 1},
+                default_language=search_language,
+            ),
+        ],
+        "rate_limits": [
+            # Shared rate-limit buckets that have been idle for an hour are full again
+            IndexModel([("updated_at", ASCENDING)], name="updated_at_ttl", expireAfterSeconds=3600),
+        ],
+        "audit_log": [
+            IndexModel([("entity_id", ASCENDING), ("at", DESCENDING)], name="entity_id_at"),
+            IndexModel([("at", ASCENDING)], name="at_ttl", expireAfterSeconds=audit_retention_seconds),
+        ],
+        "webhook_outbox": [
+            IndexModel([("endpoint", ASCENDING), ("status", ASCENDING), ("next_attempt_at", ASCENDING)],
+                       name="endpoint_status_next_attempt_at"),
+            # Delivered events are kept a week for inspection; failed ones until retried
+            IndexModel([("delivered_at", ASCENDING)], name="delivered_at_ttl", expireAfterSeconds=7 * 86400),
+        ],
+        "period_writes": [
+            IndexModel([("periods", ASCENDING), ("started_at", ASCENDING)], name="periods_started_at"),
+            # Writes deregister when done; this only clears ones left by a crash
+            IndexModel([("started_at", ASCENDING)], name="started_at_ttl", expireAfterSeconds=3600),
+        ],
+        "entry_locks": [
+            # Locks are released after each write; this only clears ones left by a crash
+            IndexModel([("locked_at", ASCENDING)], name="locked_at_ttl", expireAfterSeconds=3600),
+        ],
+        "idempotency_keys": [
+            IndexModel([("created_at", ASCENDING)], name="created_at_ttl",
+                       expireAfterSeconds=idempotency_key_ttl_seconds),
+        ],
+    }
+
+
+# Rebuilt from Settings by configure_indexes()
+INDEXES = build_indexes()
+
+
+def configure_indexes(search_language: str, idempotency_key_ttl_hours: float, audit_retention_days: int):
+    """Apply the index options from Settings; INDEXES is updated in place"""
+    INDEXES.clear()
+    INDEXES.update(build_indexes(
+        search_language=search_language,
+        idempotency_key_ttl_seconds=int(idempotency_key_ttl_hours * 3600),
+        # Disputes can come up long after invoicing
+        audit_retention_seconds=audit_retention_days * 86400,
+    ))
+
+
+# Collection name -> indexes replaced by one in INDEXES; a collection has at
+# most one text index, so the old one must go before its successor is built
+REPLACED_INDEXES = {
+    "time_entries": ["description_text"],
+}
+
+
+async def ensure_indexes(db):
+    """Drop replaced indexes and create any missing ones; existing ones are left untouched"""
+    for collection_name, names in REPLACED_INDEXES.items():
+        existing = (await db[collection_name].index_information()).keys()
+        for name in names:
+            if name in existing:
+                await db[collection_name].drop_index(name)
+                logging.info(f"Dropped replaced index {collection_name}.{name}")
+    for collection_name, indexes in INDEXES.items():
+        created = await db[collection_name].create_indexes(indexes)
+        logging.info(f"Ensured indexes on {collection_name}: {', '.join(created)}")
+
+
+async def missing_indexes(db):
+    """Return {collection: [index names]} for required indexes that do not exist"""
+    missing = {}
+    for collection_name, indexes in INDEXES.items():
+        existing = set((await db[collection_name].index_information()).keys())
+        names = [index.document["name"] for index in indexes if index.document["name"] not in existing]
+        if names:
+            missing[collection_name] = names
+    return missing
@@ -0,0 +1,219 @@
+import threading
+import time
+
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Gauge, Histogram, generate_latest
+from pymongo import monitoring
+from starlette.responses import Response
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+REQUEST_LATENCY = Histogram(
+    "http_request_duration_seconds",
+    "HTTP request latency by route",
+    ["method", "route"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUESTS_IN_PROGRESS = Gauge(
+    "http_requests_in_progress",
+    "HTTP requests currently being handled",
+    ["method"],
+)
+REQUEST_ERRORS = Counter(
+    "http_request_errors_total",
+    "HTTP responses with a 4xx/5xx status",
+    ["method", "route", "status"],
+)
+MONGO_COMMAND_LATENCY = Histogram(
+    "mongodb_command_duration_seconds",
+    "MongoDB command latency by collection",
+    ["command", "collection"],
+    buckets=LATENCY_BUCKETS,
+)
+MONGO_COMMAND_FAILURES = Counter(
+    "mongodb_command_failures_total",
+    "Failed MongoDB commands by collection",
+    ["command", "collection"],
+)
+MONGO_POOL_CONNECTIONS = Gauge(
+    "mongodb_pool_connections",
+    "Open MongoDB connections by client pool and state (in_use or idle)",
+    ["pool", "state"],
+)
+MONGO_POOL_WAITING = Gauge(
+    "mongodb_pool_wait_queue",
+    "Operations waiting to check out a MongoDB connection",
+    ["pool"],
+)
+MONGO_POOL_CHECKOUT_FAILURES = Counter(
+    "mongodb_pool_checkout_failures_total",
+    "Failed MongoDB connection checkouts, e.g. wait queue timeouts",
+    ["pool", "reason"],
+)
+AUDIT_RECORDS = Counter(
+    "audit_records_total",
+    "Audit records by outcome (written or dropped)",
+    ["result"],
+)
+AUDIT_QUEUE_DEPTH = Gauge(
+    "audit_queue_depth",
+    "Audit records waiting to be written",
+)
+STARTUP_DURATION = Gauge(
+    "app_startup_duration_seconds",
+    "Time from building the app until it accepted requests",
+)
+
+# Maps endpoint functions to their route templates, e.g. /api/clients/{client_id}
+_route_templates = {}
+
+
+def route_template(scope) -> str:
+    """Return the matched route template for a handled request, or 'unmatched'"""
+    endpoint = scope.get("endpoint")
+    if endpoint is None:
+        return "unmatched"
+    template = _route_templates.get(endpoint)
+    if template is None:
+        template = "unmatched"
+        for route in getattr(scope.get("app"), "routes", []):
+            if getattr(route, "endpoint", None) is endpoint:
+                template = route.path
+                break
+        _route_templates[endpoint] = template
+    return template
+
+
+def command_collection(command_name: str, command) -> str:
+    """Extract the target collection name from a MongoDB command document"""
+    if command_name == "getMore":
+        return command.get("collection", "")
+    target = command.get(command_name)
+    return target if isinstance(target, str) else ""
+
+
+class MetricsMiddleware:
+    """Record per-route latency, in-flight requests and error counts"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        in_progress = REQUESTS_IN_PROGRESS.labels(method)
+        in_progress.inc()
+        start = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            elapsed = time.perf_counter() - start
+            in_progress.dec()
+            route = route_template(scope)
+            REQUEST_LATENCY.labels(method, route).observe(elapsed)
+            if status_code >= 400:
+                REQUEST_ERRORS.labels(method, route, str(status_code)).inc()
+
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """pymongo command listener that times every command per collection"""
+
+    def __init__(self):
+        self._collections = {}
+
+    def started(self, event):
+        self._collections[event.request_id] = command_collection(event.command_name, event.command)
+
+    def succeeded(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_COMMAND_LATENCY.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+
+    def failed(self, event):
+        collection = self._collections.pop(event.request_id, "")
+        MONGO_COMMAND_LATENCY.labels(event.command_name, collection).observe(event.duration_micros / 1e6)
+        MONGO_COMMAND_FAILURES.labels(event.command_name, collection).inc()
+
+
+
+class MongoPoolMetrics(monitoring.ConnectionPoolListener):
+    """Track connection pool utilization for one client; events arrive on pymongo threads"""
+
+    def __init__(self, pool: str, max_pool_size: int):
+        self.pool = pool
+        self.max_pool_size = max_pool_size
+        self._lock = threading.Lock()
+        self.open = 0
+        self.in_use = 0
+        self.waiting = 0
+        self.checkout_failures = 0
+
+    def _update(self, opened=0, checked_out=0, queued=0):
+        with self._lock:
+            self.open += opened
+            self.in_use += checked_out
+            self.waiting += queued
+            MONGO_POOL_CONNECTIONS.labels(self.pool, "in_use").set(self.in_use)
+            MONGO_POOL_CONNECTIONS.labels(self.pool, "idle").set(max(0, self.open - self.in_use))
+            MONGO_POOL_WAITING.labels(self.pool).set(self.waiting)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "max_size": self.max_pool_size,
+                "open": self.open,
+                "in_use": self.in_use,
+                "waiting": self.waiting,
+                "utilization": round(self.in_use / self.max_pool_size, 3) if self.max_pool_size else 0,
+                "checkout_failures": self.checkout_failures,
+            }
+
+    def connection_created(self, event):
+        self._update(opened=1)
+
+    def connection_closed(self, event):
+        self._update(opened=-1)
+
+    def connection_check_out_started(self, event):
+        self._update(queued=1)
+
+    def connection_checked_out(self, event):
+        self._update(checked_out=1, queued=-1)
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+        MONGO_POOL_CHECKOUT_FAILURES.labels(self.pool, str(event.reason)).inc()
+        self._update(queued=-1)
+
+    def connection_checked_in(self, event):
+        self._update(checked_out=-1)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+
+async def metrics_endpoint():
+    """Expose metrics in the Prometheus text format"""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
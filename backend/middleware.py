@@ -0,0 +1,264 @@
+import hashlib
+import json
+import os
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, gzip is always available
+    brotli = None
+
+# Content types worth compressing; images, archives etc. are already compressed
+COMPRESSIBLE_CONTENT_TYPES = (
+    "application/json",
+    "application/x-ndjson",
+    "application/javascript",
+    "text/",
+    "image/svg+xml",
+)
+
+DEFAULT_CACHE_CONTROL_RULES = {
+    "/api/clients": "private, no-cache",
+    "/api/projects": "private, no-cache",
+    "/api/timer": "no-store",
+    "/api/health": "no-store",
+}
+DEFAULT_CACHE_CONTROL = "private, no-cache"
+
+
+def _accepted_encodings(accept_encoding: str):
+    """Parse an Accept-Encoding header into the set of encodings with q > 0"""
+    accepted = set()
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        params = params.strip().replace(" ", "")
+        if params.startswith("q="):
+            try:
+                if float(params[2:]) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(token)
+    return accepted
+
+
+class _Compressor:
+    """Incremental gzip/brotli compressor with a common interface"""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._compressor = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 produces a gzip container
+            self._compressor = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes) -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.flush()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self, data: bytes = b"") -> bytes:
+        if self.encoding == "br":
+            return self._compressor.process(data) + self._compressor.finish()
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_FINISH)
+
+
+class CompressionMiddleware:
+    """Compress responses with brotli or gzip once they exceed a size threshold"""
+
+    def __init__(self, app, minimum_size: int = 1024, gzip_level: int = 6,
+                 brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+
+    def _compressible(self, headers, size: int, more_body: bool) -> bool:
+        return (
+            "content-encoding" not in headers
+            and headers.get("content-type", "").startswith(COMPRESSIBLE_CONTENT_TYPES)
+            and (more_body or size >= self.minimum_size)
+        )
+
+    @staticmethod
+    def _compressed_validators(headers):
+        headers.add_vary_header("Accept-Encoding")
+        if "etag" in headers and not headers["etag"].startswith("W/"):
+            # The representation changed, so a strong validator no longer applies
+            headers["ETag"] = "W/" + headers["etag"]
+
+    def _not_modified(self, message, encoding):
+        """Give a 304 the ETag and Vary of the 200 it stands for, then drop its body metadata"""
+        headers = MutableHeaders(raw=message["headers"])
+        if encoding is not None and self._compressible(headers, int(headers.get("content-length") or 0), False):
+            self._compressed_validators(headers)
+        del headers["Content-Type"]
+        del headers["Content-Length"]
+
+    def _negotiate(self, scope) -> Optional[str]:
+        accepted = _accepted_encodings(Headers(scope=scope).get("accept-encoding", ""))
+        if brotli is not None and "br" in accepted:
+            return "br"
+        if "gzip" in accepted:
+            return "gzip"
+        return None
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = self._negotiate(scope)
+        if encoding is None:
+            async def send_identity(message):
+                if message["type"] == "http.response.start" and message["status"] == 304:
+                    self._not_modified(message, None)
+                await send(message)
+
+            await self.app(scope, receive, send_identity)
+            return
+
+        initial_message = {}
+        compressor = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal initial_message, compressor, passthrough
+            if message["type"] == "http.response.start" and message["status"] == 304:
+                self._not_modified(message, encoding)
+                passthrough = True
+                await send(message)
+                return
+            if message["type"] == "http.response.start":
+                # Hold the headers back until the first body chunk tells us
+                # whether the response is worth compressing
+                initial_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if passthrough:
+                await send(message)
+                return
+
+            if compressor is None:
+                headers = MutableHeaders(raw=initial_message["headers"])
+                if not self._compressible(headers, len(body), more_body):
+                    passthrough = True
+                    await send(initial_message)
+                    await send(message)
+                    return
+
+                compressor = _Compressor(encoding, self.gzip_level, self.brotli_quality)
+                headers["Content-Encoding"] = encoding
+                self._compressed_validators(headers)
+                if more_body:
+                    del headers["Content-Length"]
+                    message["body"] = compressor.compress(body)
+                else:
+                    message["body"] = compressor.finish(body)
+                    headers["Content-Length"] = str(len(message["body"]))
+                await send(initial_message)
+                await send(message)
+                return
+
+            message["body"] = compressor.compress(body) if more_body else compressor.finish(body)
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
+
+
+class CacheControlMiddleware:
+    """Apply per-route Cache-Control policies and ETag revalidation to GET responses.
+
+    A 304 keeps the Content-Type and Content-Length of the 200 it stands for,
+    so the CompressionMiddleware around it can give it the same ETag and Vary;
+    that middleware then removes them.
+    """
+
+    def __init__(self, app, rules: Optional[Dict[str, str]] = None,
+                 default_policy: str = DEFAULT_CACHE_CONTROL, max_etag_size: int = 5 * 1024 * 1024):
+        self.app = app
+        # Longest prefix wins, so sort the most specific rules first
+        self.rules = sorted((rules or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.default_policy = default_policy
+        self.max_etag_size = max_etag_size
+
+    def policy_for(self, path: str) -> str:
+        for prefix, policy in self.rules:
+            if path == prefix or path.startswith(prefix.rstrip("/") + "/"):
+                return policy
+        return self.default_policy
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "GET":
+            await self.app(scope, receive, send)
+            return
+
+        policy = self.policy_for(scope["path"])
+        if_none_match = Headers(scope=scope).get("if-none-match")
+        initial_message = {}
+        chunks = []
+        buffered = 0
+        streaming = False
+
+        async def send_with_cache_headers(message):
+            nonlocal initial_message, buffered, streaming
+            if message["type"] == "http.response.start":
+                initial_message = message
+                headers = MutableHeaders(raw=message["headers"])
+                if message["status"] == 200 and policy and "cache-control" not in headers:
+                    headers["Cache-Control"] = policy
+                if message["status"] != 200 or "etag" in headers or "no-store" in policy:
+                    streaming = True
+                    await send(message)
+                return
+            if message["type"] != "http.response.body" or streaming:
+                await send(message)
+                return
+
+            # Buffer the body so that an ETag can be derived from it; give up
+            # on very large or streamed bodies and send them through untouched
+            chunks.append(message.get("body", b""))
+            buffered += len(chunks[-1])
+            more_body = message.get("more_body", False)
+            if more_body and buffered <= self.max_etag_size:
+                return
+            if more_body:
+                streaming = True
+                await send(initial_message)
+                for chunk in chunks:
+                    await send({"type": "http.response.body", "body": chunk, "more_body": True})
+                return
+
+            body = b"".join(chunks)
+            etag = '"%s"' % hashlib.blake2b(body, digest_size=16).hexdigest()
+            headers = MutableHeaders(raw=initial_message["headers"])
+            headers["ETag"] = etag
+            if if_none_match and etag in [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]:
+                initial_message["status"] = 304
+                headers["Content-Length"] = str(len(body))
+                body = b""
+            await send(initial_message)
+            await send({"type": "http.response.body", "body": body})
+
+        await self.app(scope, receive, send_with_cache_headers)
+
+
+def cache_control_rules_from_env(environ=None) -> Dict[str, str]:
+    """Read per-route Cache-Control policies from CACHE_CONTROL_RULES (JSON object)"""
+    rules = dict(DEFAULT_CACHE_CONTROL_RULES)
+    raw = (os.environ if environ is None else environ).get("CACHE_CONTROL_RULES")
+    if raw:
+        rules.update(json.loads(raw))
+    return rules
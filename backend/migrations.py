@@ -0,0 +1,106 @@
+#!/usr/bin/env python3
+"""Rewrite stored documents into the compact storage format (see storage.py).
+
+Runs online: documents are converted in small batches ordered by _id and the
+position is checkpointed after every batch, so an interrupted run continues
+where it stopped. Each update only applies while the document still holds the
+legacy values it was read with, so concurrent API writes are never clobbered.
+
+    python -m backend.migrations --batch-size 500 --pause-ms 50
+"""
+import argparse
+import asyncio
+import logging
+from datetime import datetime
+
+from pymongo import UpdateOne
+
+from .storage import legacy_fields, storage_format
+
+STORAGE_COLLECTIONS = ("clients", "projects", "time_entries", "invoices", "active_timers")
+CHECKPOINT_PREFIX = "compact_storage:"
+
+
+async def migrate_collection(db, name, batch_size=500, pause=0.0):
+    """Convert one collection, resuming from its checkpoint; returns documents converted"""
+    checkpoint_id = CHECKPOINT_PREFIX + name
+    checkpoint = await db.migrations.find_one({"_id": checkpoint_id}) or {}
+    if checkpoint.get("done"):
+        return 0
+    last_id = checkpoint.get("last_id")
+    converted = checkpoint.get("converted", 0)
+    collection = db[name]
+
+    while True:
+        query = {"_id": {"$gt": last_id}} if last_id is not None else {}
+        docs = await collection.find(query).sort("_id", 1).limit(batch_size).to_list(batch_size)
+        if not docs:
+            break
+
+        operations = []
+        for doc in docs:
+            changes = legacy_fields(doc)
+            if changes:
+                # Guard on the values that were read, so a concurrent update wins
+                guard = {"_id": doc["_id"], **{field: doc[field] for field in changes}}
+                operations.append(UpdateOne(guard, {"$set": changes}))
+        if operations:
+            result = await collection.bulk_write(operations, ordered=False)
+            converted += result.modified_count
+
+        last_id = docs[-1]["_id"]
+        await db.migrations.update_one(
+            {"_id": checkpoint_id},
+            {"$set": {"last_id": last_id, "converted": converted, "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+        if pause:
+            await asyncio.sleep(pause)
+
+    # Documents written in the legacy format after this point are still read correctly
+    await db.migrations.update_one(
+        {"_id": checkpoint_id},
+        {"$set": {"done": True, "converted": converted, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
+    return converted
+
+
+async def migrate_storage(db, batch_size=500, pause=0.0, collections=STORAGE_COLLECTIONS, restart=False):
+    """Convert all collections to the compact format; returns {collection: converted}"""
+    if restart:
+        await db.migrations.delete_many({"_id": {"$in": [CHECKPOINT_PREFIX + name for name in collections]}})
+    results = {}
+    for name in collections:
+        results[name] = await migrate_collection(db, name, batch_size, pause)
+        logging.info(f"Converted {results[name]} documents in {name}")
+    return results
+
+
+def main():
+    from .database import database
+    from .settings import Settings
+
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--pause-ms", type=float, default=0, help="sleep between batches to limit load")
+    parser.add_argument("--collection", action="append", choices=STORAGE_COLLECTIONS,
+                        help="only migrate this collection (repeatable)")
+    parser.add_argument("--restart", action="store_true", help="ignore checkpoints and scan from the start")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    settings = Settings.from_env()
+    database.configure(settings)
+    storage_format.configure(settings.storage_format == "compact", settings.storage_legacy_reads)
+    asyncio.run(migrate_storage(
+        database,
+        batch_size=args.batch_size,
+        pause=args.pause_ms / 1000,
+        collections=tuple(args.collection or STORAGE_COLLECTIONS),
+        restart=args.restart,
+    ))
+
+
+if __name__ == "__main__":
+    main()
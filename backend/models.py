@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, validator
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 from datetime import datetime
 from enum import Enum
 import uuid
@@ -21,6 +21,12 @@ class InvoiceStatus(str, Enum):
     paid = "paid"
     overdue = "overdue"
 
+# Rounding rule applied to tracked time, e.g. 6-minute or quarter-hour increments
+class RoundingRule(BaseModel):
+    increment: int = Field(..., ge=1, le=60)  # minutes
+    mode: str = Field(default="up", pattern=r'^(up|down|nearest)$')
+    minimum: int = Field(default=1, ge=1)  # minutes
+
 # Client Models
 class ClientBase(BaseModel):
     name: str = Field(..., min_length=1, max_length=255)
@@ -28,6 +34,7 @@ class ClientBase(BaseModel):
     phone: Optional[str] = Field(None, max_length=50)
     address: Optional[str] = Field(None, max_length=500)
     is_active: bool = Field(default=True)
+    rounding: Optional[RoundingRule] = None
 
 class ClientCreate(ClientBase):
     pass
@@ -38,6 +45,7 @@ class ClientUpdate(BaseModel):
     phone: Optional[str] = Field(None, max_length=50)
     address: Optional[str] = Field(None, max_length=500)
     is_active: Optional[bool] = None
+    rounding: Optional[RoundingRule] = None
 
 class Client(ClientBase):
     id: str = Field(default_factory=generate_id)
@@ -59,6 +67,13 @@ class ProjectBase(BaseModel):
     start_date: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}-\d{2}$')
     end_date: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}-\d{2}$')
     status: ProjectStatus = Field(default=ProjectStatus.active)
+    # Overrides the client's rule
+    rounding: Optional[RoundingRule] = None
+
+class RateHistoryEntry(BaseModel):
+    rate: float = Field(..., ge=0)
+    currency: str = Field(default="EUR", pattern=r'^[A-Z]{3}$')
+    valid_from: str = Field(..., pattern=r'^\d{4}-\d{2}-\d{2}$')
 
 class ProjectCreate(ProjectBase):
     pass
@@ -72,9 +87,12 @@ class ProjectUpdate(BaseModel):
     start_date: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}-\d{2}$')
     end_date: Optional[str] = Field(None, pattern=r'^\d{4}-\d{2}-\d{2}$')
     status: Optional[ProjectStatus] = None
+    rounding: Optional[RoundingRule] = None
 
 class Project(ProjectBase):
     id: str = Field(default_factory=generate_id)
+    # Effective-dated rates, sorted by valid_from; hourly_rate/currency mirror the current one
+    rate_history: List[RateHistoryEntry] = Field(default_factory=list)
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -107,6 +125,15 @@ class TimeEntryUpdate(BaseModel):
 
 class TimeEntry(TimeEntryBase):
     id: str = Field(default_factory=generate_id)
+    # Denormalized from the project and its client, kept in sync on rename
+    project_name: Optional[str] = None
+    client_id: Optional[str] = None
+    client_name: Optional[str] = None
+    # Tracked time in seconds; duration holds it rounded by the project's rounding rule
+    raw_duration: Optional[int] = None
+    # Priced with the project rate valid on the entry's date when it is written
+    billable_amount: Optional[float] = None
+    currency: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -115,6 +142,27 @@ class TimeEntry(TimeEntryBase):
             datetime: lambda v: v.isoformat()
         }
 
+class TimeEntrySpan(BaseModel):
+    id: str
+    project_id: str
+    description: str
+    date: str
+    start_time: datetime
+    end_time: datetime
+
+class TimeEntryOverlap(BaseModel):
+    first: TimeEntrySpan
+    second: TimeEntrySpan
+    overlap_start: datetime
+    overlap_end: datetime
+    overlap_minutes: int
+
+class TimeEntryOverlapReport(BaseModel):
+    start_date: str
+    end_date: str
+    entries_checked: int
+    conflicts: List[TimeEntryOverlap]
+
 # Invoice Models
 class InvoiceBase(BaseModel):
     client_id: str = Field(..., min_length=1)
@@ -147,6 +195,9 @@ class InvoiceUpdate(BaseModel):
 
 class Invoice(InvoiceBase):
     id: str = Field(default_factory=generate_id)
+    # Denormalized from the project and client, kept in sync on rename
+    project_name: Optional[str] = None
+    client_name: Optional[str] = None
     created_at: datetime = Field(default_factory=datetime.utcnow)
     updated_at: datetime = Field(default_factory=datetime.utcnow)
 
@@ -184,6 +235,139 @@ class ErrorResponse(BaseModel):
     message: str
     error: Optional[str] = None
 
+# Search Models
+class SearchResult(BaseModel):
+    type: str
+    id: str
+    title: str
+    snippet: Optional[str] = None
+    score: float
+    date: Optional[str] = None
+    project_id: Optional[str] = None
+    client_id: Optional[str] = None
+
+class SearchResponse(BaseModel):
+    query: str
+    page: int
+    page_size: int
+    total: int
+    totals_by_type: Dict[str, int]
+    results: List[SearchResult]
+
+# Report Models
+class RevenueRow(BaseModel):
+    key: Optional[str] = None
+    label: Optional[str] = None
+    currency: Optional[str] = None
+    amount: float
+    # amount in the report's base currency
+    converted_amount: Optional[float] = None
+    minutes: int
+    entries: int
+
+class RevenueReport(BaseModel):
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    group_by: str
+    base_currency: str
+    rows: List[RevenueRow]
+    totals: Dict[str, float]
+    converted_total: float
+    # Entries written before billable amounts existed; `timetracker rebuild billing` prices them
+    unpriced_entries: int = 0
+    # Priced entries left out of converted_total because no exchange rate covers their date
+    unconverted_entries: int = 0
+
+class InvoiceCurrencyTotal(BaseModel):
+    currency: str
+    amount: float
+    pending: float
+    converted_amount: Optional[float] = None
+    converted_pending: Optional[float] = None
+    invoices: int
+
+class InvoiceTotals(BaseModel):
+    start_date: Optional[str] = None
+    end_date: Optional[str] = None
+    base_currency: str
+    total: float
+    pending: float
+    by_currency: List[InvoiceCurrencyTotal]
+    unconverted_invoices: int = 0
+
+# Period Models
+class PeriodProjectTotal(BaseModel):
+    project_id: Optional[str] = None
+    project_name: Optional[str] = None
+    client_id: Optional[str] = None
+    client_name: Optional[str] = None
+    currency: Optional[str] = None
+    minutes: int
+    entries: int
+    amount: float
+
+class PeriodClientTotal(BaseModel):
+    client_id: Optional[str] = None
+    client_name: Optional[str] = None
+    currency: Optional[str] = None
+    minutes: int
+    entries: int
+    amount: float
+
+class PeriodTotals(BaseModel):
+    projects: List[PeriodProjectTotal]
+    clients: List[PeriodClientTotal]
+    totals: Dict[str, float]
+    minutes: int
+    entries: int
+
+class PeriodSnapshot(PeriodTotals):
+    period: str
+    version: int
+    closed_at: datetime
+
+class PeriodSummary(PeriodTotals):
+    period: str
+    locked: bool
+    # Version of the current snapshot; None for months that were never closed
+    version: Optional[int] = None
+    source: str  # "snapshot" or "live"
+
+class Period(BaseModel):
+    period: str
+    locked: bool
+    version: int
+    closed_at: Optional[datetime] = None
+    reopened_at: Optional[datetime] = None
+
+# Audit Models
+class AuditRecord(BaseModel):
+    entity_type: str
+    entity_id: str
+    action: str  # create, update or delete
+    at: datetime
+    request_id: Optional[str] = None
+    # field -> {"before": ..., "after": ...}
+    changes: Dict[str, Any]
+
+# Batch Models
+class BatchSubRequest(BaseModel):
+    id: Optional[str] = Field(None, max_length=100)
+    method: str = Field(default="GET", pattern=r'^GET$')
+    # Path below /api, e.g. "/time-entries?start_date=2024-01-01"
+    path: str = Field(..., pattern=r'^/([^/#][^#]*)?$', max_length=2000)
+
+class BatchRequest(BaseModel):
+    requests: List[BatchSubRequest] = Field(..., min_length=1)
+
+class BatchSubResponse(BaseModel):
+    id: Optional[str] = None
+    status: int
+    body: Any = None
+
+class BatchResponse(BaseModel):
+    responses: List[BatchSubResponse]
+
 # Timer Operation Models
 class TimerStartRequest(BaseModel):
     project_id: str = Field(..., min_length=1)
@@ -0,0 +1,140 @@
+import asyncio
+import heapq
+import time
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
+
+from pymongo.errors import DuplicateKeyError
+
+from .storage import from_storage, id_not
+
+OVERLAP_FIELDS = {"_id": 0, "id": 1, "project_id": 1, "description": 1, "date": 1, "start_time": 1, "end_time": 1}
+
+# A day lock older than this belongs to a writer that died and is taken over
+DAY_LOCK_STALE_AFTER = timedelta(seconds=30)
+
+
+class OverlapPolicy:
+    """Limits applied to time entry ranges, set from Settings by create_app()"""
+
+    def __init__(self):
+        # Entries may not span longer than this. It also bounds how far back an
+        # overlap query has to look, which keeps it a short index range scan.
+        self.max_entry_span = timedelta(hours=24)
+        # Skip the overlap check on writes entirely
+        self.allow_overlaps = False
+        # How long a write waits for another write to the same day
+        self.lock_wait_seconds = 5.0
+
+    def configure(self, max_entry_hours: float, allow_overlaps: bool, lock_wait_seconds: float = 5.0):
+        self.max_entry_span = timedelta(hours=max_entry_hours)
+        self.allow_overlaps = allow_overlaps
+        self.lock_wait_seconds = lock_wait_seconds
+
+
+overlap_policy = OverlapPolicy()
+
+
+class DayLockTimeout(Exception):
+    """Another write to the same day held its lock for too long"""
+
+
+def to_utc_naive(value):
+    """Mongo returns naive UTC datetimes; normalise aware input to match"""
+    if value is not None and value.tzinfo is not None:
+        return value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def overlap_filter(start, end):
+    """Mongo filter for entries whose [start_time, end_time) intersects [start, end)"""
+    return {
+        "start_time": {"$gte": start - overlap_policy.max_entry_span, "$lt": end},
+        "end_time": {"$gt": start},
+    }
+
+
+async def find_overlap(collection, start, end, exclude_id=None):
+    """Return the earliest-starting existing entry that overlaps [start, end), or None"""
+    query = overlap_filter(start, end)
+    if exclude_id:
+        query["id"] = id_not(exclude_id)
+    return from_storage(await collection.find_one(query, OVERLAP_FIELDS, sort=[("start_time", 1)]))
+
+
+def days_touched(start, end):
+    """UTC days (YYYY-MM-DD) that [start, end) has an instant in.
+
+    Two overlapping ranges share an instant, so they always share one of these days.
+    """
+    day = start.date()
+    last = (end - timedelta(microseconds=1)).date() if end > start else day
+    days = []
+    while day <= last:
+        days.append(day.isoformat())
+        day += timedelta(days=1)
+    return days
+
+
+async def _lock_day(collection, day, owner, deadline):
+    while True:
+        now = datetime.utcnow()
+        try:
+            # Matches only a stale lock; otherwise the upsert inserts, and fails on a held one
+            await collection.update_one(
+                {"_id": day, "locked_at": {"$lt": now - DAY_LOCK_STALE_AFTER}},
+                {"$set": {"owner": owner, "locked_at": now}},
+                upsert=True,
+            )
+            return
+        except DuplicateKeyError:
+            if time.monotonic() >= deadline:
+                raise DayLockTimeout(day)
+            await asyncio.sleep(0.02)
+
+
+@asynccontextmanager
+async def day_locks(collection, start, end, wait_seconds=None):
+    """Hold a lock document for every day [start, end) touches.
+
+    Overlap checks and the write that follows them run under these locks, so
+    two concurrent writes of overlapping ranges cannot both pass the check.
+    Days are locked in order, so writers spanning midnight cannot deadlock.
+    """
+    owner = uuid.uuid4().hex
+    deadline = time.monotonic() + (overlap_policy.lock_wait_seconds if wait_seconds is None else wait_seconds)
+    locked = []
+    try:
+        for day in days_touched(start, end):
+            await _lock_day(collection, day, owner, deadline)
+            locked.append(day)
+        yield
+    finally:
+        if locked:
+            await collection.delete_many({"_id": {"$in": locked}, "owner": owner})
+
+
+def sweep_overlaps(entries):
+    """Find every overlapping pair in entries sorted by start_time.
+
+    A min-heap of end times holds the entries still open at the current start,
+    so the pass is O(n log n + k) for k conflicts instead of comparing all pairs.
+    """
+    conflicts = []
+    active = []
+    for index, entry in enumerate(entries):
+        while active and active[0][0] <= entry["start_time"]:
+            heapq.heappop(active)
+        for end_time, _, other in active:
+            conflicts.append({
+                "first": other,
+                "second": entry,
+                "overlap_start": entry["start_time"],
+                "overlap_end": min(end_time, entry["end_time"]),
+            })
+        heapq.heappush(active, (entry["end_time"], index, entry))
+    for conflict in conflicts:
+        span = conflict["overlap_end"] - conflict["overlap_start"]
+        conflict["overlap_minutes"] = int(span.total_seconds() // 60)
+    return conflicts
@@ -0,0 +1,272 @@
+"""Monthly accounting periods that can be closed.
+
+Closing a month locks it: time entries dated in it can no longer be created,
+changed or deleted. It also stores a snapshot of the month's totals per
+project and client. Snapshots never change; reopening a month only lifts the
+lock, and closing it again writes the next snapshot version, so a snapshot
+can be cached forever under its version. Reports read snapshots for closed
+months and aggregate only open months live.
+
+Entry writes register themselves in `period_writes` before checking the lock
+and deregister once written; closing locks first and then waits for the
+month's registered writes, so a write that passed the check just before the
+lock still lands before the snapshot is taken.
+"""
+import asyncio
+import calendar
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+
+from fastapi import APIRouter, Depends, HTTPException, Path
+
+from .admin import require_admin
+from .archive import archive_collection_name, archive_years, load_catalog
+from .database import database
+from .models import Period, PeriodSnapshot
+from .storage import date_filter, from_storage
+
+PERIOD_PATTERN = r'^\d{4}-(0[1-9]|1[0-2])$'
+
+
+# A registered write older than this is presumed dead and no longer delays a close
+WRITE_LEASE_SECONDS = 30
+
+
+class PeriodError(ValueError):
+    pass
+
+
+class PeriodClosed(PeriodError):
+    def __init__(self, periods):
+        super().__init__(f"Period {', '.join(periods)} is closed")
+        self.periods = periods
+
+
+def period_bounds(period: str):
+    """First and last day (YYYY-MM-DD) of a YYYY-MM period"""
+    year, month = int(period[:4]), int(period[5:7])
+    return f"{period}-01", f"{period}-{calendar.monthrange(year, month)[1]:02d}"
+
+
+def periods_between(start: str, end: str):
+    """YYYY-MM periods from start to end, inclusive"""
+    year, month = int(start[:4]), int(start[5:7])
+    periods = []
+    while f"{year:04d}-{month:02d}" <= end:
+        periods.append(f"{year:04d}-{month:02d}")
+        year, month = (year + 1, 1) if month == 12 else (year, month + 1)
+    return periods
+
+
+def snapshot_id(period: str, version: int) -> str:
+    return f"{period}:v{version}"
+
+
+async def locked_periods(db, periods=None, start_day=None, end_day=None):
+    """Locked periods among the given ones, or between two days (inclusive, open ended if None)"""
+    query = {"locked": True}
+    if periods is not None:
+        query["_id"] = {"$in": sorted(set(periods))}
+    else:
+        bounds = {}
+        if start_day:
+            bounds["$gte"] = start_day[:7]
+        if end_day:
+            bounds["$lte"] = end_day[:7]
+        if bounds:
+            query["_id"] = bounds
+    return sorted([doc["_id"] async for doc in db.periods.find(query, {"_id": 1})])
+
+
+@asynccontextmanager
+async def open_period_write(db, *days):
+    """Run a write to entries dated on the given days; raises PeriodClosed if a month is locked"""
+    periods = sorted({day[:7] for day in days if day})
+    if not periods:
+        yield
+        return
+    marker_id = str(uuid.uuid4())
+    # Registered before the check, so a close that locks after it waits for this write
+    await db.period_writes.insert_one({"_id": marker_id, "periods": periods, "started_at": datetime.utcnow()})
+    try:
+        closed = await locked_periods(db, periods)
+        if closed:
+            raise PeriodClosed(closed)
+        yield
+    finally:
+        await db.period_writes.delete_one({"_id": marker_id})
+
+
+async def drain_writes(db, period: str, poll_seconds: float = 0.1):
+    """Wait until no write registered for the period is running (at most WRITE_LEASE_SECONDS)"""
+    while True:
+        live_since = datetime.utcnow() - timedelta(seconds=WRITE_LEASE_SECONDS)
+        if not await db.period_writes.find_one({"periods": period, "started_at": {"$gt": live_since}}, {"_id": 1}):
+            return
+        await asyncio.sleep(poll_seconds)
+
+
+def exclude_periods(periods):
+    """Filter leaving out entries dated in the given periods"""
+    if not periods:
+        return {}
+    return {"$nor": [date_filter("date", *period_bounds(period)) for period in periods]}
+
+
+async def period_totals(db, catalog, period: str):
+    """Live totals of one month per project and client, archived entries included"""
+    match = date_filter("date", *period_bounds(period))
+    pipeline = [{"$match": match}]
+    for year in archive_years(catalog, *period_bounds(period)):
+        pipeline.append({"$unionWith": {"coll": archive_collection_name(year), "pipeline": [{"$match": match}]}})
+    pipeline.append({"$group": {
+        "_id": {"project_id": "$project_id", "currency": "$currency"},
+        "project_name": {"$first": "$project_name"},
+        "client_id": {"$first": "$client_id"},
+        "client_name": {"$first": "$client_name"},
+        "minutes": {"$sum": "$duration"},
+        "entries": {"$sum": 1},
+        "amount": {"$sum": "$billable_amount"},
+    }})
+
+    projects = []
+    clients = {}
+    totals = {}
+    async for group in db.time_entries.aggregate(pipeline, allowDiskUse=True):
+        row = from_storage({
+            "project_id": group["_id"].get("project_id"),
+            "client_id": group.get("client_id"),
+        })
+        row.update({
+            "project_name": group.get("project_name"),
+            "client_name": group.get("client_name"),
+            "currency": group["_id"].get("currency"),
+            "minutes": group["minutes"],
+            "entries": group["entries"],
+            "amount": round(group["amount"], 2),
+        })
+        projects.append(row)
+        client = clients.setdefault((row["client_id"], row["currency"]), {
+            "client_id": row["client_id"],
+            "client_name": row["client_name"],
+            "currency": row["currency"],
+            "minutes": 0,
+            "entries": 0,
+            "amount": 0.0,
+        })
+        client["minutes"] += row["minutes"]
+        client["entries"] += row["entries"]
+        client["amount"] = round(client["amount"] + row["amount"], 2)
+        if row["currency"]:
+            totals[row["currency"]] = round(totals.get(row["currency"], 0) + row["amount"], 2)
+
+    projects.sort(key=lambda row: (row["project_name"] or "", row["currency"] or ""))
+    return {
+        "projects": projects,
+        "clients": sorted(clients.values(), key=lambda row: (row["client_name"] or "", row["currency"] or "")),
+        "totals": totals,
+        "minutes": sum(row["minutes"] for row in projects),
+        "entries": sum(row["entries"] for row in projects),
+    }
+
+
+async def close_period(db, period: str):
+    """Lock a month, then store the snapshot of its totals; returns the snapshot"""
+    existing = await db.periods.find_one({"_id": period}) or {}
+    version = existing.get("version", 0)
+    if existing.get("locked"):
+        snapshot = await db.period_snapshots.find_one({"_id": snapshot_id(period, version)})
+        if snapshot:
+            raise PeriodError(f"Period {period} is already closed")
+        # An earlier close stopped between locking and writing the snapshot: finish it
+    else:
+        version += 1
+        # Lock before aggregating, so nothing can change the numbers being snapshotted
+        await db.periods.update_one(
+            {"_id": period},
+            {"$set": {"locked": True, "version": version, "closed_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    # Writes that passed the lock check before it was set may still be running
+    await drain_writes(db, period)
+    closed = await db.periods.find_one({"_id": period})
+    snapshot = {
+        "_id": snapshot_id(period, version),
+        "period": period,
+        "version": version,
+        "closed_at": closed["closed_at"],
+        **await period_totals(db, await load_catalog(db), period),
+    }
+    await db.period_snapshots.insert_one(snapshot)
+    logging.info(f"Closed period {period} (snapshot v{version}: {snapshot['entries']} entries)")
+    return snapshot
+
+
+async def reopen_period(db, period: str):
+    """Lift the lock; the snapshots already taken stay as they are"""
+    result = await db.periods.update_one(
+        {"_id": period, "locked": True},
+        {"$set": {"locked": False, "reopened_at": datetime.utcnow()}}
+    )
+    if result.matched_count == 0:
+        raise PeriodError(f"Period {period} is not closed")
+    logging.info(f"Reopened period {period}")
+    return await db.periods.find_one({"_id": period})
+
+
+async def period_summaries(db, catalog, start: str, end: str):
+    """Totals per month: snapshots for closed months, live aggregation for open ones"""
+    periods = periods_between(start, end)
+    states = {doc["_id"]: doc async for doc in db.periods.find({"_id": {"$in": periods}})}
+    snapshot_ids = [
+        snapshot_id(period, state["version"]) for period, state in states.items() if state.get("locked")
+    ]
+    snapshots = {doc["period"]: doc async for doc in db.period_snapshots.find({"_id": {"$in": snapshot_ids}})}
+
+    async def summary(period):
+        state = states.get(period, {})
+        snapshot = snapshots.get(period)
+        if snapshot:
+            totals, source = snapshot, "snapshot"
+        else:
+            totals, source = await period_totals(db, catalog, period), "live"
+        return {
+            "period": period,
+            "locked": bool(state.get("locked")),
+            "version": state.get("version"),
+            "source": source,
+            **{field: totals[field] for field in ("projects", "clients", "totals", "minutes", "entries")},
+        }
+
+    return await asyncio.gather(*(summary(period) for period in periods))
+
+
+periods_router = APIRouter(prefix="/api/admin", dependencies=[Depends(require_admin)])
+
+
+@periods_router.post("/periods/{period}/close", response_model=PeriodSnapshot)
+async def close(period: str = Path(..., pattern=PERIOD_PATTERN)):
+    """Lock a month against changes and snapshot its totals"""
+    try:
+        return await close_period(database.db, period)
+    except PeriodError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error closing period: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@periods_router.post("/periods/{period}/reopen", response_model=Period)
+async def reopen(period: str = Path(..., pattern=PERIOD_PATTERN)):
+    """Allow changes to a closed month again"""
+    try:
+        state = await reopen_period(database.db, period)
+        return {"period": state.pop("_id"), **state}
+    except PeriodError as e:
+        raise HTTPException(status_code=409, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error reopening period: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
@@ -0,0 +1,173 @@
+import asyncio
+import sys
+import threading
+import time
+from collections import Counter
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi.responses import JSONResponse, PlainTextResponse
+
+from .admin import require_admin
+
+MAX_PROFILE_SECONDS = 300
+MAX_STACK_DEPTH = 128
+
+
+class SamplingProfiler:
+    """Statistical profiler that samples one thread's stack from a background thread"""
+
+    def __init__(self, thread_id: int, interval: float):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self.sample_count = 0
+        self.started_at = None
+        self.stopped_at = None
+        self._stopped = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="sampling-profiler", daemon=True)
+
+    def start(self):
+        self.started_at = time.perf_counter()
+        self._thread.start()
+
+    async def stop(self):
+        """Signal the sampler and wait for it off the event loop"""
+        self._stopped.set()
+        self.stopped_at = time.perf_counter()
+        await asyncio.to_thread(self._thread.join)
+
+    def _run(self):
+        while not self._stopped.wait(self.interval):
+            frame = sys._current_frames().get(self.thread_id)
+            if frame is None:
+                continue
+            stack = []
+            while frame is not None and len(stack) < MAX_STACK_DEPTH:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, code.co_firstlineno))
+                frame = frame.f_back
+            # Stored root first, as both output formats expect
+            self.stacks[tuple(reversed(stack))] += 1
+            self.sample_count += 1
+            del frame
+
+    @property
+    def duration(self) -> float:
+        return (self.stopped_at or time.perf_counter()) - self.started_at
+
+    def collapsed(self) -> str:
+        """Brendan Gregg's collapsed-stack format, as consumed by flamegraph.pl"""
+        lines = []
+        for stack, count in self.stacks.most_common():
+            frames = ";".join("%s (%s:%d)" % frame for frame in stack)
+            lines.append("%s %d" % (frames, count))
+        return "\n".join(lines) + "\n"
+
+    def speedscope(self, name: str) -> dict:
+        """Sampled profile in the speedscope file format"""
+        frame_index = {}
+        frames = []
+        samples = []
+        weights = []
+        for stack, count in self.stacks.items():
+            sample = []
+            for frame in stack:
+                if frame not in frame_index:
+                    frame_index[frame] = len(frames)
+                    function, filename, line = frame
+                    frames.append({"name": function, "file": filename, "line": line})
+                sample.append(frame_index[frame])
+            samples.append(sample)
+            weights.append(count * self.interval)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "timetracker",
+            "activeProfileIndex": 0,
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": self.duration,
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+
+class ProfilingSession:
+    def __init__(self, profiler: SamplingProfiler, max_requests: Optional[int]):
+        self.profiler = profiler
+        self.remaining_requests = max_requests
+        self.done = asyncio.Event()
+
+
+# Only one profiling session may run at a time
+_active_session: Optional[ProfilingSession] = None
+
+
+class ProfilingMiddleware:
+    """Count completed requests for request-bounded profiling sessions.
+
+    Only installed when PROFILING_ENABLED is set, so it costs nothing otherwise.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            session = _active_session
+            if scope["type"] == "http" and session is not None and session.remaining_requests is not None:
+                session.remaining_requests -= 1
+                if session.remaining_requests <= 0:
+                    session.done.set()
+
+
+profiling_router = APIRouter(prefix="/api/admin", dependencies=[Depends(require_admin)])
+
+
+@profiling_router.post("/profile")
+async def profile(
+    seconds: Optional[float] = Query(None, gt=0, le=MAX_PROFILE_SECONDS),
+    requests: Optional[int] = Query(None, ge=1),
+    interval_ms: float = Query(5, ge=1, le=1000),
+    format: str = Query("speedscope", pattern="^(speedscope|collapsed)$"),
+):
+    """Sample the event loop thread for N seconds or N requests and return the profile"""
+    global _active_session
+    if _active_session is not None:
+        raise HTTPException(status_code=409, detail="A profiling session is already running")
+
+    if seconds is None:
+        seconds = MAX_PROFILE_SECONDS if requests else 10
+
+    # Handlers run on the event loop thread, which is the one worth sampling
+    profiler = SamplingProfiler(threading.get_ident(), interval_ms / 1000)
+    session = ProfilingSession(profiler, requests)
+    _active_session = session
+    profiler.start()
+    try:
+        await asyncio.wait_for(session.done.wait(), timeout=seconds)
+    except asyncio.TimeoutError:
+        pass
+    finally:
+        _active_session = None
+        await profiler.stop()
+
+    name = "timetracker %.1fs %d samples" % (profiler.duration, profiler.sample_count)
+    filename = "profile-%d" % int(time.time())
+    if format == "collapsed":
+        return PlainTextResponse(
+            profiler.collapsed(),
+            headers={"Content-Disposition": 'attachment; filename="%s.collapsed.txt"' % filename},
+        )
+    return JSONResponse(
+        profiler.speedscope(name),
+        headers={"Content-Disposition": 'attachment; filename="%s.speedscope.json"' % filename},
+    )
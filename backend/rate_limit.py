@@ -0,0 +1,188 @@
+import hashlib
+import logging
+import math
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from datetime import datetime
+
+from pymongo import ReturnDocument
+from starlette.datastructures import Headers
+from starlette.responses import JSONResponse
+
+# GET routes that scan whole collections or aggregate; everything else is cheap
+EXPENSIVE_PATHS = {
+    "/api/clients",
+    "/api/projects",
+    "/api/time-entries",
+    "/api/time-entries/overlaps",
+    "/api/invoices",
+    "/api/search",
+}
+EXPENSIVE_PREFIXES = ("/api/reports", "/api/admin")
+EXEMPT_PATHS = ("/metrics", "/api/health")
+# Scope key under which a request's admission is offered to the batch sub-requests it runs
+ADMIT_SCOPE_KEY = "rate_limit.admitted"
+
+# The least recently used in-memory bucket is dropped beyond this many
+MAX_LOCAL_BUCKETS = 10000
+
+
+class BucketPolicy:
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate  # tokens added per second
+        self.burst = burst  # bucket capacity
+
+
+def classify(scope) -> str:
+    # A batch is charged per sub-request, see RateLimitMiddleware.admitted
+    path = scope["path"].rstrip("/") or "/"
+    if scope["method"] == "GET" and (path in EXPENSIVE_PATHS or path.startswith(EXPENSIVE_PREFIXES)):
+        return "expensive"
+    return "cheap"
+
+
+class LocalBuckets:
+    """Token buckets kept in this process, at most max_buckets of them (LRU)"""
+
+    def __init__(self, max_buckets: int = MAX_LOCAL_BUCKETS, clock=time.monotonic):
+        self.max_buckets = max_buckets
+        self.clock = clock
+        self._buckets = OrderedDict()
+
+    async def take(self, key: str, policy: BucketPolicy):
+        """Take one token; return (allowed, seconds until a token is available)"""
+        now = self.clock()
+        tokens, updated = self._buckets.pop(key, (policy.burst, now))
+        tokens = min(policy.burst, tokens + (now - updated) * policy.rate)
+        allowed = tokens >= 1
+        if allowed:
+            tokens -= 1
+        self._buckets[key] = (tokens, now)
+        if len(self._buckets) > self.max_buckets:
+            self._buckets.popitem(last=False)
+        return allowed, 0 if allowed else (1 - tokens) / policy.rate
+
+
+class MongoBuckets:
+    """Token buckets shared by all workers, refilled atomically with a pipeline update"""
+
+    def __init__(self, collection):
+        self.collection = collection
+
+    async def take(self, key: str, policy: BucketPolicy):
+        now = datetime.utcnow()
+        elapsed = {"$divide": [{"$subtract": [now, {"$ifNull": ["$updated_at", now]}]}, 1000]}
+        refilled = {"$min": [
+            policy.burst,
+            {"$add": [{"$ifNull": ["$tokens", policy.burst]}, {"$multiply": [elapsed, policy.rate]}]},
+        ]}
+        bucket = await self.collection.find_one_and_update(
+            {"_id": key},
+            [
+                {"$set": {"tokens": refilled, "updated_at": now}},
+                # Both fields are computed from the refilled value of the previous stage
+                {"$set": {
+                    "allowed": {"$gte": ["$tokens", 1]},
+                    "tokens": {"$cond": [{"$gte": ["$tokens", 1]}, {"$subtract": ["$tokens", 1]}, "$tokens"]},
+                }},
+            ],
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        if bucket["allowed"]:
+            return True, 0
+        return False, (1 - bucket["tokens"]) / policy.rate
+
+
+class RateLimitMiddleware:
+    """Per-client token buckets plus a global cap on concurrent expensive requests.
+
+    Clients that send a known X-API-Key get a bucket per key; everyone else,
+    including clients sending an unknown key, is identified by IP address.
+    When the direct peer is a trusted proxy the X-Real-IP header it sets is
+    used instead.
+    """
+
+    def __init__(self, app, policies, max_concurrent_expensive: int = 8, buckets=None,
+                 trusted_proxies=("127.0.0.1",), api_keys=(), exempt_api_keys=()):
+        self.app = app
+        self.policies = policies
+        self.max_concurrent_expensive = max_concurrent_expensive
+        self.buckets = buckets or LocalBuckets()
+        self.trusted_proxies = set(trusted_proxies)
+        self.exempt_api_keys = set(exempt_api_keys)
+        # Unknown keys must not get buckets of their own, or rotating keys would bypass the limit
+        self.api_keys = set(api_keys) | self.exempt_api_keys
+        self.expensive_in_flight = 0
+
+    def client_key(self, scope, headers) -> str:
+        api_key = headers.get("x-api-key")
+        if api_key in self.api_keys:
+            return "key:" + hashlib.sha256(api_key.encode()).hexdigest()[:32]
+        peer = scope["client"][0] if scope.get("client") else "unknown"
+        if peer in self.trusted_proxies and headers.get("x-real-ip"):
+            return "ip:" + headers["x-real-ip"]
+        return "ip:" + peer
+
+    async def __call__(self, scope, receive, send):
+        if (
+            scope["type"] != "http"
+            or scope["method"] == "OPTIONS"
+            or scope["path"].startswith(EXEMPT_PATHS)
+        ):
+            await self.app(scope, receive, send)
+            return
+        headers = Headers(scope=scope)
+        if headers.get("x-api-key") in self.exempt_api_keys:
+            await self.app(scope, receive, send)
+            return
+
+        async with self.admitted(scope, headers) as rejection:
+            if rejection is not None:
+                await rejection(scope, receive, send)
+                return
+            # Batch sub-requests skip the middleware stack; they are charged through this
+            scope[ADMIT_SCOPE_KEY] = lambda sub_scope: self.admitted(sub_scope, headers)
+            await self.app(scope, receive, send)
+
+    @asynccontextmanager
+    async def admitted(self, scope, headers):
+        """Charge a request to its client's bucket and, if expensive, to the concurrency cap.
+
+        Yields None while the request may run, or the rejection to send instead.
+        """
+        route_class = classify(scope)
+        try:
+            allowed, retry_after = await self.buckets.take(
+                "%s:%s" % (self.client_key(scope, headers), route_class), self.policies[route_class]
+            )
+        except Exception as e:
+            # Fail open: a limiter outage must not take the API down with it
+            logging.error(f"Error checking rate limit: {e}")
+            allowed, retry_after = True, 0
+        if not allowed:
+            yield self.reject("Rate limit exceeded", retry_after)
+            return
+
+        if route_class != "expensive":
+            yield None
+            return
+
+        # Shed load instead of queueing when too many expensive queries run at once
+        if self.expensive_in_flight >= self.max_concurrent_expensive:
+            yield self.reject("Server busy, try again shortly", 1)
+            return
+        self.expensive_in_flight += 1
+        try:
+            yield None
+        finally:
+            self.expensive_in_flight -= 1
+
+    @staticmethod
+    def reject(detail, retry_after):
+        return JSONResponse(
+            {"detail": detail},
+            status_code=429,
+            headers={"Retry-After": str(max(1, math.ceil(retry_after)))},
+        )
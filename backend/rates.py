@@ -0,0 +1,104 @@
+"""Effective-dated project rates.
+
+Every time entry stores the amount it is billed at, priced with the project
+rate valid on the entry's date, so revenue reports only sum a stored field.
+A backdated rate change reprices the entries in the window it affects.
+"""
+import logging
+from datetime import date, datetime, timedelta
+
+from pymongo import UpdateOne
+
+from .periods import exclude_periods
+from .storage import date_filter, id_match
+
+
+def rate_on(project, day: str):
+    """(rate, currency) of the project on day (YYYY-MM-DD).
+
+    Days before the first history entry use the earliest known rate; a project
+    without history uses its hourly_rate.
+    """
+    history = project.get("rate_history") or []
+    if not history:
+        return project["hourly_rate"], project.get("currency") or "EUR"
+    current = history[0]
+    for entry in history:
+        if entry["valid_from"] > day:
+            break
+        current = entry
+    return current["rate"], current["currency"]
+
+
+def billing(project, duration: int, day: str) -> dict:
+    """billable_amount and currency stored on a time entry"""
+    rate, currency = rate_on(project, day)
+    return {"billable_amount": round(duration * rate / 60, 2), "currency": currency}
+
+
+# valid_from of the rate a project starts with. It is open ended, so every
+# later change lands after it and never reprices the project's earlier entries.
+OPEN_START = date.min.isoformat()
+
+
+def initial_history(project) -> list:
+    """History for a project that has none yet: its current rate, for all dates"""
+    return [{
+        "rate": project["hourly_rate"],
+        "currency": project.get("currency") or "EUR",
+        "valid_from": OPEN_START,
+    }]
+
+
+def add_rate(history, change):
+    """Insert or replace the entry for change["valid_from"].
+
+    Returns the new sorted history and the window [start, end) of entry dates
+    whose rate changed; end is None when the change applies indefinitely.
+    """
+    others = [entry for entry in history if entry["valid_from"] != change["valid_from"]]
+    new_history = sorted(others + [change], key=lambda entry: entry["valid_from"])
+    index = new_history.index(change)
+    # The change also governs the days before the first entry
+    start = None if index == 0 else change["valid_from"]
+    end = new_history[index + 1]["valid_from"] if index + 1 < len(new_history) else None
+    return new_history, (start, end)
+
+
+def last_day_before(end):
+    """Inclusive end of a window whose exclusive end is end (None stays open)"""
+    return (datetime.strptime(end, "%Y-%m-%d") - timedelta(days=1)).strftime("%Y-%m-%d") if end else None
+
+
+async def reprice_entries(db, project, start=None, end=None, batch_size=500, skip_periods=()):
+    """Recompute billable amounts of the project's entries dated in [start, end), in batches.
+
+    Entries in skip_periods (closed YYYY-MM months) keep their amounts.
+    """
+    try:
+        query = {"project_id": id_match(project["id"])}
+        if start or end:
+            query = {"$and": [query, date_filter("date", start, last_day_before(end))]}
+        if skip_periods:
+            query = {"$and": [query, exclude_periods(skip_periods)]}
+        fields = {"_id": 1, "date": 1, "duration": 1}
+
+        repriced = 0
+        last_id = None
+        while True:
+            batch_query = {"$and": [query, {"_id": {"$gt": last_id}}]} if last_id is not None else query
+            docs = await db.time_entries.find(batch_query, fields).sort("_id", 1).limit(batch_size).to_list(batch_size)
+            if not docs:
+                break
+            last_id = docs[-1]["_id"]
+            operations = []
+            for doc in docs:
+                day = doc["date"] if isinstance(doc["date"], str) else doc["date"].strftime("%Y-%m-%d")
+                operations.append(UpdateOne({"_id": doc["_id"]}, {"$set": billing(project, doc["duration"], day)}))
+            result = await db.time_entries.bulk_write(operations, ordered=False)
+            repriced += result.modified_count
+
+        logging.info(f"Repriced {repriced} time entries of project {project['id']} ({start or 'start'} - {end or 'open'})")
+        return repriced
+    except Exception as e:
+        logging.error(f"Error repricing time entries: {e}")
@@ -0,0 +1,175 @@
+"""Reporting aggregations.
+
+Amounts are converted to a base currency inside the pipeline: sums are first
+grouped per currency and day, each of those is multiplied by the exchange
+rate of its day, and only the grouped results come back to Python.
+"""
+from datetime import date
+
+from pymongo import ASCENDING, DESCENDING
+
+from .archive import archive_collection_name, archive_years
+from .exchange_rates import exchange_rates
+from .storage import date_filter, date_string, from_storage
+
+# Group keys of the revenue report: (key, label) expressions
+_MONTH = {"$substrBytes": [date_string("date"), 0, 7]}
+REVENUE_GROUPS = {
+    "project": ("$project_id", "$project_name"),
+    "client": ("$client_id", "$client_name"),
+    "month": (_MONTH, _MONTH),
+}
+
+
+async def _stored_range(collection, field, start_date=None, end_date=None, earliest=None):
+    """The queried date range, open ends narrowed to the first and last stored dates.
+
+    Exchange rates are embedded per day of this range, so an unbounded query
+    must not reach back to the start of the rate history.
+    """
+    days = [earliest] if earliest else []
+    if not (start_date and end_date):
+        # Legacy string dates and BSON dates sort separately, so look at both
+        for bson_type in ("string", "date"):
+            for direction in (ASCENDING, DESCENDING):
+                doc = await collection.find_one(
+                    {field: {"$type": bson_type}}, {"_id": 0, field: 1}, sort=[(field, direction)]
+                )
+                if doc:
+                    days.append(from_storage(doc)[field][:10])
+    start = start_date or min(days, default=end_date or date.today().isoformat())
+    return start, end_date or max(days, default=start)
+
+
+def _converted(value):
+    return round(value, 2) if value is not None else None
+
+
+async def revenue_report(db, catalog, start_date=None, end_date=None, group_by="project", base_currency="EUR"):
+    """Sum the stored billable amounts per group and currency, archives included"""
+    exchange_rates.check_base(base_currency)
+    match = date_filter("date", start_date, end_date) if start_date or end_date else {}
+    key, label = REVENUE_GROUPS[group_by]
+    years = archive_years(catalog, start_date, end_date)
+    rate_range = await _stored_range(
+        db.time_entries, "date", start_date, end_date, f"{years[0]}-01-01" if years else None
+    )
+    factor = exchange_rates.factor_expression("$_id.currency", "$_id.day", base_currency, *rate_range)
+
+    pipeline = [{"$match": match}]
+    for year in years:
+        pipeline.append({"$unionWith": {"coll": archive_collection_name(year), "pipeline": [{"$match": match}]}})
+    pipeline += [
+        {"$group": {
+            "_id": {"key": key, "currency": "$currency", "day": date_string("date")},
+            "label": {"$first": label},
+            "amount": {"$sum": "$billable_amount"},
+            "minutes": {"$sum": "$duration"},
+            "entries": {"$sum": 1},
+            "unpriced": {"$sum": {"$cond": [{"$isNumber": "$billable_amount"}, 0, 1]}},
+        }},
+        {"$set": {"factor": factor}},
+        {"$group": {
+            "_id": {"key": "$_id.key", "currency": "$_id.currency"},
+            "label": {"$first": "$label"},
+            "amount": {"$sum": "$amount"},
+            "converted": {"$sum": {"$multiply": ["$amount", "$factor"]}},
+            "minutes": {"$sum": "$minutes"},
+            "entries": {"$sum": "$entries"},
+            "unpriced": {"$sum": "$unpriced"},
+            "unconverted": {"$sum": {"$cond": [
+                {"$eq": ["$factor", None]}, {"$subtract": ["$entries", "$unpriced"]}, 0
+            ]}},
+        }},
+    ]
+
+    rows = []
+    totals = {}
+    converted_total = 0.0
+    unpriced = unconverted = 0
+    async for group in db.time_entries.aggregate(pipeline, allowDiskUse=True):
+        currency = group["_id"].get("currency")
+        amount = round(group["amount"], 2)
+        rows.append({
+            "key": from_storage({"id": group["_id"].get("key")})["id"],
+            "label": group["label"],
+            "currency": currency,
+            "amount": amount,
+            "converted_amount": _converted(group["converted"]),
+            "minutes": group["minutes"],
+            "entries": group["entries"],
+        })
+        if currency:
+            totals[currency] = round(totals.get(currency, 0) + amount, 2)
+        converted_total += group["converted"]
+        unpriced += group["unpriced"]
+        unconverted += group["unconverted"]
+
+    rows.sort(key=lambda row: (row["key"] or "", row["currency"] or ""))
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "group_by": group_by,
+        "base_currency": base_currency,
+        "rows": rows,
+        "totals": totals,
+        "converted_total": round(converted_total, 2),
+        "unpriced_entries": unpriced,
+        "unconverted_entries": unconverted,
+    }
+
+
+async def invoice_totals(db, start_date=None, end_date=None, base_currency="EUR"):
+    """Invoiced and outstanding amounts per currency and in the base currency, by issue date"""
+    exchange_rates.check_base(base_currency)
+    match = date_filter("issue_date", start_date, end_date) if start_date or end_date else {}
+    rate_range = await _stored_range(db.invoices, "issue_date", start_date, end_date)
+    factor = exchange_rates.factor_expression("$_id.currency", "$_id.day", base_currency, *rate_range)
+    pending = {"$ne": ["$status", "paid"]}
+
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": {"currency": {"$ifNull": ["$currency", "EUR"]}, "day": date_string("issue_date")},
+            "amount": {"$sum": "$total_amount"},
+            "pending": {"$sum": {"$cond": [pending, "$total_amount", 0]}},
+            "invoices": {"$sum": 1},
+        }},
+        {"$set": {"factor": factor}},
+        {"$group": {
+            "_id": "$_id.currency",
+            "amount": {"$sum": "$amount"},
+            "pending": {"$sum": "$pending"},
+            "converted_amount": {"$sum": {"$multiply": ["$amount", "$factor"]}},
+            "converted_pending": {"$sum": {"$multiply": ["$pending", "$factor"]}},
+            "invoices": {"$sum": "$invoices"},
+            "unconverted": {"$sum": {"$cond": [{"$eq": ["$factor", None]}, "$invoices", 0]}},
+        }},
+        {"$sort": {"_id": 1}},
+    ]
+
+    by_currency = []
+    total = pending_total = 0.0
+    unconverted = 0
+    async for group in db.invoices.aggregate(pipeline):
+        by_currency.append({
+            "currency": group["_id"],
+            "amount": round(group["amount"], 2),
+            "pending": round(group["pending"], 2),
+            "converted_amount": _converted(group["converted_amount"]),
+            "converted_pending": _converted(group["converted_pending"]),
+            "invoices": group["invoices"],
+        })
+        total += group["converted_amount"]
+        pending_total += group["converted_pending"]
+        unconverted += group["unconverted"]
+
+    return {
+        "start_date": start_date,
+        "end_date": end_date,
+        "base_currency": base_currency,
+        "total": round(total, 2),
+        "pending": round(pending_total, 2),
+        "by_currency": by_currency,
+        "unconverted_invoices": unconverted,
+    }
@@ -0,0 +1,70 @@
+"""Time rounding rules.
+
+A rule turns the tracked (raw) duration of an entry into the billable
+duration stored in `duration`. A project's own rule wins over its client's;
+with neither, time is cut to whole minutes with a one-minute minimum, which is
+how entries were always stored. Rules are compiled to plain functions once
+per distinct rule, and reports only read the stored durations.
+"""
+from .storage import id_match
+
+ROUNDING_MODES = ("down", "up", "nearest")
+DEFAULT_RULE = {"increment": 1, "mode": "down", "minimum": 1}
+
+
+def compile_rule(rule):
+    """Function from raw seconds to billable minutes"""
+    step = rule["increment"] * 60
+    mode = rule.get("mode", "up")
+    minimum = rule.get("minimum", 1)
+    if mode == "up":
+        def steps(seconds):
+            return -(-seconds // step)
+    elif mode == "down":
+        def steps(seconds):
+            return seconds // step
+    elif mode == "nearest":
+        # Halves round up, so 7.5 minutes become 15 on a quarter-hour rule
+        def steps(seconds):
+            return (seconds + step // 2) // step
+    else:
+        raise ValueError(f"Unknown rounding mode {mode}")
+
+    def apply(seconds):
+        return max(int(steps(int(seconds))) * rule["increment"], minimum)
+    return apply
+
+
+class RoundingRules:
+    """Compiled rounding rules, keyed by the rule itself.
+
+    The rule in force is read with the entry's project (and its client when
+    the project has none), so a changed or cleared rule applies to the next
+    write in every worker; only the compiled function is reused.
+    """
+
+    def __init__(self):
+        self._compiled = {}
+
+    def compiled(self, rule):
+        rule = rule or DEFAULT_RULE
+        key = (rule["increment"], rule.get("mode", "up"), rule.get("minimum", 1))
+        if key not in self._compiled:
+            self._compiled[key] = compile_rule(rule)
+        return self._compiled[key]
+
+    async def for_project(self, db, project):
+        rule = project.get("rounding")
+        if rule is None:
+            client = await db.clients.find_one({"id": id_match(project["client_id"])}, {"_id": 0, "rounding": 1})
+            rule = client.get("rounding") if client else None
+        return self.compiled(rule)
+
+
+rounding_rules = RoundingRules()
+
+
+async def entry_durations(db, project, raw_seconds) -> dict:
+    """raw_duration (seconds) and billable duration (minutes) stored on a time entry"""
+    rule = await rounding_rules.for_project(db, project)
+    return {"raw_duration": int(raw_seconds), "duration": rule(raw_seconds)}
@@ -0,0 +1,82 @@
+import asyncio
+
+from .storage import from_storage
+
+# Upper bound on page * page_size, so deep pages cannot force huge sorts
+MAX_SEARCH_WINDOW = 1000
+
+# Result type -> collection, fields to project and how to present a hit
+SEARCH_SOURCES = {
+    "time_entry": {
+        "collection": "time_entries",
+        "fields": ["id", "description", "date", "project_id", "client_id", "project_name"],
+        "title": "description",
+        "snippet": "project_name",
+        "date": "date",
+    },
+    "invoice": {
+        "collection": "invoices",
+        "fields": ["id", "invoice_number", "custom_description", "issue_date", "project_id", "client_id"],
+        "title": "invoice_number",
+        "snippet": "custom_description",
+        "date": "issue_date",
+    },
+    "project": {
+        "collection": "projects",
+        "fields": ["id", "name", "client_id"],
+        "title": "name",
+    },
+    "client": {
+        "collection": "clients",
+        "fields": ["id", "name", "email"],
+        "title": "name",
+        "snippet": "email",
+    },
+}
+
+
+def _to_result(result_type, source, doc):
+    return {
+        "type": result_type,
+        "id": doc["id"],
+        "title": doc.get(source["title"]) or "",
+        "snippet": doc.get(source["snippet"]) if "snippet" in source else None,
+        "score": doc["score"],
+        "date": doc.get(source["date"]) if "date" in source else None,
+        "project_id": doc.get("project_id"),
+        "client_id": doc.get("client_id", doc["id"] if result_type == "client" else None),
+    }
+
+
+async def _search_source(db, result_type, query, limit):
+    source = SEARCH_SOURCES[result_type]
+    collection = db[source["collection"]]
+    text_filter = {"$text": {"$search": query}}
+    projection = {field: 1 for field in source["fields"]}
+    projection.update({"_id": 0, "score": {"$meta": "textScore"}})
+
+    cursor = (
+        collection.find(text_filter, projection)
+        .sort([("score", {"$meta": "textScore"})])
+        .limit(limit)
+    )
+    docs, total = await asyncio.gather(cursor.to_list(limit), collection.count_documents(text_filter))
+    return [_to_result(result_type, source, from_storage(doc)) for doc in docs], total
+
+
+async def search(db, query, types, page, page_size):
+    """Rank text matches across collections and return one page of results"""
+    limit = page * page_size
+    outcomes = await asyncio.gather(*(_search_source(db, t, query, limit) for t in types))
+
+    hits = [hit for results, _ in outcomes for hit in results]
+    hits.sort(key=lambda hit: hit["score"], reverse=True)
+    start = (page - 1) * page_size
+    return {
+        "query": query,
+        "page": page,
+        "page_size": page_size,
+        "total": sum(total for _, total in outcomes),
+        "totals_by_type": {t: total for t, (_, total) in zip(types, outcomes)},
+        "results": hits[start:start + page_size],
+    }
@@ -1,55 +1,82 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, Path, BackgroundTasks, Request
+from fastapi.encoders import jsonable_encoder
 from fastapi.middleware.cors import CORSMiddleware
-from dotenv import load_dotenv
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from fastapi.responses import JSONResponse
+from contextlib import asynccontextmanager
+import asyncio
 import logging
-from pathlib import Path
+import time
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 import uuid
 
-# Import models
-try:
-    from models import (
-        Client, ClientCreate, ClientUpdate,
-        Project, ProjectCreate, ProjectUpdate,
-        TimeEntry, TimeEntryCreate, TimeEntryUpdate,
-        Invoice, InvoiceCreate, InvoiceUpdate,
-        ActiveTimer, ActiveTimerCreate, TimerStartRequest, TimerStopResponse,
-        SuccessResponse, ErrorResponse
-    )
-except ImportError:
-    # For development/testing
-    import sys
-    import os
-    sys.path.append(os.path.dirname(__file__))
-    from models import (
-        Client, ClientCreate, ClientUpdate,
-        Project, ProjectCreate, ProjectUpdate,
-        TimeEntry, TimeEntryCreate, TimeEntryUpdate,
-        Invoice, InvoiceCreate, InvoiceUpdate,
-        ActiveTimer, ActiveTimerCreate, TimerStartRequest, TimerStopResponse,
-        SuccessResponse, ErrorResponse
-    )
-
-ROOT_DIR = Path(__file__).parent
-load_dotenv(ROOT_DIR / '.env')
+from .models import (
+    Client, ClientCreate, ClientUpdate,
+    Project, ProjectCreate, ProjectUpdate,
+    TimeEntry, TimeEntryCreate, TimeEntryUpdate, TimeEntryOverlapReport,
+    Invoice, InvoiceCreate, InvoiceUpdate, InvoiceStatus,
+    ActiveTimer, ActiveTimerCreate, TimerStartRequest, TimerStopResponse,
+    SuccessResponse, ErrorResponse,
+    SearchResponse, BatchRequest, BatchResponse,
+    RateHistoryEntry, RevenueReport, InvoiceTotals,
+    Period, PeriodSnapshot, PeriodSummary, AuditRecord
+)
+from .settings import Settings
+from .database import database
+from .middleware import CompressionMiddleware, CacheControlMiddleware
+from .metrics import MetricsMiddleware, STARTUP_DURATION, metrics_endpoint
+from .tracing import TracingMiddleware
+from .profiling import ProfilingMiddleware, profiling_router
+from .indexes import configure_indexes, ensure_indexes
+from .archive import ArchiveRangeError, delete_archived_entries, find_entries, find_archived_entry, load_catalog
+from .rounding import entry_durations
+from .rates import add_rate, billing, initial_history, last_day_before, rate_on, reprice_entries
+from .periods import (
+    PeriodClosed, locked_periods, open_period_write, period_summaries, periods_between, snapshot_id,
+    periods_router, PERIOD_PATTERN
+)
+from .reports import revenue_report, invoice_totals, REVENUE_GROUPS
+from .exchange_rates import exchange_rates, ExchangeRateError
+from .backup import backup_router
+from .health import EventLoopLagMonitor, ReadinessCheck
+from .search import search, SEARCH_SOURCES, MAX_SEARCH_WINDOW
+from .denormalize import entry_names, cascade_project_names, cascade_client_name
+from .idempotency import IdempotencyMiddleware
+from .audit import AuditLog
+from .webhooks import Dispatcher, Outbox, event, webhooks_router
+from .batch import run_batch, MAX_BATCH_SIZE
+from .fieldsets import parse_fields, projection, sparse_response
+from .storage import storage_format, to_storage, from_storage, id_match, id_not
+from .rate_limit import RateLimitMiddleware, BucketPolicy, LocalBuckets, MongoBuckets
+from .overlaps import (
+    OVERLAP_FIELDS, DayLockTimeout, day_locks, find_overlap, overlap_filter, overlap_policy,
+    sweep_overlaps, to_utc_naive
+)
 
-# MongoDB connection
-mongo_url = os.environ['MONGO_URL']
-client = AsyncIOMotorClient(mongo_url)
-db = client[os.environ['DB_NAME']]
+# The connection is opened on first use, not at import time
+db = database
 
 # Collections
-clients_collection = db.clients
-projects_collection = db.projects
-time_entries_collection = db.time_entries
-invoices_collection = db.invoices
-active_timers_collection = db.active_timers
+clients_collection = database.collection("clients")
+projects_collection = database.collection("projects")
+time_entries_collection = database.collection("time_entries")
+invoices_collection = database.collection("invoices")
+active_timers_collection = database.collection("active_timers")
+idempotency_keys_collection = database.collection("idempotency_keys")
+rate_limits_collection = database.collection("rate_limits")
+audit_log_collection = database.collection("audit_log")
+entry_locks_collection = database.collection("entry_locks")
+
+# Changes to time entries and invoices, written in the background
+audit_log = AuditLog(audit_log_collection)
+
+# Webhook events are stored with the change that causes them and delivered in the background
+outbox = Outbox(database)
+WEBHOOK_INVOICE_STATUSES = ("sent", "paid")
 
-# Create the main app
-app = FastAPI(title="TimeTracker API", version="1.0.0")
+# Snapshots are immutable; a reopened and re-closed month gets a new version
+IMMUTABLE_CACHE_CONTROL = "private, max-age=31536000, immutable"
+MAX_REPORT_PERIODS = 36
 
 # Create a router with the /api prefix
 api_router = APIRouter(prefix="/api")
@@ -61,29 +88,127 @@ def serialize_document(doc):
         return None
     if '_id' in doc:
         del doc['_id']
-    return doc
+    return from_storage(doc)
+
+def cleared_fields(update_model, *fields):
+    """$unset for fields an update sent as an explicit null; fields left out stay as they are"""
+    sent = update_model.dict(exclude_unset=True)
+    unset = {field: "" for field in fields if field in sent and sent[field] is None}
+    return {"$unset": unset} if unset else {}
 
 async def check_client_exists(client_id: str):
     """Check if client exists"""
-    client = await clients_collection.find_one({"id": client_id})
+    client = await clients_collection.find_one({"id": id_match(client_id)})
     if not client:
         raise HTTPException(status_code=404, detail="Client not found")
     return serialize_document(client)
 
 async def check_project_exists(project_id: str):
     """Check if project exists"""
-    project = await projects_collection.find_one({"id": project_id})
+    project = await projects_collection.find_one({"id": id_match(project_id)})
     if not project:
         raise HTTPException(status_code=404, detail="Project not found")
     return serialize_document(project)
 
+def check_time_range(start_time, end_time):
+    """Validate a time range; returns it as naive UTC"""
+    start_time, end_time = to_utc_naive(start_time), to_utc_naive(end_time)
+    if end_time <= start_time:
+        raise HTTPException(status_code=400, detail="End time must be after start time")
+    if end_time - start_time > overlap_policy.max_entry_span:
+        raise HTTPException(status_code=400, detail="Time entry is longer than the maximum allowed span")
+    return start_time, end_time
+
+def overlap_conflict(conflict):
+    return HTTPException(
+        status_code=409,
+        detail=f"Time entry overlaps existing entry {conflict['id']} "
+               f"({conflict['start_time'].isoformat()} - {conflict['end_time'].isoformat()})"
+    )
+
+@asynccontextmanager
+async def entry_days_locked(start_time, end_time):
+    """Serialise writes to the days a time range touches"""
+    if overlap_policy.allow_overlaps:
+        yield
+        return
+    try:
+        async with day_locks(entry_locks_collection, start_time, end_time):
+            yield
+    except DayLockTimeout as e:
+        raise HTTPException(
+            status_code=503,
+            detail=f"Time entries on {e} are being changed, try again",
+            headers={"Retry-After": "1"}
+        )
+
+@asynccontextmanager
+async def no_overlap(start_time, end_time, exclude_id: Optional[str] = None):
+    """Validate a time range and reject it if it overlaps an existing entry.
+
+    The check and the caller's write run under the day locks, so a concurrent
+    write cannot slip an overlapping entry in between them.
+    """
+    if start_time is None or end_time is None:
+        yield
+        return
+    start_time, end_time = check_time_range(start_time, end_time)
+    async with entry_days_locked(start_time, end_time):
+        if not overlap_policy.allow_overlaps:
+            conflict = await find_overlap(time_entries_collection, start_time, end_time, exclude_id)
+            if conflict:
+                raise overlap_conflict(conflict)
+        yield
+
+def invoice_events(before, after):
+    """Webhook events for an invoice that reaches sent or paid"""
+    status = InvoiceStatus(after["status"]).value
+    if status not in WEBHOOK_INVOICE_STATUSES or (before and InvoiceStatus(before["status"]).value == status):
+        return []
+    return [event(f"invoice.{status}", {"invoice": jsonable_encoder(after)})]
+
+@asynccontextmanager
+async def periods_open(*days):
+    """Run a write to time entries dated on the given days, rejecting it if their month is closed"""
+    try:
+        async with open_period_write(db, *days):
+            yield
+    except PeriodClosed as e:
+        raise HTTPException(status_code=409, detail=str(e))
+
+async def apply_rate_change(project, change: dict, background_tasks: BackgroundTasks):
+    """Add a rate to the project's history and reprice the entries it affects"""
+    history, (start, end) = add_rate(project.get("rate_history") or initial_history(project), change)
+    closed = await locked_periods(db, start_day=start, end_day=last_day_before(end))
+    if closed:
+        raise HTTPException(status_code=409, detail=f"Rate change would reprice closed period {', '.join(closed)}")
+    updated = {**project, "rate_history": history}
+    # hourly_rate/currency always show the rate valid today
+    rate, currency = rate_on(updated, datetime.utcnow().strftime("%Y-%m-%d"))
+    update_data = {"rate_history": history, "hourly_rate": rate, "currency": currency, "updated_at": datetime.utcnow()}
+    await projects_collection.update_one({"id": id_match(project["id"])}, {"$set": to_storage(update_data)})
+    updated.update(update_data)
+    # Entries dated after today do not exist yet, so only backdated changes need repricing
+    if (start or "") <= datetime.utcnow().strftime("%Y-%m-%d"):
+        background_tasks.add_task(reprice_entries, db, updated, start, end)
+    return updated
+
 # CLIENT ENDPOINTS
 @api_router.get("/clients", response_model=List[Client])
-async def get_clients():
+async def get_clients(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name")
+):
     """Get all clients"""
     try:
+        field_names = parse_fields(fields, Client)
+        if field_names:
+            clients = await clients_collection.find({}, projection(field_names)).to_list(1000)
+            return sparse_response(Client, field_names, [from_storage(doc) for doc in clients])
+        
         clients = await clients_collection.find().to_list(1000)
         return [serialize_document(client) for client in clients]
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error fetching clients: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -100,7 +225,7 @@ async def create_client(client_data: ClientCreate):
         client = Client(**client_data.dict())
         client_dict = client.dict()
         
-        await clients_collection.insert_one(client_dict)
+        await clients_collection.insert_one(to_storage(client_dict))
         return serialize_document(client_dict)
     except HTTPException:
         raise
@@ -114,16 +239,16 @@ async def get_client(client_id: str):
     return await check_client_exists(client_id)
 
 @api_router.put("/clients/{client_id}", response_model=Client)
-async def update_client(client_id: str, client_data: ClientUpdate):
+async def update_client(client_id: str, client_data: ClientUpdate, background_tasks: BackgroundTasks):
     """Update a client"""
     try:
-        await check_client_exists(client_id)
+        existing_client = await check_client_exists(client_id)
         
         # If email is being updated, check it's not already taken
         if client_data.email:
             existing_client = await clients_collection.find_one({
                 "email": client_data.email,
-                "id": {"$ne": client_id}
+                "id": id_not(client_id)
             })
             if existing_client:
                 raise HTTPException(status_code=400, detail="Client with this email already exists")
@@ -132,11 +257,16 @@ async def update_client(client_id: str, client_data: ClientUpdate):
         update_data["updated_at"] = datetime.utcnow()
         
         await clients_collection.update_one(
-            {"id": client_id},
-            {"$set": update_data}
+            {"id": id_match(client_id)},
+            {"$set": to_storage(update_data), **cleared_fields(client_data, "rounding")}
         )
         
-        updated_client = await clients_collection.find_one({"id": client_id})
+        updated_client = await clients_collection.find_one({"id": id_match(client_id)})
+        
+        # Entries and invoices carry the client name, refresh them off the request path
+        if updated_client["name"] != existing_client["name"]:
+            background_tasks.add_task(cascade_client_name, db, serialize_document(dict(updated_client)))
+        
         return serialize_document(updated_client)
     except HTTPException:
         raise
@@ -151,11 +281,11 @@ async def delete_client(client_id: str):
         await check_client_exists(client_id)
         
         # Check if client has projects
-        projects = await projects_collection.find({"client_id": client_id}).to_list(1)
+        projects = await projects_collection.find({"client_id": id_match(client_id)}).to_list(1)
         if projects:
             raise HTTPException(status_code=400, detail="Cannot delete client with existing projects")
         
-        result = await clients_collection.delete_one({"id": client_id})
+        result = await clients_collection.delete_one({"id": id_match(client_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Client not found")
@@ -169,11 +299,20 @@ async def delete_client(client_id: str):
 
 # PROJECT ENDPOINTS
 @api_router.get("/projects", response_model=List[Project])
-async def get_projects():
+async def get_projects(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name")
+):
     """Get all projects"""
     try:
+        field_names = parse_fields(fields, Project)
+        if field_names:
+            projects = await projects_collection.find({}, projection(field_names)).to_list(1000)
+            return sparse_response(Project, field_names, [from_storage(doc) for doc in projects])
+        
         projects = await projects_collection.find().to_list(1000)
         return [serialize_document(project) for project in projects]
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error fetching projects: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -186,9 +325,10 @@ async def create_project(project_data: ProjectCreate):
         await check_client_exists(project_data.client_id)
         
         project = Project(**project_data.dict())
+        project.rate_history = [RateHistoryEntry(**rate) for rate in initial_history(project.dict())]
         project_dict = project.dict()
         
-        await projects_collection.insert_one(project_dict)
+        await projects_collection.insert_one(to_storage(project_dict))
         return serialize_document(project_dict)
     except HTTPException:
         raise
@@ -202,10 +342,10 @@ async def get_project(project_id: str):
     return await check_project_exists(project_id)
 
 @api_router.put("/projects/{project_id}", response_model=Project)
-async def update_project(project_id: str, project_data: ProjectUpdate):
+async def update_project(project_id: str, project_data: ProjectUpdate, background_tasks: BackgroundTasks):
     """Update a project"""
     try:
-        await check_project_exists(project_id)
+        existing_project = await check_project_exists(project_id)
         
         # If client_id is being updated, verify new client exists
         if project_data.client_id:
@@ -214,19 +354,45 @@ async def update_project(project_id: str, project_data: ProjectUpdate):
         update_data = {k: v for k, v in project_data.dict().items() if v is not None}
         update_data["updated_at"] = datetime.utcnow()
         
+        # A new rate or currency takes effect today and is kept in the rate history
+        rate = update_data.pop("hourly_rate", existing_project["hourly_rate"])
+        currency = update_data.pop("currency", existing_project.get("currency") or "EUR")
+        
+        if rate != existing_project["hourly_rate"] or currency != (existing_project.get("currency") or "EUR"):
+            change = {"rate": rate, "currency": currency, "valid_from": datetime.utcnow().strftime("%Y-%m-%d")}
+            await apply_rate_change({**existing_project, **update_data}, change, background_tasks)
+        
         await projects_collection.update_one(
-            {"id": project_id},
-            {"$set": update_data}
+            {"id": id_match(project_id)},
+            {"$set": to_storage(update_data), **cleared_fields(project_data, "rounding")}
         )
         
-        updated_project = await projects_collection.find_one({"id": project_id})
-        return serialize_document(updated_project)
+        updated_project = serialize_document(await projects_collection.find_one({"id": id_match(project_id)}))
+        
+        # Entries and invoices carry the project/client names, refresh them off the request path
+        if (updated_project["name"] != existing_project["name"]
+                or updated_project["client_id"] != existing_project["client_id"]):
+            background_tasks.add_task(cascade_project_names, db, updated_project)
+        
+        return updated_project
     except HTTPException:
         raise
     except Exception as e:
         logging.error(f"Error updating project: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@api_router.post("/projects/{project_id}/rates", response_model=Project)
+async def add_project_rate(project_id: str, rate: RateHistoryEntry, background_tasks: BackgroundTasks):
+    """Add or replace a rate valid from a date; backdated rates reprice the affected entries"""
+    try:
+        project = await check_project_exists(project_id)
+        return await apply_rate_change(project, rate.dict(), background_tasks)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error adding project rate: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @api_router.delete("/projects/{project_id}", response_model=SuccessResponse)
 async def delete_project(project_id: str):
     """Delete a project"""
@@ -234,15 +400,20 @@ async def delete_project(project_id: str):
         await check_project_exists(project_id)
         
         # Check if project has time entries
-        time_entries = await time_entries_collection.find({"project_id": project_id}).to_list(1)
+        time_entries = await time_entries_collection.find({"project_id": id_match(project_id)}).to_list(1)
         if time_entries:
             raise HTTPException(status_code=400, detail="Cannot delete project with existing time entries")
         
-        result = await projects_collection.delete_one({"id": project_id})
+        result = await projects_collection.delete_one({"id": id_match(project_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Project not found")
         
+        # Archived entries cannot change any more, but must not outlive their project
+        archived = await delete_archived_entries(db, await load_catalog(db), {"project_id": id_match(project_id)})
+        if archived:
+            logging.info(f"Deleted {archived} archived time entries of project {project_id}")
+        
         return SuccessResponse(message="Project deleted successfully")
     except HTTPException:
         raise
@@ -252,11 +423,35 @@ async def delete_project(project_id: str):
 
 # TIME ENTRY ENDPOINTS
 @api_router.get("/time-entries", response_model=List[TimeEntry])
-async def get_time_entries():
-    """Get all time entries"""
+async def get_time_entries(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name"),
+    start_date: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}-\d{2}$'),
+    end_date: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}-\d{2}$')
+):
+    """Get time entries, optionally between two dates (inclusive).
+
+    Archived entries are listed for ranges reaching into the archives; without any date only
+    the hot collection is listed.
+    """
     try:
-        time_entries = await time_entries_collection.find().to_list(1000)
+        field_names = parse_fields(fields, TimeEntry)
+        time_entries = await find_entries(
+            time_entries_collection,
+            db,
+            await load_catalog(db),
+            {},
+            projection(field_names) if field_names else None,
+            start_date,
+            end_date
+        )
+        if field_names:
+            return sparse_response(TimeEntry, field_names, [from_storage(doc) for doc in time_entries])
+        
         return [serialize_document(entry) for entry in time_entries]
+    except HTTPException:
+        raise
+    except ArchiveRangeError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logging.error(f"Error fetching time entries: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -266,12 +461,22 @@ async def create_time_entry(time_entry_data: TimeEntryCreate):
     """Create a new time entry"""
     try:
         # Verify project exists
-        await check_project_exists(time_entry_data.project_id)
+        project = await check_project_exists(time_entry_data.project_id)
         
-        time_entry = TimeEntry(**time_entry_data.dict())
+        time_entry_dict = time_entry_data.dict()
+        time_entry_dict.update(await entry_durations(db, project, time_entry_data.duration * 60))
+        time_entry = TimeEntry(
+            **time_entry_dict,
+            **await entry_names(db, project),
+            **billing(project, time_entry_dict["duration"], time_entry_data.date)
+        )
         time_entry_dict = time_entry.dict()
         
-        await time_entries_collection.insert_one(time_entry_dict)
+        async with periods_open(time_entry_data.date), no_overlap(
+            time_entry_data.start_time, time_entry_data.end_time
+        ):
+            await time_entries_collection.insert_one(to_storage(time_entry_dict))
+        audit_log.record("time_entry", "create", time_entry_dict["id"], after=time_entry_dict)
         return serialize_document(time_entry_dict)
     except HTTPException:
         raise
@@ -279,11 +484,42 @@ async def create_time_entry(time_entry_data: TimeEntryCreate):
         logging.error(f"Error creating time entry: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+@api_router.get("/time-entries/overlaps", response_model=TimeEntryOverlapReport)
+async def get_time_entry_overlaps(
+    start_date: str = Query(..., pattern=r'^\d{4}-\d{2}-\d{2}$'),
+    end_date: str = Query(..., pattern=r'^\d{4}-\d{2}-\d{2}$')
+):
+    """Find every pair of overlapping time entries between two dates (inclusive)"""
+    try:
+        range_start = datetime.strptime(start_date, "%Y-%m-%d")
+        range_end = datetime.strptime(end_date, "%Y-%m-%d") + timedelta(days=1)
+        if range_end <= range_start:
+            raise HTTPException(status_code=400, detail="end_date must not be before start_date")
+        
+        entries = await database.analytics.time_entries.find(
+            overlap_filter(range_start, range_end), OVERLAP_FIELDS
+        ).sort("start_time", 1).to_list(None)
+        entries = [from_storage(entry) for entry in entries]
+        
+        return {
+            "start_date": start_date,
+            "end_date": end_date,
+            "entries_checked": len(entries),
+            "conflicts": sweep_overlaps(entries)
+        }
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error finding overlapping time entries: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
 @api_router.get("/time-entries/{entry_id}", response_model=TimeEntry)
 async def get_time_entry(entry_id: str):
     """Get a specific time entry"""
     try:
-        time_entry = await time_entries_collection.find_one({"id": entry_id})
+        time_entry = await time_entries_collection.find_one({"id": id_match(entry_id)})
+        if not time_entry:
+            time_entry = await find_archived_entry(db, await load_catalog(db), entry_id)
         if not time_entry:
             raise HTTPException(status_code=404, detail="Time entry not found")
         return serialize_document(time_entry)
@@ -298,24 +534,53 @@ async def update_time_entry(entry_id: str, time_entry_data: TimeEntryUpdate):
     """Update a time entry"""
     try:
         # Check if time entry exists
-        existing_entry = await time_entries_collection.find_one({"id": entry_id})
+        existing_entry = serialize_document(await time_entries_collection.find_one({"id": id_match(entry_id)}))
         if not existing_entry:
             raise HTTPException(status_code=404, detail="Time entry not found")
         
-        # If project_id is being updated, verify new project exists
-        if time_entry_data.project_id:
-            await check_project_exists(time_entry_data.project_id)
-        
         update_data = {k: v for k, v in time_entry_data.dict().items() if v is not None}
         update_data["updated_at"] = datetime.utcnow()
         
-        await time_entries_collection.update_one(
-            {"id": entry_id},
-            {"$set": update_data}
-        )
+        # If project_id is being updated, verify new project exists
+        project = None
+        if time_entry_data.project_id and time_entry_data.project_id != existing_entry["project_id"]:
+            project = await check_project_exists(time_entry_data.project_id)
+            update_data.update(await entry_names(db, project))
+        
+        # Round an edited duration; a new project re-rounds the tracked time with its own rule
+        if update_data.get("duration") == existing_entry["duration"]:
+            del update_data["duration"]
+        if project or "duration" in update_data:
+            project = project or await check_project_exists(existing_entry["project_id"])
+            raw_seconds = update_data["duration"] * 60 if "duration" in update_data else (
+                existing_entry.get("raw_duration") or existing_entry["duration"] * 60
+            )
+            update_data.update(await entry_durations(db, project, raw_seconds))
+        
+        # Reprice when anything the amount depends on changes
+        if project or "duration" in update_data or "date" in update_data:
+            project = project or await check_project_exists(existing_entry["project_id"])
+            update_data.update(billing(
+                project,
+                update_data.get("duration", existing_entry["duration"]),
+                update_data.get("date", existing_entry["date"])
+            ))
+        
+        # Only a moved range needs the overlap check
+        moved = "start_time" in update_data or "end_time" in update_data
+        async with periods_open(existing_entry["date"], update_data.get("date")), no_overlap(
+            update_data.get("start_time", existing_entry.get("start_time")) if moved else None,
+            update_data.get("end_time", existing_entry.get("end_time")) if moved else None,
+            exclude_id=entry_id
+        ):
+            await time_entries_collection.update_one(
+                {"id": id_match(entry_id)},
+                {"$set": to_storage(update_data)}
+            )
         
-        updated_entry = await time_entries_collection.find_one({"id": entry_id})
-        return serialize_document(updated_entry)
+        updated_entry = serialize_document(await time_entries_collection.find_one({"id": id_match(entry_id)}))
+        audit_log.record("time_entry", "update", entry_id, before=existing_entry, after=updated_entry)
+        return updated_entry
     except HTTPException:
         raise
     except Exception as e:
@@ -326,11 +591,15 @@ async def update_time_entry(entry_id: str, time_entry_data: TimeEntryUpdate):
 async def delete_time_entry(entry_id: str):
     """Delete a time entry"""
     try:
-        result = await time_entries_collection.delete_one({"id": entry_id})
+        entry = serialize_document(await time_entries_collection.find_one({"id": id_match(entry_id)}))
+        
+        async with periods_open(entry["date"] if entry else None):
+            result = await time_entries_collection.delete_one({"id": id_match(entry_id)})
         
         if result.deleted_count == 0:
             raise HTTPException(status_code=404, detail="Time entry not found")
         
+        audit_log.record("time_entry", "delete", entry_id, before=entry)
         return SuccessResponse(message="Time entry deleted successfully")
     except HTTPException:
         raise
@@ -363,7 +632,7 @@ async def start_timer(timer_data: TimerStartRequest):
         timer = ActiveTimer(**timer_data.dict())
         timer_dict = timer.dict()
         
-        await active_timers_collection.insert_one(timer_dict)
+        await active_timers_collection.insert_one(to_storage(timer_dict))
         return serialize_document(timer_dict)
     except HTTPException:
         raise
@@ -376,39 +645,70 @@ async def stop_timer():
     """Stop the active timer and create a time entry"""
     try:
         # Get active timer
-        timer = await active_timers_collection.find_one()
+        timer = serialize_document(await active_timers_collection.find_one())
         if not timer:
             raise HTTPException(status_code=404, detail="No active timer found")
         
-        # Calculate duration
-        end_time = datetime.utcnow()
-        start_time = timer["start_time"]
-        duration_minutes = int((end_time - start_time).total_seconds() / 60)
-        
-        if duration_minutes < 1:
-            duration_minutes = 1  # Minimum 1 minute
-        
-        # Create time entry
-        time_entry_data = {
-            "project_id": timer["project_id"],
-            "description": timer["description"],
-            "start_time": start_time,
-            "end_time": end_time,
-            "duration": duration_minutes,
-            "date": start_time.strftime("%Y-%m-%d"),
-            "is_manual": False
-        }
-        
-        time_entry = TimeEntry(**time_entry_data)
-        time_entry_dict = time_entry.dict()
+        start_time = to_utc_naive(timer["start_time"])
+        # A timer left running past the maximum span stops at its limit
+        end_time = min(datetime.utcnow(), start_time + overlap_policy.max_entry_span)
+        if end_time <= start_time:
+            raise HTTPException(status_code=400, detail="Timer has not been running yet")
         
-        await time_entries_collection.insert_one(time_entry_dict)
+        project = serialize_document(await projects_collection.find_one({"id": id_match(timer["project_id"])}))
+        names = await entry_names(db, project) if project else {}
+        message = "Timer stopped successfully"
         
-        # Delete the timer
-        await active_timers_collection.delete_one({"id": timer["id"]})
+        async with periods_open(start_time.strftime("%Y-%m-%d")), entry_days_locked(start_time, end_time):
+            conflict = None
+            if not overlap_policy.allow_overlaps:
+                conflict = await find_overlap(time_entries_collection, start_time, end_time)
+            if conflict and conflict["start_time"] <= start_time:
+                # Nothing before the conflict to keep; the timer stays running until it is resolved
+                raise HTTPException(
+                    status_code=409,
+                    detail=f"The running timer overlaps time entry {conflict['id']} "
+                           f"({conflict['start_time'].isoformat()} - {conflict['end_time'].isoformat()}), "
+                           f"which covers its start; shorten or delete that entry, then stop the timer again"
+                )
+            if conflict:
+                # Keep the time tracked up to the next entry
+                end_time = conflict["start_time"]
+                message = f"Timer stopped at {end_time.isoformat()}, where time entry {conflict['id']} begins"
+            raw_seconds = (end_time - start_time).total_seconds()
+            
+            # Create time entry
+            time_entry_data = {
+                "project_id": timer["project_id"],
+                "description": timer["description"],
+                "start_time": start_time,
+                "end_time": end_time,
+                "raw_duration": int(raw_seconds),
+                "duration": max(int(raw_seconds / 60), 1),  # Minimum 1 minute
+                "date": start_time.strftime("%Y-%m-%d"),
+                "is_manual": False
+            }
+            
+            if project:
+                # The project's (or client's) rounding rule decides the billable duration
+                time_entry_data.update(await entry_durations(db, project, raw_seconds))
+                time_entry_data.update(names)
+                time_entry_data.update(billing(project, time_entry_data["duration"], time_entry_data["date"]))
+            
+            time_entry = TimeEntry(**time_entry_data)
+            time_entry_dict = time_entry.dict()
+            
+            async def save(session):
+                await time_entries_collection.insert_one(to_storage(time_entry_dict), session=session)
+                # Delete the timer
+                await active_timers_collection.delete_one({"id": id_match(timer["id"])}, session=session)
+            
+            stopped = event("timer.stopped", {"time_entry": jsonable_encoder(time_entry_dict)})
+            await outbox.write(save, [stopped])
+        audit_log.record("time_entry", "create", time_entry_dict["id"], after=time_entry_dict)
         
         return TimerStopResponse(
-            message="Timer stopped successfully",
+            message=message,
             time_entry=serialize_document(time_entry_dict)
         )
     except HTTPException:
@@ -419,11 +719,20 @@ async def stop_timer():
 
 # INVOICE ENDPOINTS
 @api_router.get("/invoices", response_model=List[Invoice])
-async def get_invoices():
+async def get_invoices(
+    fields: Optional[str] = Query(None, description="Comma-separated fields to return, e.g. id,name")
+):
     """Get all invoices"""
     try:
+        field_names = parse_fields(fields, Invoice)
+        if field_names:
+            invoices = await invoices_collection.find({}, projection(field_names)).to_list(1000)
+            return sparse_response(Invoice, field_names, [from_storage(doc) for doc in invoices])
+        
         invoices = await invoices_collection.find().to_list(1000)
         return [serialize_document(invoice) for invoice in invoices]
+    except HTTPException:
+        raise
     except Exception as e:
         logging.error(f"Error fetching invoices: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
@@ -433,18 +742,22 @@ async def create_invoice(invoice_data: InvoiceCreate):
     """Create a new invoice"""
     try:
         # Verify client and project exist
-        await check_client_exists(invoice_data.client_id)
-        await check_project_exists(invoice_data.project_id)
+        client = await check_client_exists(invoice_data.client_id)
+        project = await check_project_exists(invoice_data.project_id)
         
         # Check if invoice number already exists
         existing_invoice = await invoices_collection.find_one({"invoice_number": invoice_data.invoice_number})
         if existing_invoice:
             raise HTTPException(status_code=400, detail="Invoice number already exists")
         
-        invoice = Invoice(**invoice_data.dict())
+        invoice = Invoice(**invoice_data.dict(), project_name=project["name"], client_name=client["name"])
         invoice_dict = invoice.dict()
         
-        await invoices_collection.insert_one(invoice_dict)
+        async def save(session):
+            await invoices_collection.insert_one(to_storage(invoice_dict), session=session)
+        
+        await outbox.write(save, invoice_events(None, invoice_dict))
+        audit_log.record("invoice", "create", invoice_dict["id"], after=invoice_dict)
         return serialize_document(invoice_dict)
     except HTTPException:
         raise
@@ -456,7 +769,7 @@ async def create_invoice(invoice_data: InvoiceCreate):
 async def get_invoice(invoice_id: str):
     """Get a specific invoice"""
     try:
-        invoice = await invoices_collection.find_one({"id": invoice_id})
+        invoice = await invoices_collection.find_one({"id": id_match(invoice_id)})
         if not invoice:
             raise HTTPException(status_code=404, detail="Invoice not found")
         return serialize_document(invoice)
@@ -471,35 +784,45 @@ async def update_invoice(invoice_id: str, invoice_data: InvoiceUpdate):
     """Update an invoice"""
     try:
         # Check if invoice exists
-        existing_invoice = await invoices_collection.find_one({"id": invoice_id})
+        existing_invoice = await invoices_collection.find_one({"id": id_match(invoice_id)})
         if not existing_invoice:
             raise HTTPException(status_code=404, detail="Invoice not found")
         
         # If client_id or project_id is being updated, verify they exist
+        names = {}
         if invoice_data.client_id:
-            await check_client_exists(invoice_data.client_id)
+            names["client_name"] = (await check_client_exists(invoice_data.client_id))["name"]
         if invoice_data.project_id:
-            await check_project_exists(invoice_data.project_id)
+            names["project_name"] = (await check_project_exists(invoice_data.project_id))["name"]
         
         # If invoice number is being updated, check it's not already taken
         if invoice_data.invoice_number:
             existing_number = await invoices_collection.find_one({
                 "invoice_number": invoice_data.invoice_number,
-                "id": {"$ne": invoice_id}
+                "id": id_not(invoice_id)
             })
             if existing_number:
                 raise HTTPException(status_code=400, detail="Invoice number already exists")
         
         update_data = {k: v for k, v in invoice_data.dict().items() if v is not None}
+        update_data.update(names)
         update_data["updated_at"] = datetime.utcnow()
         
-        await invoices_collection.update_one(
-            {"id": invoice_id},
-            {"$set": update_data}
-        )
+        async def save(session):
+            await invoices_collection.update_one(
+                {"id": id_match(invoice_id)},
+                {"$set": to_storage(update_data)},
+                session=session
+            )
+        
+        existing_invoice = serialize_document(existing_invoice)
+        await outbox.write(save, invoice_events(existing_invoice, {**existing_invoice, **update_data}))
         
-        updated_invoice = await invoices_collection.find_one({"id": invoice_id})
-        return serialize_document(updated_invoice)
+        updated_invoice = serialize_document(await invoices_collection.find_one({"id": id_match(invoice_id)}))
+        audit_log.record(
+            "invoice", "update", invoice_id, before=existing_invoice, after=updated_invoice
+        )
+        return updated_invoice
     except HTTPException:
         raise
     except Exception as e:
@@ -510,11 +833,12 @@ async def update_invoice(invoice_id: str, invoice_data: InvoiceUpdate):
 async def delete_invoice(invoice_id: str):
     """Delete an invoice"""
     try:
-        result = await invoices_collection.delete_one({"id": invoice_id})
+        invoice = await invoices_collection.find_one_and_delete({"id": id_match(invoice_id)})
         
-        if result.deleted_count == 0:
+        if not invoice:
             raise HTTPException(status_code=404, detail="Invoice not found")
         
+        audit_log.record("invoice", "delete", invoice_id, before=serialize_document(invoice))
         return SuccessResponse(message="Invoice deleted successfully")
     except HTTPException:
         raise
@@ -522,29 +846,165 @@ async def delete_invoice(invoice_id: str):
         logging.error(f"Error deleting invoice: {e}")
         raise HTTPException(status_code=500, detail="Internal server error")
 
+# REPORT ENDPOINTS
+@api_router.get("/reports/revenue", response_model=RevenueReport)
+async def get_revenue_report(
+    request: Request,
+    start_date: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}-\d{2}$'),
+    end_date: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}-\d{2}$'),
+    group_by: str = Query("project", pattern="^(" + "|".join(REVENUE_GROUPS) + ")$"),
+    base_currency: Optional[str] = Query(None, pattern=r'^[A-Z]{3}$')
+):
+    """Revenue between two dates (inclusive) per project, client or month and currency"""
+    try:
+        base_currency = base_currency or request.app.state.settings.base_currency
+        return await revenue_report(
+            database.analytics, await load_catalog(db), start_date, end_date, group_by, base_currency
+        )
+    except ExchangeRateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error building revenue report: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/reports/invoices", response_model=InvoiceTotals)
+async def get_invoice_totals(
+    request: Request,
+    start_date: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}-\d{2}$'),
+    end_date: Optional[str] = Query(None, pattern=r'^\d{4}-\d{2}-\d{2}$'),
+    base_currency: Optional[str] = Query(None, pattern=r'^[A-Z]{3}$')
+):
+    """Invoiced and outstanding totals by issue date, converted to one base currency"""
+    try:
+        base_currency = base_currency or request.app.state.settings.base_currency
+        return await invoice_totals(database.analytics, start_date, end_date, base_currency)
+    except ExchangeRateError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logging.error(f"Error building invoice totals: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/reports/periods", response_model=List[PeriodSummary])
+async def get_period_report(
+    start: str = Query(..., pattern=PERIOD_PATTERN),
+    end: str = Query(..., pattern=PERIOD_PATTERN)
+):
+    """Monthly totals per project and client; closed months come from their snapshots"""
+    try:
+        if end < start:
+            raise HTTPException(status_code=400, detail="end must not be before start")
+        if len(periods_between(start, end)) > MAX_REPORT_PERIODS:
+            raise HTTPException(status_code=400, detail=f"At most {MAX_REPORT_PERIODS} months per report")
+        return await period_summaries(database.analytics, await load_catalog(db), start, end)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error building period report: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# PERIOD ENDPOINTS
+@api_router.get("/periods", response_model=List[Period])
+async def get_periods():
+    """Months that have been closed, with their current snapshot version"""
+    try:
+        periods = await db.periods.find().sort("_id", -1).to_list(1000)
+        return [{"period": period.pop("_id"), **period} for period in periods]
+    except Exception as e:
+        logging.error(f"Error fetching periods: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+@api_router.get("/periods/{period}/snapshots/{version}", response_model=PeriodSnapshot)
+async def get_period_snapshot(period: str = Path(..., pattern=PERIOD_PATTERN), version: int = Path(..., ge=1)):
+    """A period snapshot; it never changes, so clients may cache it forever"""
+    try:
+        snapshot = await database.analytics.period_snapshots.find_one({"_id": snapshot_id(period, version)})
+        if not snapshot:
+            raise HTTPException(status_code=404, detail="Snapshot not found")
+        del snapshot["_id"]
+        return JSONResponse(
+            content=jsonable_encoder(PeriodSnapshot(**snapshot)),
+            headers={"Cache-Control": IMMUTABLE_CACHE_CONTROL}
+        )
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error fetching period snapshot: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# AUDIT ENDPOINTS
+@api_router.get("/audit/{entity_id}", response_model=List[AuditRecord])
+async def get_audit_log(entity_id: str, limit: int = Query(100, ge=1, le=1000)):
+    """Recorded changes of a time entry or invoice, newest first"""
+    try:
+        records = await audit_log_collection.find(
+            {"entity_id": entity_id}, {"_id": 0}
+        ).sort("at", -1).limit(limit).to_list(limit)
+        return records
+    except Exception as e:
+        logging.error(f"Error fetching audit log: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# SEARCH ENDPOINT
+@api_router.get("/search", response_model=SearchResponse)
+async def search_all(
+    q: str = Query(..., min_length=1, max_length=200),
+    types: Optional[str] = Query(None, description="Comma-separated subset of time_entry,invoice,project,client"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=100)
+):
+    """Full-text search over time entries, invoices, projects and clients"""
+    try:
+        search_types = [t.strip() for t in types.split(",") if t.strip()] if types else list(SEARCH_SOURCES)
+        unknown = [t for t in search_types if t not in SEARCH_SOURCES]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown search types: {', '.join(unknown)}")
+        if page * page_size > MAX_SEARCH_WINDOW:
+            raise HTTPException(status_code=400, detail="Search window too large, narrow the query")
+        
+        return await search(database.analytics, q, search_types, page, page_size)
+    except HTTPException:
+        raise
+    except Exception as e:
+        logging.error(f"Error searching: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+# BATCH ENDPOINT
+@api_router.post("/batch", response_model=BatchResponse)
+async def batch(batch_request: BatchRequest, request: Request):
+    """Run several GET requests concurrently and return all responses in one body"""
+    if len(batch_request.requests) > MAX_BATCH_SIZE:
+        raise HTTPException(status_code=400, detail=f"A batch may contain at most {MAX_BATCH_SIZE} requests")
+    if any(sub.path.split("?")[0].rstrip("/") == "/batch" for sub in batch_request.requests):
+        raise HTTPException(status_code=400, detail="Batches cannot be nested")
+    
+    return BatchResponse(responses=await run_batch(request.scope, batch_request.requests))
+
 # Health check endpoint
 @api_router.get("/health")
 async def health_check():
     """Health check endpoint"""
-    return {"status": "healthy", "timestamp": datetime.utcnow().isoformat()}
+    return {
+        "status": "healthy",
+        "timestamp": datetime.utcnow().isoformat(),
+        "mongodb_pools": database.pool_stats()
+    }
+
+@api_router.get("/health/live")
+async def liveness():
+    """Liveness probe: the process is up and its event loop is serving requests"""
+    return {"status": "alive", "timestamp": datetime.utcnow().isoformat()}
+
+@api_router.get("/health/ready")
+async def readiness(request: Request):
+    """Readiness probe: MongoDB reachable, indexes present, pools and event loop not saturated"""
+    ready, details = await request.app.state.readiness.result()
+    return JSONResponse(details, status_code=200 if ready else 503)
 
 # Root endpoint
 @api_router.get("/")
 async def root():
     return {"message": "TimeTracker API is running"}
 
-# Include the router in the main app
-app.include_router(api_router)
-
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_credentials=True,
-    allow_origins=["*"],
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
-
 # Configure logging
 logging.basicConfig(
     level=logging.INFO,
@@ -552,6 +1012,151 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
-@app.on_event("shutdown")
-async def shutdown_db_client():
-    client.close()
+async def create_indexes():
+    try:
+        await ensure_indexes(db)
+    except Exception as e:
+        logging.error(f"Error creating indexes: {e}")
+
+def create_app(settings: Optional[Settings] = None) -> FastAPI:
+    """Build the application; nothing connects to MongoDB until the first query"""
+    started = time.perf_counter()
+    settings = settings or Settings.from_env()
+    database.configure(settings)
+    storage_format.configure(settings.storage_format == "compact", settings.storage_legacy_reads)
+    configure_indexes(settings.search_language, settings.idempotency_key_ttl_hours, settings.audit_retention_days)
+    audit_log.configure(settings.audit_batch_size, settings.audit_queue_size)
+    exchange_rates.configure(settings.exchange_rates_file, settings.exchange_rates_reference)
+    overlap_policy.configure(
+        settings.max_time_entry_hours,
+        settings.allow_overlapping_time_entries,
+        settings.time_entry_lock_wait_seconds,
+    )
+
+    loop_monitor = EventLoopLagMonitor()
+    outbox.configure(settings.webhook_endpoints)
+    dispatcher = Dispatcher(
+        database,
+        outbox,
+        max_attempts=settings.webhook_max_attempts,
+        backoff_seconds=settings.webhook_backoff_seconds,
+        max_backoff_seconds=settings.webhook_max_backoff_seconds,
+        timeout_seconds=settings.webhook_timeout_seconds,
+    )
+
+    @asynccontextmanager
+    async def lifespan(app: FastAPI):
+        loop_monitor.start()
+        audit_log.start()
+        dispatcher.start()
+        # Index builds can take a while on large collections; never hold up startup for them
+        index_task = asyncio.create_task(create_indexes()) if settings.ensure_indexes_on_startup else None
+        startup_seconds = time.perf_counter() - started
+        STARTUP_DURATION.set(startup_seconds)
+        logger.info(f"Startup completed in {startup_seconds * 1000:.0f} ms")
+        yield
+        if index_task is not None and not index_task.done():
+            index_task.cancel()
+        await loop_monitor.stop()
+        await dispatcher.stop()
+        # Queued audit records still need the database
+        await audit_log.stop()
+        database.close()
+
+    app = FastAPI(title="TimeTracker API", version="1.0.0", lifespan=lifespan)
+    app.state.settings = settings
+    app.state.readiness = ReadinessCheck(
+        database,
+        loop_monitor,
+        cache_seconds=settings.health_cache_seconds,
+        ping_timeout=settings.health_ping_timeout_ms / 1000,
+        max_pool_utilization=settings.health_max_pool_utilization,
+        max_loop_lag_ms=settings.health_max_loop_lag_ms,
+    )
+
+    app.include_router(api_router)
+    # Admin-only full backup and restore
+    app.include_router(backup_router)
+    # Admin-only closing and reopening of accounting periods
+    app.include_router(periods_router)
+    # Admin-only webhook outbox status and retries
+    app.include_router(webhooks_router)
+
+    # Prometheus scrape endpoint, outside /api so it is not exposed through the proxy
+    app.add_api_route("/metrics", metrics_endpoint, methods=["GET"], include_in_schema=False)
+
+    # On-demand profiling is opt-in; when disabled neither the route nor its middleware exist
+    if settings.profiling_enabled:
+        app.include_router(profiling_router)
+        app.add_middleware(ProfilingMiddleware)
+
+    # Innermost, so stored responses are uncompressed and free of CORS headers
+    # Restore uploads are streamed to disk and must not be buffered for replay
+    app.add_middleware(
+        IdempotencyMiddleware,
+        collection=idempotency_keys_collection,
+        excluded_paths=("/api/batch", "/api/admin/restore"),
+    )
+
+    # Token-bucket rate limiting and load shedding for expensive routes; inside
+    # CORS, so browsers can read its 429 responses and their Retry-After
+    if settings.rate_limit_enabled:
+        app.add_middleware(
+            RateLimitMiddleware,
+            policies={
+                "cheap": BucketPolicy(
+                    rate=settings.rate_limit_cheap_per_second,
+                    burst=settings.rate_limit_cheap_burst,
+                ),
+                "expensive": BucketPolicy(
+                    rate=settings.rate_limit_expensive_per_second,
+                    burst=settings.rate_limit_expensive_burst,
+                ),
+            },
+            max_concurrent_expensive=settings.max_concurrent_expensive_requests,
+            buckets=(
+                MongoBuckets(rate_limits_collection)
+                if settings.rate_limit_backend == "mongo"
+                else LocalBuckets()
+            ),
+            trusted_proxies=settings.trusted_proxies,
+            api_keys=settings.rate_limit_api_keys,
+            exempt_api_keys=settings.rate_limit_exempt_api_keys,
+        )
+
+    # CORS middleware
+    app.add_middleware(
+        CORSMiddleware,
+        allow_credentials=True,
+        allow_origins=["*"],
+        allow_methods=["*"],
+        allow_headers=["*"],
+        expose_headers=["X-Request-ID", "Server-Timing", "Idempotent-Replayed", "Retry-After"],
+    )
+
+    # Per-route Cache-Control/ETag handling runs inside compression so ETags are
+    # computed over the uncompressed body
+    app.add_middleware(
+        CacheControlMiddleware,
+        rules=settings.cache_control_rules,
+        default_policy=settings.cache_control_default,
+    )
+    app.add_middleware(
+        CompressionMiddleware,
+        minimum_size=settings.compression_minimum_size,
+        gzip_level=settings.compression_gzip_level,
+        brotli_quality=settings.compression_brotli_quality,
+    )
+
+    app.add_middleware(
+        TracingMiddleware,
+        slow_request_threshold_ms=settings.slow_request_threshold_ms,
+    )
+
+    # Outermost, so latency includes compression and every other middleware
+    app.add_middleware(MetricsMiddleware)
+
+    return app
+
+# ASGI entry point for uvicorn backend.server:app
+app = create_app()
@@ -0,0 +1,177 @@
+import os
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Optional, Tuple
+
+from dotenv import load_dotenv
+
+from .middleware import DEFAULT_CACHE_CONTROL_RULES, cache_control_rules_from_env
+from .webhooks import webhook_endpoints_from_env
+
+ROOT_DIR = Path(__file__).parent
+
+
+def _flag(environ, name: str, default: str) -> bool:
+    return environ.get(name, default).lower() in ("1", "true", "yes")
+
+
+def _list(environ, name: str, default: str) -> Tuple[str, ...]:
+    return tuple(item.strip() for item in environ.get(name, default).split(",") if item.strip())
+
+
+@dataclass(frozen=True)
+class Settings:
+    """Server configuration; every field has a default so the app can be built without an environment"""
+
+    mongo_url: Optional[str] = None
+    db_name: Optional[str] = None
+
+    # Connection pool for API reads and writes (primary)
+    mongo_max_pool_size: int = 100
+    mongo_min_pool_size: int = 0
+    mongo_max_idle_time_ms: int = 300000
+    mongo_max_connecting: int = 2
+    mongo_wait_queue_timeout_ms: int = 5000
+    mongo_connect_timeout_ms: int = 5000
+    mongo_server_selection_timeout_ms: int = 10000
+    mongo_socket_timeout_ms: int = 0
+    # Separate, smaller pool for reports, search and exports, read from secondaries
+    analytics_max_pool_size: int = 20
+    analytics_read_preference: str = "secondaryPreferred"
+    analytics_max_staleness_seconds: int = 120
+    analytics_socket_timeout_ms: int = 120000
+
+    # X-Admin-Token required by the /api/admin routes; unset disables them
+    admin_token: Optional[str] = None
+
+    profiling_enabled: bool = False
+    slow_request_threshold_ms: float = 500
+
+    cache_control_rules: Dict[str, str] = field(default_factory=lambda: dict(DEFAULT_CACHE_CONTROL_RULES))
+    cache_control_default: str = "private, no-cache"
+    compression_minimum_size: int = 1024
+    compression_gzip_level: int = 6
+    compression_brotli_quality: int = 4
+
+    rate_limit_enabled: bool = True
+    rate_limit_cheap_per_second: float = 20
+    rate_limit_cheap_burst: float = 60
+    rate_limit_expensive_per_second: float = 2
+    rate_limit_expensive_burst: float = 20
+    max_concurrent_expensive_requests: int = 8
+    rate_limit_backend: str = "memory"
+    trusted_proxies: Tuple[str, ...] = ("127.0.0.1",)
+    # Clients sending one of these X-API-Keys are limited per key instead of per IP
+    rate_limit_api_keys: Tuple[str, ...] = ()
+    rate_limit_exempt_api_keys: Tuple[str, ...] = ()
+
+    # Readiness probe: result cache, Mongo ping timeout and failure thresholds
+    health_cache_seconds: float = 2
+    health_ping_timeout_ms: int = 1000
+    health_max_pool_utilization: float = 0.9
+    health_max_loop_lag_ms: float = 500
+
+    # Reports convert amounts to base_currency with the rates in this CSV (date,currency,rate),
+    # each rate being units of the currency per unit of exchange_rates_reference
+    base_currency: str = "EUR"
+    exchange_rates_file: str = str(ROOT_DIR / "exchange_rates.csv")
+    exchange_rates_reference: str = "EUR"
+
+    # Audit log writer: records per insert_many and queued records kept before dropping
+    audit_batch_size: int = 200
+    audit_queue_size: int = 10000
+
+    # Outbound webhooks (WEBHOOK_ENDPOINTS, a JSON list) and their delivery policy
+    webhook_endpoints: Tuple[dict, ...] = ()
+    webhook_max_attempts: int = 10
+    webhook_backoff_seconds: float = 5
+    webhook_max_backoff_seconds: float = 3600
+    webhook_timeout_seconds: float = 10
+
+    # Stored format of ids and dates ("compact" or "legacy"), and whether
+    # queries also match the legacy format while the migration runs
+    storage_format: str = "compact"
+    storage_legacy_reads: bool = True
+
+    # Longest allowed time entry; also how far back overlap checks look
+    max_time_entry_hours: float = 24
+    # Skip the overlap check on time entry writes entirely
+    allow_overlapping_time_entries: bool = False
+    # How long a time entry write waits for another write to the same day
+    time_entry_lock_wait_seconds: float = 5
+
+    # Text index language ("none" disables stemming) and TTLs of expiring collections
+    search_language: str = "none"
+    idempotency_key_ttl_hours: float = 24
+    audit_retention_days: int = 730
+
+    # Default age for `timetracker archive`
+    archive_after_days: int = 730
+
+    # Build missing indexes in the background at startup
+    ensure_indexes_on_startup: bool = True
+
+    @classmethod
+    def from_env(cls, environ=None) -> "Settings":
+        """Read settings from the environment, after loading backend/.env"""
+        if environ is None:
+            load_dotenv(ROOT_DIR / '.env')
+            environ = os.environ
+        return cls(
+            mongo_url=environ.get("MONGO_URL"),
+            db_name=environ.get("DB_NAME"),
+            mongo_max_pool_size=int(environ.get("MONGO_MAX_POOL_SIZE", "100")),
+            mongo_min_pool_size=int(environ.get("MONGO_MIN_POOL_SIZE", "0")),
+            mongo_max_idle_time_ms=int(environ.get("MONGO_MAX_IDLE_TIME_MS", "300000")),
+            mongo_max_connecting=int(environ.get("MONGO_MAX_CONNECTING", "2")),
+            mongo_wait_queue_timeout_ms=int(environ.get("MONGO_WAIT_QUEUE_TIMEOUT_MS", "5000")),
+            mongo_connect_timeout_ms=int(environ.get("MONGO_CONNECT_TIMEOUT_MS", "5000")),
+            mongo_server_selection_timeout_ms=int(environ.get("MONGO_SERVER_SELECTION_TIMEOUT_MS", "10000")),
+            mongo_socket_timeout_ms=int(environ.get("MONGO_SOCKET_TIMEOUT_MS", "0")),
+            analytics_max_pool_size=int(environ.get("ANALYTICS_MAX_POOL_SIZE", "20")),
+            analytics_read_preference=environ.get("ANALYTICS_READ_PREFERENCE", "secondaryPreferred"),
+            analytics_max_staleness_seconds=int(environ.get("ANALYTICS_MAX_STALENESS_SECONDS", "120")),
+            analytics_socket_timeout_ms=int(environ.get("ANALYTICS_SOCKET_TIMEOUT_MS", "120000")),
+            admin_token=environ.get("ADMIN_TOKEN") or None,
+            profiling_enabled=_flag(environ, "PROFILING_ENABLED", ""),
+            slow_request_threshold_ms=float(environ.get("SLOW_REQUEST_THRESHOLD_MS", "500")),
+            cache_control_rules=cache_control_rules_from_env(environ),
+            cache_control_default=environ.get("CACHE_CONTROL_DEFAULT", "private, no-cache"),
+            compression_minimum_size=int(environ.get("COMPRESSION_MINIMUM_SIZE", "1024")),
+            compression_gzip_level=int(environ.get("COMPRESSION_GZIP_LEVEL", "6")),
+            compression_brotli_quality=int(environ.get("COMPRESSION_BROTLI_QUALITY", "4")),
+            rate_limit_enabled=_flag(environ, "RATE_LIMIT_ENABLED", "true"),
+            rate_limit_cheap_per_second=float(environ.get("RATE_LIMIT_CHEAP_PER_SECOND", "20")),
+            rate_limit_cheap_burst=float(environ.get("RATE_LIMIT_CHEAP_BURST", "60")),
+            rate_limit_expensive_per_second=float(environ.get("RATE_LIMIT_EXPENSIVE_PER_SECOND", "2")),
+            rate_limit_expensive_burst=float(environ.get("RATE_LIMIT_EXPENSIVE_BURST", "20")),
+            max_concurrent_expensive_requests=int(environ.get("MAX_CONCURRENT_EXPENSIVE_REQUESTS", "8")),
+            rate_limit_backend=environ.get("RATE_LIMIT_BACKEND", "memory"),
+            trusted_proxies=_list(environ, "TRUSTED_PROXIES", "127.0.0.1"),
+            rate_limit_api_keys=_list(environ, "RATE_LIMIT_API_KEYS", ""),
+            rate_limit_exempt_api_keys=_list(environ, "RATE_LIMIT_EXEMPT_API_KEYS", ""),
+            health_cache_seconds=float(environ.get("HEALTH_CACHE_SECONDS", "2")),
+            health_ping_timeout_ms=int(environ.get("HEALTH_PING_TIMEOUT_MS", "1000")),
+            health_max_pool_utilization=float(environ.get("HEALTH_MAX_POOL_UTILIZATION", "0.9")),
+            health_max_loop_lag_ms=float(environ.get("HEALTH_MAX_LOOP_LAG_MS", "500")),
+            base_currency=environ.get("BASE_CURRENCY", "EUR").upper(),
+            exchange_rates_file=environ.get("EXCHANGE_RATES_FILE", str(ROOT_DIR / "exchange_rates.csv")),
+            exchange_rates_reference=environ.get("EXCHANGE_RATES_REFERENCE", "EUR").upper(),
+            audit_batch_size=int(environ.get("AUDIT_BATCH_SIZE", "200")),
+            audit_queue_size=int(environ.get("AUDIT_QUEUE_SIZE", "10000")),
+            webhook_endpoints=webhook_endpoints_from_env(environ.get("WEBHOOK_ENDPOINTS")),
+            webhook_max_attempts=int(environ.get("WEBHOOK_MAX_ATTEMPTS", "10")),
+            webhook_backoff_seconds=float(environ.get("WEBHOOK_BACKOFF_SECONDS", "5")),
+            webhook_max_backoff_seconds=float(environ.get("WEBHOOK_MAX_BACKOFF_SECONDS", "3600")),
+            webhook_timeout_seconds=float(environ.get("WEBHOOK_TIMEOUT_SECONDS", "10")),
+            storage_format=environ.get("STORAGE_FORMAT", "compact").lower(),
+            storage_legacy_reads=_flag(environ, "STORAGE_LEGACY_READS", "true"),
+            max_time_entry_hours=float(environ.get("MAX_TIME_ENTRY_HOURS", "24")),
+            allow_overlapping_time_entries=_flag(environ, "ALLOW_OVERLAPPING_TIME_ENTRIES", ""),
+            time_entry_lock_wait_seconds=float(environ.get("TIME_ENTRY_LOCK_WAIT_SECONDS", "5")),
+            search_language=environ.get("SEARCH_LANGUAGE", "none"),
+            idempotency_key_ttl_hours=float(environ.get("IDEMPOTENCY_KEY_TTL_HOURS", "24")),
+            audit_retention_days=int(environ.get("AUDIT_RETENTION_DAYS", "730")),
+            archive_after_days=int(environ.get("ARCHIVE_AFTER_DAYS", "730")),
+            ensure_indexes_on_startup=_flag(environ, "ENSURE_INDEXES_ON_STARTUP", "true"),
+        )
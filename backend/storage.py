@@ -0,0 +1,150 @@
+import uuid
+from datetime import datetime
+
+from bson import Binary
+from bson.binary import UUID_SUBTYPE
+
+# The API keeps string UUIDs and YYYY-MM-DD dates; in MongoDB they are stored
+# as binary UUIDs (subtype 4) and BSON dates. Conversion happens only here, at
+# the boundary between models and the database.
+
+# Fields holding an id or a list of ids, in any collection
+ID_FIELDS = {"id", "client_id", "project_id", "time_entries"}
+# Date-only fields, stored as BSON dates at midnight UTC
+DATE_FIELDS = {"date", "start_date", "end_date", "issue_date", "due_date"}
+
+
+
+class StorageFormat:
+    """Which format is written and which formats queries match; set from Settings"""
+
+    def __init__(self):
+        # Write the compact format; STORAGE_FORMAT=legacy keeps writing strings
+        self.compact_writes = True
+        # Match both formats in queries until the storage migration has finished
+        self.legacy_reads = True
+
+    def configure(self, compact_writes: bool, legacy_reads: bool):
+        self.compact_writes = compact_writes
+        self.legacy_reads = legacy_reads
+
+
+storage_format = StorageFormat()
+
+
+def uuid_to_binary(value):
+    """Binary UUID for a string id; strings that are not UUIDs are kept as they are"""
+    if not isinstance(value, str):
+        return value
+    try:
+        return Binary.from_uuid(uuid.UUID(value))
+    except ValueError:
+        return value
+
+
+def date_to_datetime(value):
+    if isinstance(value, str):
+        try:
+            return datetime.strptime(value, "%Y-%m-%d")
+        except ValueError:
+            return value
+    return value
+
+
+def _encode(field, value):
+    if field in ID_FIELDS:
+        if isinstance(value, list):
+            return [uuid_to_binary(item) for item in value]
+        return uuid_to_binary(value)
+    if field in DATE_FIELDS:
+        return date_to_datetime(value)
+    return value
+
+
+def _decode(field, value):
+    if isinstance(value, Binary) and value.subtype == UUID_SUBTYPE:
+        return str(value.as_uuid())
+    if isinstance(value, list) and field in ID_FIELDS:
+        return [_decode(field, item) for item in value]
+    if field in DATE_FIELDS and isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    return value
+
+
+def to_storage(doc):
+    """Convert a model dict (or $set document) to the stored representation"""
+    if doc is None or not storage_format.compact_writes:
+        return doc
+    return {field: _encode(field, value) for field, value in doc.items()}
+
+
+def from_storage(doc):
+    """Convert a stored document back to the representation the models expect"""
+    if doc is None:
+        return None
+    return {field: _decode(field, value) for field, value in doc.items()}
+
+
+def id_match(value):
+    """Query value matching an id (or reference) in either storage format"""
+    binary = uuid_to_binary(value)
+    if binary is value:
+        return value
+    if not storage_format.compact_writes:
+        return {"$in": [value, binary]}
+    return {"$in": [binary, value]} if storage_format.legacy_reads else binary
+
+
+def id_values(value):
+    """Stored representations of an id to put in an $in list"""
+    binary = uuid_to_binary(value)
+    if binary is value:
+        return [value]
+    if not storage_format.compact_writes or storage_format.legacy_reads:
+        return [binary, value]
+    return [binary]
+
+
+def id_not(value):
+    """Query value excluding an id in either storage format"""
+    binary = uuid_to_binary(value)
+    if binary is value:
+        return {"$ne": value}
+    return {"$nin": [binary, value]}
+
+
+def date_filter(field, start=None, end=None):
+    """Filter on a date field between two YYYY-MM-DD strings (inclusive)"""
+    def bounds(convert):
+        condition = {}
+        if start:
+            condition["$gte"] = convert(start)
+        if end:
+            condition["$lte"] = convert(end)
+        return condition
+
+    if storage_format.compact_writes and not storage_format.legacy_reads:
+        return {field: bounds(date_to_datetime)}
+    # Values of different BSON types never compare, so legacy strings need their own range
+    return {"$or": [{field: bounds(date_to_datetime)}, {field: bounds(str)}]}
+
+
+def legacy_fields(doc) -> dict:
+    """The fields of a stored document that still use the legacy format, converted"""
+    converted = {}
+    for field, value in doc.items():
+        if field == "_id":
+            continue
+        encoded = _encode(field, value)
+        if encoded != value:
+            converted[field] = encoded
+    return converted
+
+
+def date_string(field):
+    """Aggregation expression for a date field as YYYY-MM-DD, in either storage format"""
+    return {"$cond": [
+        {"$eq": [{"$type": f"${field}"}, "date"]},
+        {"$dateToString": {"format": "%Y-%m-%d", "date": f"${field}"}},
+        f"${field}",
+    ]}
@@ -0,0 +1,116 @@
+"""Deterministic synthetic data for benchmarks and seeding.
+
+Payloads match the *Create models, so they can be posted to the API or
+turned into documents with the model classes.
+"""
+import random
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+
+WORDS = [
+    "review", "refactor", "meeting", "design", "deploy", "bugfix", "planning",
+    "api", "frontend", "backend", "database", "migration", "testing", "support",
+    "invoice", "report", "workshop", "research", "prototype", "documentation",
+]
+CURRENCIES = ["EUR", "EUR", "EUR", "USD", "GBP", "CHF"]
+
+# Generated dates count back from this day, so a seed gives the same data on every run
+ANCHOR_DATE = date(2025, 1, 1)
+
+
+@dataclass
+class Scale:
+    clients: int = 10
+    projects_per_client: int = 3
+    entries_per_project: int = 200
+    invoices_per_project: int = 2
+
+    @property
+    def total_entries(self) -> int:
+        return self.clients * self.projects_per_client * self.entries_per_project
+
+
+def client_payload(rng: random.Random, index: int, tag: str = "synthetic"):
+    return {
+        "name": "%s client %d" % (tag, index),
+        "email": "%s-client-%d@example.com" % (tag, index),
+        "phone": "+49 30 %07d" % rng.randrange(10 ** 7),
+        "address": "%d %s Street" % (rng.randrange(1, 200), rng.choice(WORDS).title()),
+        "is_active": rng.random() > 0.1,
+    }
+
+
+def project_payload(rng: random.Random, client_id: str, index: int, tag: str = "synthetic"):
+    start = date(2022, 1, 1) + timedelta(days=rng.randrange(365))
+    return {
+        "name": "%s project %d %s" % (tag, index, rng.choice(WORDS)),
+        "description": " ".join(rng.choice(WORDS) for _ in range(8)),
+        "client_id": client_id,
+        "hourly_rate": float(rng.randrange(60, 160, 5)),
+        "currency": rng.choice(CURRENCIES),
+        "start_date": start.isoformat(),
+        "status": "active",
+    }
+
+
+class DaySlots:
+    """Hands out back-to-back working-time slots, so generated entries never overlap.
+
+    One instance is shared by every project in a run. A day that is full
+    spills its entries into the next day with room.
+    """
+
+    DAY_START_HOUR = 7
+    DAY_END_HOUR = 22
+
+    def __init__(self):
+        self.next_start = {}
+
+    def take(self, rng: random.Random, day: date, duration: int) -> datetime:
+        while True:
+            start = self.next_start.get(day)
+            if start is None:
+                start = datetime(day.year, day.month, day.day, self.DAY_START_HOUR) + timedelta(
+                    minutes=rng.randrange(0, 120, 15))
+            end = start + timedelta(minutes=duration)
+            if end <= datetime(day.year, day.month, day.day, self.DAY_END_HOUR):
+                self.next_start[day] = end + timedelta(minutes=rng.choice([0, 15, 30, 45]))
+                return start
+            day += timedelta(days=1)
+
+
+def time_entry_payload(rng: random.Random, project_id: str, day: date, slots: DaySlots):
+    duration = rng.randrange(15, 240, 5)
+    start_time = slots.take(rng, day, duration)
+    return {
+        "project_id": project_id,
+        "description": " ".join(rng.choice(WORDS) for _ in range(rng.randrange(3, 9))),
+        "start_time": start_time.isoformat(),
+        "end_time": (start_time + timedelta(minutes=duration)).isoformat(),
+        "duration": duration,
+        "date": start_time.date().isoformat(),
+        "is_manual": rng.random() > 0.5,
+    }
+
+
+def entry_days(rng: random.Random, count: int, end: date = ANCHOR_DATE):
+    """Spread count entries over the three years before end, oldest first"""
+    return sorted(end - timedelta(days=rng.randrange(3 * 365)) for _ in range(count))
+
+
+def invoice_payload(rng: random.Random, client_id: str, project_id: str, entry_ids,
+                    hours: float, hourly_rate: float, currency: str, number: str, end: date = ANCHOR_DATE):
+    issue = end - timedelta(days=rng.randrange(3 * 365))
+    return {
+        "client_id": client_id,
+        "project_id": project_id,
+        "invoice_number": number,
+        "issue_date": issue.isoformat(),
+        "due_date": (issue + timedelta(days=30)).isoformat(),
+        "total_hours": round(hours, 2),
+        "total_amount": round(hours * hourly_rate, 2),
+        "currency": currency,
+        "status": rng.choice(["draft", "sent", "paid", "paid", "paid"]),
+        "time_entries": list(entry_ids),
+        "custom_description": " ".join(rng.choice(WORDS) for _ in range(6)),
+    }
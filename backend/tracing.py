@@ -0,0 +1,147 @@
+import json
+import logging
+import time
+import uuid
+from collections import Counter
+from contextvars import ContextVar
+from typing import List, Optional
+
+from pymongo import monitoring
+from starlette.datastructures import Headers, MutableHeaders
+
+from .metrics import command_collection, route_template
+
+slow_request_logger = logging.getLogger("timetracker.slow_requests")
+
+# Maximum number of individual DB operations listed in a slow-request log line
+MAX_LOGGED_OPERATIONS = 50
+
+
+class DbOperation:
+    __slots__ = ("command", "collection", "duration_ms", "failed")
+
+    def __init__(self, command: str, collection: str, duration_ms: float, failed: bool = False):
+        self.command = command
+        self.collection = collection
+        self.duration_ms = duration_ms
+        self.failed = failed
+
+    def as_dict(self):
+        op = {"command": self.command, "collection": self.collection, "ms": round(self.duration_ms, 2)}
+        if self.failed:
+            op["failed"] = True
+        return op
+
+
+class RequestTrace:
+    """DB operations recorded while a single request is being handled"""
+
+    def __init__(self, request_id: str):
+        self.request_id = request_id
+        self.started = time.perf_counter()
+        self.operations: List[DbOperation] = []
+
+    @property
+    def db_time_ms(self) -> float:
+        return sum(op.duration_ms for op in self.operations)
+
+    def elapsed_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self) -> str:
+        return 'db;dur=%.2f;desc="%d calls", total;dur=%.2f' % (
+            self.db_time_ms, len(self.operations), self.elapsed_ms()
+        )
+
+
+current_trace: ContextVar[Optional[RequestTrace]] = ContextVar("current_trace", default=None)
+
+
+def get_request_id() -> Optional[str]:
+    """Return the ID of the request being handled, if any"""
+    trace = current_trace.get()
+    return trace.request_id if trace else None
+
+
+class MongoCommandTracer(monitoring.CommandListener):
+    """Attribute MongoDB commands to the request that issued them.
+
+    Motor runs pymongo on a thread pool but copies the caller's context, so the
+    trace set by TracingMiddleware is visible from the listener callbacks.
+    """
+
+    def __init__(self):
+        self._pending = {}
+
+    def started(self, event):
+        trace = current_trace.get()
+        if trace is not None:
+            self._pending[event.request_id] = (
+                trace, command_collection(event.command_name, event.command)
+            )
+
+    def _finish(self, event, failed):
+        pending = self._pending.pop(event.request_id, None)
+        if pending is not None:
+            trace, collection = pending
+            trace.operations.append(
+                DbOperation(event.command_name, collection, event.duration_micros / 1000, failed)
+            )
+
+    def succeeded(self, event):
+        self._finish(event, False)
+
+    def failed(self, event):
+        self._finish(event, True)
+
+
+class TracingMiddleware:
+    """Assign request IDs, add Server-Timing headers and log slow requests"""
+
+    def __init__(self, app, slow_request_threshold_ms: float = 500):
+        self.app = app
+        self.slow_request_threshold_ms = slow_request_threshold_ms
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        request_id = Headers(scope=scope).get("x-request-id") or uuid.uuid4().hex
+        trace = RequestTrace(request_id)
+        token = current_trace.set(trace)
+        status_code = 500
+
+        async def send_with_timing(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                headers = MutableHeaders(raw=message["headers"])
+                headers["X-Request-ID"] = request_id
+                headers.append("Server-Timing", trace.server_timing())
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            current_trace.reset(token)
+            elapsed_ms = trace.elapsed_ms()
+            if elapsed_ms >= self.slow_request_threshold_ms:
+                self.log_slow_request(scope, trace, status_code, elapsed_ms)
+
+    def log_slow_request(self, scope, trace: RequestTrace, status_code: int, elapsed_ms: float):
+        operations = list(trace.operations)
+        summary = Counter("%s %s" % (op.command, op.collection) for op in operations)
+        slow_request_logger.warning(json.dumps({
+            "event": "slow_request",
+            "request_id": trace.request_id,
+            "method": scope["method"],
+            "path": scope["path"],
+            "route": route_template(scope),
+            "status": status_code,
+            "duration_ms": round(elapsed_ms, 2),
+            "db_calls": len(operations),
+            "db_ms": round(sum(op.duration_ms for op in operations), 2),
+            "db_summary": dict(summary),
+            "db_operations": [op.as_dict() for op in operations[:MAX_LOGGED_OPERATIONS]],
+        }))
@@ -0,0 +1,325 @@
+"""Outbound webhooks through a transactional outbox.
+
+A state change that should notify other systems (an invoice becoming sent or
+paid, a timer stopping) inserts one webhook_outbox document per subscribed
+endpoint in the same transaction as the change itself. The dispatcher, a
+background task in every app worker, claims due documents atomically and
+POSTs them concurrently, at most max_concurrency at a time per endpoint.
+Failed deliveries are retried with exponential backoff and jitter until
+max_attempts is reached. Each request is signed:
+
+    X-Webhook-Signature: sha256=<hex HMAC-SHA256 of "<X-Webhook-Timestamp>.<body>" with the endpoint secret>
+
+Endpoints are configured with WEBHOOK_ENDPOINTS, a JSON list such as
+[{"name": "accounting", "url": "https://...", "secret": "...",
+  "events": ["invoice.paid"], "max_concurrency": 4}].
+"""
+import asyncio
+import hashlib
+import hmac
+import json
+import logging
+import random
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+import httpx
+from fastapi import APIRouter, Depends, HTTPException
+from pymongo import ReturnDocument
+from pymongo.errors import OperationFailure
+
+from .admin import require_admin
+from .database import database
+
+EVENT_TYPES = ("invoice.sent", "invoice.paid", "timer.stopped")
+OUTBOX = "webhook_outbox"
+# A claimed delivery that is not finished within this time is picked up again
+LEASE_SECONDS = 60
+
+
+def webhook_endpoints_from_env(raw) -> tuple:
+    """Parse WEBHOOK_ENDPOINTS into endpoint dicts with defaults filled in"""
+    if not raw:
+        return ()
+    endpoints = []
+    for endpoint in json.loads(raw):
+        unknown = set(endpoint.get("events", EVENT_TYPES)) - set(EVENT_TYPES)
+        if unknown:
+            raise ValueError(f"Unknown webhook events {sorted(unknown)}")
+        endpoints.append({
+            "name": endpoint["name"],
+            "url": endpoint["url"],
+            "secret": endpoint["secret"],
+            "events": tuple(endpoint.get("events", EVENT_TYPES)),
+            "max_concurrency": int(endpoint.get("max_concurrency", 4)),
+        })
+    return tuple(endpoints)
+
+
+def sign(secret: str, timestamp: str, body: str) -> str:
+    digest = hmac.new(secret.encode(), f"{timestamp}.{body}".encode(), hashlib.sha256).hexdigest()
+    return f"sha256={digest}"
+
+
+def verify_signature(secret: str, timestamp: str, body: str, signature: str, tolerance: float = 300) -> bool:
+    """Receiver-side check: a valid signature on a recent timestamp"""
+    try:
+        fresh = abs(time.time() - int(timestamp)) <= tolerance
+    except (TypeError, ValueError):
+        return False
+    return fresh and hmac.compare_digest(sign(secret, timestamp, body), signature or "")
+
+
+def event(event_type: str, data) -> dict:
+    """An event envelope; data must already be JSON-serializable"""
+    return {
+        "id": str(uuid.uuid4()),
+        "type": event_type,
+        "created_at": datetime.utcnow().isoformat(),
+        "data": data,
+    }
+
+
+class Outbox:
+    """Writes state changes together with their webhook events"""
+
+    def __init__(self, database):
+        self.database = database
+        self.endpoints = ()
+        self.wakeup = None
+        self._transactions = True
+
+    def configure(self, endpoints):
+        self.endpoints = tuple(endpoints)
+
+    def documents(self, events):
+        """One outbox document per event and subscribed endpoint"""
+        now = datetime.utcnow()
+        return [
+            {
+                "event_id": item["id"],
+                "type": item["type"],
+                "endpoint": endpoint["name"],
+                "body": json.dumps(item, separators=(",", ":")),
+                "status": "pending",
+                "attempts": 0,
+                "next_attempt_at": now,
+                "created_at": now,
+            }
+            for item in events
+            for endpoint in self.endpoints
+            if item["type"] in endpoint["events"]
+        ]
+
+    async def write(self, change, events):
+        """Run change(session) and store events in one transaction; returns change's result.
+
+        Standalone MongoDB servers have no transactions; there the change is
+        written first and the events right after it.
+        """
+        docs = self.documents(events)
+        if not docs:
+            return await change(None)
+        if self._transactions:
+            try:
+                async with await self.database.client.start_session() as session:
+                    async with session.start_transaction():
+                        result = await change(session)
+                        await self.database[OUTBOX].insert_many(docs, session=session)
+                self._notify()
+                return result
+            except OperationFailure as e:
+                # IllegalOperation: "Transaction numbers are only allowed on a replica set member or mongos"
+                if e.code != 20:
+                    raise
+                self._transactions = False
+                logging.warning("MongoDB does not support transactions; webhook events are written after the change")
+        result = await change(None)
+        await self.database[OUTBOX].insert_many(docs)
+        self._notify()
+        return result
+
+    def _notify(self):
+        if self.wakeup is not None:
+            self.wakeup.set()
+
+
+class Dispatcher:
+    """Deliver due outbox documents, concurrently per endpoint, with retries"""
+
+    def __init__(self, database, outbox, max_attempts=10, backoff_seconds=5.0, max_backoff_seconds=3600.0,
+                 timeout_seconds=10.0, poll_seconds=2.0, http_client=None):
+        self.database = database
+        self.outbox = outbox
+        self.max_attempts = max_attempts
+        self.backoff_seconds = backoff_seconds
+        self.max_backoff_seconds = max_backoff_seconds
+        self.timeout_seconds = timeout_seconds
+        self.poll_seconds = poll_seconds
+        self._http = http_client
+        self._active = {}
+        self._deliveries = set()
+        self._task = None
+
+    def start(self):
+        if self._task is None and self.outbox.endpoints:
+            self._http = self._http or httpx.AsyncClient(timeout=self.timeout_seconds)
+            self.outbox.wakeup = asyncio.Event()
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Unfinished deliveries are retried by whichever worker claims them after their lease
+        for delivery in list(self._deliveries):
+            delivery.cancel()
+        await asyncio.gather(*self._deliveries, return_exceptions=True)
+        await self._http.aclose()
+        self._http = None
+
+    async def _run(self):
+        while True:
+            try:
+                await self.dispatch_due()
+            except Exception as e:
+                logging.error(f"Error dispatching webhooks: {e}")
+            try:
+                await asyncio.wait_for(self.outbox.wakeup.wait(), self.poll_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self.outbox.wakeup.clear()
+
+    async def dispatch_due(self):
+        """Claim and start deliveries up to each endpoint's free concurrency; returns how many started"""
+        started = 0
+        for endpoint in self.outbox.endpoints:
+            while self._active.get(endpoint["name"], 0) < endpoint["max_concurrency"]:
+                doc = await self._claim(endpoint["name"])
+                if doc is None:
+                    break
+                self._active[endpoint["name"]] = self._active.get(endpoint["name"], 0) + 1
+                delivery = asyncio.create_task(self._deliver(endpoint, doc))
+                self._deliveries.add(delivery)
+                delivery.add_done_callback(self._deliveries.discard)
+                started += 1
+        return started
+
+    async def _claim(self, endpoint_name):
+        now = datetime.utcnow()
+        return await self.database[OUTBOX].find_one_and_update(
+            {
+                "endpoint": endpoint_name,
+                "$or": [
+                    {"status": "pending", "next_attempt_at": {"$lte": now}},
+                    {"status": "delivering", "lease_until": {"$lte": now}},
+                ],
+            },
+            # Counted when claimed, so a delivery that keeps killing its worker still runs out of attempts
+            {"$set": {"status": "delivering", "lease_until": now + timedelta(seconds=LEASE_SECONDS)},
+             "$inc": {"attempts": 1}},
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def backoff(self, attempts: int) -> float:
+        """Delay before the next attempt: exponential and capped, randomised over its upper half"""
+        delay = min(self.backoff_seconds * 2 ** (attempts - 1), self.max_backoff_seconds)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def _post(self, endpoint, doc):
+        """POST one delivery; returns None on success, else the error"""
+        timestamp = str(int(time.time()))
+        response = await self._http.post(
+            endpoint["url"],
+            content=doc["body"].encode(),
+            headers={
+                "Content-Type": "application/json",
+                "X-Webhook-Id": doc["event_id"],
+                "X-Webhook-Event": doc["type"],
+                "X-Webhook-Timestamp": timestamp,
+                "X-Webhook-Signature": sign(endpoint["secret"], timestamp, doc["body"]),
+            },
+        )
+        return None if response.is_success else f"HTTP {response.status_code}"
+
+    async def _deliver(self, endpoint, doc):
+        attempts = doc["attempts"]
+        try:
+            if attempts > self.max_attempts:
+                # Every attempt was claimed but none recorded a result, e.g. the worker died mid-delivery
+                error = doc.get("last_error") or "Delivery interrupted"
+            else:
+                error = await self._post(endpoint, doc)
+        except Exception as e:
+            # Anything else, e.g. a bad endpoint URL or body, is a failed attempt too
+            error = f"{type(e).__name__}: {e}"
+        finally:
+            self._active[endpoint["name"]] -= 1
+
+        now = datetime.utcnow()
+        if error is None:
+            update = {"$set": {"status": "delivered", "attempts": attempts, "delivered_at": now},
+                      "$unset": {"lease_until": "", "last_error": ""}}
+        elif attempts >= self.max_attempts:
+            logging.error(f"Webhook {doc['type']} {doc['event_id']} to {endpoint['name']} failed for good: {error}")
+            update = {"$set": {"status": "failed", "attempts": attempts, "last_error": error, "failed_at": now},
+                      "$unset": {"lease_until": ""}}
+        else:
+            update = {"$set": {
+                "status": "pending",
+                "attempts": attempts,
+                "last_error": error,
+                "next_attempt_at": now + timedelta(seconds=self.backoff(attempts)),
+            }, "$unset": {"lease_until": ""}}
+        try:
+            await self.database[OUTBOX].update_one({"_id": doc["_id"]}, update)
+        except Exception as e:
+            # The lease runs out and the delivery is retried
+            logging.error(f"Error recording webhook delivery {doc['event_id']}: {e}")
+
+
+webhooks_router = APIRouter(prefix="/api/admin", dependencies=[Depends(require_admin)])
+
+
+@webhooks_router.get("/webhooks")
+async def webhook_status():
+    """Outbox documents per endpoint and status, with the most recent failures"""
+    try:
+        counts = await database[OUTBOX].aggregate([
+            {"$group": {"_id": {"endpoint": "$endpoint", "status": "$status"}, "count": {"$sum": 1}}},
+        ]).to_list(None)
+        failures = await database[OUTBOX].find(
+            {"status": "failed"}, {"_id": 0, "body": 0}
+        ).sort("failed_at", -1).limit(20).to_list(20)
+        status = {}
+        for group in counts:
+            status.setdefault(group["_id"]["endpoint"], {})[group["_id"]["status"]] = group["count"]
+        return {"endpoints": status, "recent_failures": failures}
+    except Exception as e:
+        logging.error(f"Error fetching webhook status: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
+
+
+@webhooks_router.post("/webhooks/retry")
+async def retry_failed(endpoint: Optional[str] = None):
+    """Queue failed deliveries again, optionally only those of one endpoint"""
+    try:
+        query = {"status": "failed"}
+        if endpoint:
+            query["endpoint"] = endpoint
+        result = await database[OUTBOX].update_many(query, {
+            "$set": {"status": "pending", "attempts": 0, "next_attempt_at": datetime.utcnow()},
+            "$unset": {"failed_at": ""},
+        })
+        return {"requeued": result.modified_count}
+    except Exception as e:
+        logging.error(f"Error requeueing webhooks: {e}")
+        raise HTTPException(status_code=500, detail="Internal server error")
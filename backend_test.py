@@ -40,6 +40,17 @@ def test_health_check():
     success = response.status_code == 200 and response.json()["status"] == "healthy"
     return print_test_result("Health Check", success)
 
+def test_health_probes():
+    """Test liveness and readiness probes"""
+    live = requests.get(f"{API_BASE}/health/live")
+    ready = requests.get(f"{API_BASE}/health/ready")
+    success = (
+        live.status_code == 200 and
+        ready.status_code == 200 and
+        ready.json()["checks"]["mongodb"]["ok"]
+    )
+    return print_test_result("Health Probes", success, f"Ready: {ready.status_code}")
+
 def test_root_endpoint():
     """Test root endpoint"""
     response = requests.get(f"{API_BASE}/")
@@ -303,6 +314,16 @@ def test_update_invoice():
     )
     return print_test_result("Update Invoice", success)
 
+def test_search():
+    """Test full-text search"""
+    response = requests.get(f"{API_BASE}/search", params={"q": f"{timestamp}", "types": "time_entry,invoice"})
+    if response.status_code != 200:
+        return print_test_result("Search", False, f"Status: {response.status_code}, Response: {response.text}")
+    
+    result_ids = [result["id"] for result in response.json()["results"]]
+    success = time_entry_id in result_ids and invoice_id in result_ids
+    return print_test_result("Search", success, f"{len(result_ids)} results")
+
 def test_error_scenarios():
     """Test error scenarios"""
     # Test invalid client email
@@ -378,6 +399,7 @@ def run_tests():
     # Run the tests
     tests = [
         test_health_check,
+        test_health_probes,
         test_root_endpoint,
         test_create_client,
         test_get_clients,
@@ -396,6 +418,7 @@ def run_tests():
         test_get_invoices,
         test_get_invoice,
         test_update_invoice,
+        test_search,
         test_error_scenarios
     ]
     
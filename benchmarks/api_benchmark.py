@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""Load test for the TimeTracker API.
+
+Seeds synthetic data through the API, drives the main endpoints concurrently
+and records throughput and latency percentiles. Results are compared against
+a JSON baseline so regressions fail the run:
+
+    python benchmarks/api_benchmark.py --clients 20 --entries-per-project 500
+    python benchmarks/api_benchmark.py --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import math
+import os
+import random
+import sys
+import time
+from datetime import date, datetime
+from pathlib import Path
+
+import httpx
+
+sys.path.append(str(Path(__file__).resolve().parent.parent))
+from backend.synthetic import (  # noqa: E402
+    ANCHOR_DATE, DaySlots, Scale, client_payload, entry_days, invoice_payload, project_payload, time_entry_payload
+)
+
+DEFAULT_BASELINE = Path(__file__).resolve().parent / "baseline.json"
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an already sorted list"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+async def run_concurrently(make_calls, concurrency):
+    """Run an iterable of coroutine factories with at most `concurrency` in flight"""
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def guarded(call):
+        async with semaphore:
+            return await call()
+
+    return await asyncio.gather(*(guarded(call) for call in make_calls))
+
+
+async def post_json(http, path, payload):
+    response = await http.post(path, json=payload)
+    response.raise_for_status()
+    return response.json()
+
+
+async def seed(http, scale, seed_value, concurrency, anchor=ANCHOR_DATE):
+    """Create clients x projects x entries x invoices and return their IDs"""
+    rng = random.Random(seed_value)
+    tag = "bench-%d-%d" % (seed_value, int(time.time()))
+    created = {"clients": [], "projects": [], "time_entries": [], "invoices": []}
+
+    # Payloads are generated up front so the data does not depend on request ordering
+    client_payloads = [client_payload(rng, i, tag) for i in range(scale.clients)]
+    clients = await run_concurrently(
+        [lambda p=p: post_json(http, "/clients", p) for p in client_payloads], concurrency
+    )
+    created["clients"] = [c["id"] for c in clients]
+
+    project_payloads = [
+        project_payload(rng, c, i, tag)
+        for c in created["clients"] for i in range(scale.projects_per_client)
+    ]
+    projects = await run_concurrently(
+        [lambda p=p: post_json(http, "/projects", p) for p in project_payloads], concurrency
+    )
+    created["projects"] = [p["id"] for p in projects]
+
+    # Entries of all projects share one timeline; the API rejects overlapping ones
+    slots = DaySlots()
+    for project in projects:
+        payloads = [
+            time_entry_payload(rng, project["id"], day, slots)
+            for day in entry_days(rng, scale.entries_per_project, anchor)
+        ]
+        entries = await run_concurrently(
+            [lambda p=p: post_json(http, "/time-entries", p) for p in payloads], concurrency
+        )
+        entry_ids = [e["id"] for e in entries]
+        created["time_entries"].extend(entry_ids)
+
+        chunk = max(1, len(entries) // max(1, scale.invoices_per_project))
+        invoice_payloads = []
+        for n in range(scale.invoices_per_project):
+            batch = entries[n * chunk:(n + 1) * chunk]
+            hours = sum(e["duration"] for e in batch) / 60
+            invoice_payloads.append(invoice_payload(
+                rng, project["client_id"], project["id"], [e["id"] for e in batch], hours,
+                project["hourly_rate"], project["currency"], "%s-%s-%d" % (tag, project["id"][:8], n), anchor,
+            ))
+        invoices = await run_concurrently(
+            [lambda p=p: post_json(http, "/invoices", p) for p in invoice_payloads], concurrency
+        )
+        created["invoices"].extend(i["id"] for i in invoices)
+
+    return created
+
+
+async def cleanup(http, created, concurrency):
+    for collection in ("invoices", "time_entries", "projects", "clients"):
+        path = "/" + collection.replace("_", "-")
+        await run_concurrently(
+            [lambda i=i: http.delete("%s/%s" % (path, i)) for i in created[collection]], concurrency
+        )
+
+
+def scenarios(created, rng):
+    """Name -> (method, path factory, json body factory) for each benchmarked call"""
+    entry_ids = created["time_entries"] or [None]
+    project_ids = created["projects"] or [None]
+    return {
+        "list_clients": ("GET", lambda: "/clients", None),
+        "list_projects": ("GET", lambda: "/projects", None),
+        "list_time_entries": ("GET", lambda: "/time-entries", None),
+        "list_invoices": ("GET", lambda: "/invoices", None),
+        "active_timer": ("GET", lambda: "/timer/active", None),
+        "get_time_entry": ("GET", lambda: "/time-entries/%s" % rng.choice(entry_ids), None),
+        "update_time_entry": (
+            "PUT",
+            lambda: "/time-entries/%s" % rng.choice(entry_ids),
+            lambda: {"description": "benchmark update %d" % rng.randrange(10 ** 6)},
+        ),
+        "get_project": ("GET", lambda: "/projects/%s" % rng.choice(project_ids), None),
+    }
+
+
+async def run_scenario(http, method, make_path, make_body, requests, concurrency):
+    latencies = []
+    errors = 0
+
+    async def call():
+        nonlocal errors
+        body = make_body() if make_body else None
+        start = time.perf_counter()
+        try:
+            response = await http.request(method, make_path(), json=body)
+            if response.status_code >= 400:
+                errors += 1
+        except httpx.HTTPError:
+            errors += 1
+        latencies.append(time.perf_counter() - start)
+
+    started = time.perf_counter()
+    await run_concurrently([call] * requests, concurrency)
+    elapsed = time.perf_counter() - started
+
+    latencies.sort()
+    return {
+        "requests": requests,
+        "errors": errors,
+        "throughput_rps": round(requests / elapsed, 2),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p95_ms": round(percentile(latencies, 95) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+    }
+
+
+def compare(results, baseline, tolerance):
+    """Return a list of human readable regressions against the baseline"""
+    regressions = []
+    for name, current in results["scenarios"].items():
+        previous = baseline.get("scenarios", {}).get(name)
+        if not previous:
+            continue
+        for metric in ("p50_ms", "p95_ms", "p99_ms"):
+            if previous[metric] and current[metric] > previous[metric] * (1 + tolerance):
+                regressions.append("%s %s: %.2f -> %.2f" % (name, metric, previous[metric], current[metric]))
+        if previous["throughput_rps"] and current["throughput_rps"] < previous["throughput_rps"] * (1 - tolerance):
+            regressions.append("%s throughput_rps: %.2f -> %.2f" % (
+                name, previous["throughput_rps"], current["throughput_rps"]))
+        if current["errors"] > previous["errors"]:
+            regressions.append("%s errors: %d -> %d" % (name, previous["errors"], current["errors"]))
+    return regressions
+
+
+async def main(args):
+    scale = Scale(args.clients, args.projects_per_client, args.entries_per_project, args.invoices_per_project)
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    # Use a key listed in RATE_LIMIT_EXEMPT_API_KEYS, or the limiter will shed the load
+    headers = {"X-API-Key": args.api_key} if args.api_key else {}
+    async with httpx.AsyncClient(
+        base_url=args.base_url.rstrip("/") + "/api", limits=limits, headers=headers, timeout=60
+    ) as http:
+        (await http.get("/health")).raise_for_status()
+
+        print("Seeding %d clients, %d projects, %d time entries..." % (
+            scale.clients, scale.clients * scale.projects_per_client, scale.total_entries))
+        seed_started = time.perf_counter()
+        created = await seed(http, scale, args.seed, args.concurrency, args.anchor_date)
+        print("Seeded in %.1fs" % (time.perf_counter() - seed_started))
+
+        try:
+            rng = random.Random(args.seed)
+            results = {
+                "meta": {
+                    "timestamp": datetime.utcnow().isoformat(),
+                    "scale": scale.__dict__,
+                    "anchor_date": args.anchor_date.isoformat(),
+                    "concurrency": args.concurrency,
+                    "requests_per_scenario": args.requests,
+                },
+                "scenarios": {},
+            }
+            for name, (method, make_path, make_body) in scenarios(created, rng).items():
+                if args.only and name not in args.only:
+                    continue
+                for _ in range(args.warmup):
+                    await http.request(method, make_path(), json=make_body() if make_body else None)
+                stats = await run_scenario(http, method, make_path, make_body, args.requests, args.concurrency)
+                results["scenarios"][name] = stats
+                print("%-20s %8.1f req/s  p50 %7.2fms  p95 %7.2fms  p99 %7.2fms  errors %d" % (
+                    name, stats["throughput_rps"], stats["p50_ms"], stats["p95_ms"], stats["p99_ms"],
+                    stats["errors"]))
+        finally:
+            if not args.keep_data:
+                print("Cleaning up seeded data...")
+                await cleanup(http, created, args.concurrency)
+
+    if args.output:
+        Path(args.output).write_text(json.dumps(results, indent=2))
+
+    baseline_path = Path(args.baseline)
+    if args.save_baseline:
+        baseline_path.write_text(json.dumps(results, indent=2))
+        print("Baseline saved to %s" % baseline_path)
+        return 0
+    if not baseline_path.exists():
+        print("No baseline at %s; run with --save-baseline to create one" % baseline_path)
+        return 0
+
+    regressions = compare(results, json.loads(baseline_path.read_text()), args.tolerance)
+    if regressions:
+        print("\nRegressions against %s (tolerance %d%%):" % (baseline_path, args.tolerance * 100))
+        for line in regressions:
+            print("  " + line)
+        return 1
+    print("\nNo regressions against %s" % baseline_path)
+    return 0
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default=os.environ.get("BENCH_BASE_URL", "http://localhost:8001"))
+    parser.add_argument("--api-key", default=os.environ.get("BENCH_API_KEY"),
+                        help="sent as X-API-Key; should be exempt from rate limiting")
+    parser.add_argument("--clients", type=int, default=10)
+    parser.add_argument("--projects-per-client", type=int, default=3)
+    parser.add_argument("--entries-per-project", type=int, default=200)
+    parser.add_argument("--invoices-per-project", type=int, default=2)
+    parser.add_argument("--seed", type=int, default=42, help="random seed for synthetic data and request mix")
+    parser.add_argument("--anchor-date", type=date.fromisoformat, default=ANCHOR_DATE,
+                        help="synthetic dates count back from this day (YYYY-MM-DD)")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=500, help="requests per scenario")
+    parser.add_argument("--warmup", type=int, default=10, help="untimed requests per scenario")
+    parser.add_argument("--only", nargs="*", help="run only these scenarios")
+    parser.add_argument("--baseline", default=str(DEFAULT_BASELINE))
+    parser.add_argument("--save-baseline", action="store_true", help="write results as the new baseline")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="allowed relative regression")
+    parser.add_argument("--output", help="also write results to this JSON file")
+    parser.add_argument("--keep-data", action="store_true", help="do not delete seeded data afterwards; a later run with the same seed and "
+                             "anchor date then overlaps it, so change one of them")
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(parse_args())))
@@ -2,11 +2,12 @@
 set -e
 
 # Start the FastAPI backend
-cd /backend || { echo "Backend directory not found"; exit 1; }
+[ -f /backend/server.py ] || { echo "Backend directory not found"; exit 1; }
 
 echo "Starting FastAPI backend"
-# Start Uvicorn with proper host binding
-uvicorn server:app --host 0.0.0.0 --port 8001 &
+# Start Uvicorn with proper host binding; /backend is imported as the backend package
+cd /
+uvicorn backend.server:app --host 0.0.0.0 --port 8001 &
 BACKEND_PID=$!
 
 echo "Waiting for backend to start..."
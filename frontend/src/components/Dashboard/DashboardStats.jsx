@@ -1,8 +1,12 @@
-import React from 'react';
+import React, { useEffect, useState } from 'react';
 import { Clock, DollarSign, Users, Briefcase, TrendingUp, Calendar } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../ui/card';
 import { Badge } from '../ui/badge';
 import { useApp } from '../../context/AppContext';
+import { reportsApi } from '../../services/api';
+
+const formatMoney = (amount, currency) =>
+  new Intl.NumberFormat('de-DE', { style: 'currency', currency }).format(amount);
 
 const DashboardStats = () => {
   const { state } = useApp();
@@ -31,10 +35,19 @@ const DashboardStats = () => {
   const weekMinutes = weekEntries.reduce((sum, entry) => sum + entry.duration, 0);
   const weekHours = (weekMinutes / 60).toFixed(1);
   
-  // Revenue calculation
-  const totalRevenue = invoices.reduce((sum, invoice) => sum + invoice.totalAmount, 0);
-  const unpaidInvoices = invoices.filter(invoice => invoice.status !== 'paid');
-  const pendingRevenue = unpaidInvoices.reduce((sum, invoice) => sum + invoice.totalAmount, 0);
+  // Revenue this year: invoices may be in different currencies, so the server converts the totals
+  const currentYear = today.slice(0, 4);
+  const [invoiceTotals, setInvoiceTotals] = useState(null);
+  useEffect(() => {
+    let cancelled = false;
+    reportsApi.invoiceTotals({ startDate: `${currentYear}-01-01`, endDate: `${currentYear}-12-31` })
+      .then(totals => { if (!cancelled) setInvoiceTotals(totals); })
+      .catch(() => { if (!cancelled) setInvoiceTotals(null); });
+    return () => { cancelled = true; };
+  }, [invoices, currentYear]);
+  const baseCurrency = invoiceTotals?.base_currency || 'EUR';
+  const totalRevenue = invoiceTotals ? formatMoney(invoiceTotals.total, baseCurrency) : '–';
+  const pendingRevenue = invoiceTotals?.pending || 0;
 
   const stats = [
     {
@@ -62,11 +75,11 @@ const DashboardStats = () => {
       changeType: 'neutral'
     },
     {
-      title: 'Gesamtumsatz',
-      value: `€${totalRevenue.toLocaleString('de-DE')}`,
+      title: `Umsatz ${currentYear}`,
+      value: totalRevenue,
       icon: DollarSign,
       color: 'bg-purple-500',
-      change: `€${pendingRevenue.toLocaleString('de-DE')} ausstehend`,
+      change: `${formatMoney(pendingRevenue, baseCurrency)} ausstehend`,
       changeType: pendingRevenue > 0 ? 'warning' : 'positive'
     }
   ];
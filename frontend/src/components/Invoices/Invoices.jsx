@@ -1,4 +1,4 @@
-import React, { useState, useMemo } from 'react';
+import React, { useEffect, useState, useMemo } from 'react';
 import { Plus, Search, Edit, Trash2, FileText, Download, Eye, DollarSign, Calendar, Send } from 'lucide-react';
 import { Card, CardContent, CardHeader, CardTitle } from '../ui/card';
 import { Button } from '../ui/button';
@@ -11,6 +11,10 @@ import { Textarea } from '../ui/textarea';
 import { Checkbox } from '../ui/checkbox';
 import { useApp } from '../../context/AppContext';
 import { useToast } from '../../hooks/use-toast';
+import { timeEntriesApi, convertApiToFrontend } from '../../services/api';
+
+// The entry picker only shows these, so it does not need whole entries
+const PICKER_FIELDS = 'id,project_id,description,date,duration';
 
 const Invoices = () => {
   const { state, actions } = useApp();
@@ -47,6 +51,17 @@ const Invoices = () => {
     return matchesSearch && matchesStatus;
   });
 
+  // Entries for the picker are fetched with a sparse fieldset while the dialog is open
+  const [pickerEntries, setPickerEntries] = useState(null);
+  useEffect(() => {
+    if (!isDialogOpen) return;
+    let cancelled = false;
+    timeEntriesApi.getAll({ fields: PICKER_FIELDS })
+      .then(entries => { if (!cancelled) setPickerEntries(entries.map(convertApiToFrontend.timeEntry)); })
+      .catch(() => { if (!cancelled) setPickerEntries(null); });
+    return () => { cancelled = true; };
+  }, [isDialogOpen, timeEntries]);
+
   // Get available time entries for invoice creation
   const availableTimeEntries = useMemo(() => {
     if (!formData.projectId) return [];
@@ -59,13 +74,13 @@ const Invoices = () => {
       }
     });
     
-    return timeEntries
+    return (pickerEntries || timeEntries)
       .filter(entry => 
         entry.projectId === formData.projectId && 
         !invoicedEntryIds.has(entry.id)
       )
       .sort((a, b) => new Date(b.date) - new Date(a.date));
-  }, [formData.projectId, timeEntries, invoices]);
+  }, [formData.projectId, pickerEntries, timeEntries, invoices]);
 
   const resetForm = () => {
     setFormData({
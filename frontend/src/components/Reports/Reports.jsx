@@ -55,6 +55,13 @@ const Reports = () => {
     return { start, end };
   };
 
+  // Entries carry their project and client names; older entries fall back to a lookup
+  const entryNames = (entry, project) => ({
+    clientId: entry.clientId || project?.clientId,
+    projectName: entry.projectName || project?.name || 'Unknown',
+    clientName: entry.clientName || clients.find(c => c.id === project?.clientId)?.name || 'Unknown'
+  });
+
   // Filter time entries based on criteria
   const filteredEntries = useMemo(() => {
     const { start, end } = getDateRange();
@@ -63,8 +70,8 @@ const Reports = () => {
       const entryDate = new Date(entry.date);
       const dateMatch = entryDate >= start && entryDate <= end;
       
-      const project = projects.find(p => p.id === entry.projectId);
-      const clientMatch = selectedClient === 'all' || (project && project.clientId === selectedClient);
+      const clientId = entry.clientId || projects.find(p => p.id === entry.projectId)?.clientId;
+      const clientMatch = selectedClient === 'all' || clientId === selectedClient;
       const projectMatch = selectedProject === 'all' || entry.projectId === selectedProject;
       
       return dateMatch && clientMatch && projectMatch;
@@ -84,15 +91,15 @@ const Reports = () => {
       const project = projects.find(p => p.id === entry.projectId);
       if (!project) return;
 
-      const client = clients.find(c => c.id === project.clientId);
+      const names = entryNames(entry, project);
       const entryRevenue = (entry.duration / 60) * project.hourlyRate;
       totalRevenue += entryRevenue;
 
       // Project statistics
       if (!projectStats[entry.projectId]) {
         projectStats[entry.projectId] = {
-          name: project.name,
-          clientName: client?.name || 'Unknown',
+          name: names.projectName,
+          clientName: names.clientName,
           totalMinutes: 0,
           totalRevenue: 0,
           entryCount: 0
@@ -103,10 +110,10 @@ const Reports = () => {
       projectStats[entry.projectId].entryCount += 1;
 
       // Client statistics
-      const clientId = project.clientId;
+      const clientId = names.clientId;
       if (!clientStats[clientId]) {
         clientStats[clientId] = {
-          name: client?.name || 'Unknown',
+          name: names.clientName,
           totalMinutes: 0,
           totalRevenue: 0,
           projectCount: new Set()
@@ -151,13 +158,13 @@ const Reports = () => {
       const headers = ['Datum', 'Projekt', 'Kunde', 'Beschreibung', 'Dauer (Minuten)', 'Dauer (Stunden)', 'Stundensatz', 'Umsatz'];
       const rows = filteredEntries.map(entry => {
         const project = projects.find(p => p.id === entry.projectId);
-        const client = clients.find(c => c.id === project?.clientId);
+        const names = entryNames(entry, project);
         const revenue = ((entry.duration / 60) * (project?.hourlyRate || 0)).toFixed(2);
         
         return [
           new Date(entry.date).toLocaleDateString('de-DE'),
-          project?.name || 'Unknown',
-          client?.name || 'Unknown',
+          names.projectName,
+          names.clientName,
           entry.description.replace(/,/g, ';'), // Replace commas to avoid CSV issues
           entry.duration,
           (entry.duration / 60).toFixed(2),
@@ -187,12 +194,12 @@ const Reports = () => {
       content += `-------------------------\n`;
       filteredEntries.forEach(entry => {
         const project = projects.find(p => p.id === entry.projectId);
-        const client = clients.find(c => c.id === project?.clientId);
+        const names = entryNames(entry, project);
         const revenue = ((entry.duration / 60) * (project?.hourlyRate || 0)).toFixed(2);
         
         content += `${new Date(entry.date).toLocaleDateString('de-DE')} | ${formatDuration(entry.duration)} | €${revenue}\n`;
-        content += `  Projekt: ${project?.name || 'Unknown'}\n`;
-        content += `  Kunde: ${client?.name || 'Unknown'}\n`;
+        content += `  Projekt: ${names.projectName}\n`;
+        content += `  Kunde: ${names.clientName}\n`;
         content += `  Beschreibung: ${entry.description}\n\n`;
       });
 
@@ -10,6 +10,7 @@ import { Textarea } from '../ui/textarea';
 import { Separator } from '../ui/separator';
 import { useApp } from '../../context/AppContext';
 import { useToast } from '../../hooks/use-toast';
+import { backupApi } from '../../services/api';
 
 const Settings = () => {
   const { state, actions } = useApp();
@@ -78,61 +79,59 @@ const Settings = () => {
     });
   };
 
-  const handleExportData = () => {
-    const exportData = {
-      clients,
-      projects,
-      timeEntries,
-      invoices,
-      exportDate: new Date().toISOString(),
-      version: '1.0'
-    };
+  const handleExportData = async () => {
+    const adminToken = window.prompt('Admin-Token für das Backup:');
+    if (!adminToken) return;
 
-    const blob = new Blob([JSON.stringify(exportData, null, 2)], { type: 'application/json' });
-    const url = window.URL.createObjectURL(blob);
-    const a = document.createElement('a');
-    a.href = url;
-    a.download = `timetracker-backup-${new Date().toISOString().split('T')[0]}.json`;
-    document.body.appendChild(a);
-    a.click();
-    window.URL.revokeObjectURL(url);
-    document.body.removeChild(a);
+    try {
+      const blob = await backupApi.download(adminToken);
+      const url = window.URL.createObjectURL(blob);
+      const a = document.createElement('a');
+      a.href = url;
+      a.download = `timetracker-backup-${new Date().toISOString().split('T')[0]}.ndjson.gz`;
+      document.body.appendChild(a);
+      a.click();
+      window.URL.revokeObjectURL(url);
+      document.body.removeChild(a);
 
-    toast({
-      title: "Daten exportiert",
-      description: "Ihre Daten wurden erfolgreich exportiert."
-    });
+      toast({
+        title: "Daten exportiert",
+        description: "Das vollständige Backup wurde heruntergeladen."
+      });
+    } catch (error) {
+      toast({
+        title: "Export fehlgeschlagen",
+        description: error.message,
+        variant: "destructive"
+      });
+    }
   };
 
-  const handleImportData = (event) => {
+  const handleImportData = async (event) => {
     const file = event.target.files[0];
+    event.target.value = '';
     if (!file) return;
+    const adminToken = window.prompt('Admin-Token für die Wiederherstellung:');
+    if (!adminToken) return;
 
-    const reader = new FileReader();
-    reader.onload = (e) => {
-      try {
-        const importData = JSON.parse(e.target.result);
-        
-        // Validate data structure
-        if (!importData.clients || !importData.projects || !importData.timeEntries || !importData.invoices) {
-          throw new Error('Invalid data format');
-        }
-
-        // Import data (in a real app, you'd want to merge rather than replace)
-        // For this demo, we'll show a success message
-        toast({
-          title: "Import erfolgreich",
-          description: "Ihre Daten wurden erfolgreich importiert. Starten Sie die App neu, um die Änderungen zu sehen."
-        });
-      } catch (error) {
-        toast({
-          title: "Import fehlgeschlagen",
-          description: "Die Datei konnte nicht importiert werden. Überprüfen Sie das Dateiformat.",
-          variant: "destructive"
-        });
-      }
-    };
-    reader.readAsText(file);
+    try {
+      const result = await backupApi.restore(file, adminToken);
+      const restored = Object.values(result.restored).reduce((sum, count) => sum + count, 0);
+      toast({
+        title: "Import erfolgreich",
+        description: result.integrity.ok
+          ? `${restored} Datensätze wurden wiederhergestellt.`
+          : `${restored} Datensätze wurden wiederhergestellt, aber einige Verweise fehlen.`,
+        variant: result.integrity.ok ? undefined : "destructive"
+      });
+      await actions.fetchAllData();
+    } catch (error) {
+      toast({
+        title: "Import fehlgeschlagen",
+        description: error.message,
+        variant: "destructive"
+      });
+    }
   };
 
   const clearAllData = () => {
@@ -433,7 +432,7 @@ const Settings = () => {
                 <div className="relative">
                   <input
                     type="file"
-                    accept=".json"
+                    accept=".gz"
                     onChange={handleImportData}
                     className="absolute inset-0 w-full h-full opacity-0 cursor-pointer"
                   />
@@ -517,9 +517,9 @@ const TimeTracking = () => {
                       </Badge>
                     </div>
                     <div className="flex items-center space-x-4 text-sm text-muted-foreground">
-                      <span>{getProjectName(entry.projectId)}</span>
+                      <span>{entry.projectName || getProjectName(entry.projectId)}</span>
                       <span>•</span>
-                      <span>{getClientName(entry.projectId)}</span>
+                      <span>{entry.clientName || getClientName(entry.projectId)}</span>
                       <span>•</span>
                       <span>{new Date(entry.date).toLocaleDateString('de-DE')}</span>
                       {entry.startTime && entry.endTime && (
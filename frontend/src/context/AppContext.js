@@ -5,6 +5,7 @@ import {
   timeEntriesApi, 
   timerApi,
   invoicesApi,
+  batchApi,
   convertApiToFrontend
 } from '../services/api';
 import { loadFromStorage, saveToStorage } from '../data/mock';
@@ -363,13 +364,59 @@ export const AppProvider = ({ children }) => {
 
     // Data fetching actions
     fetchAllData: async () => {
-      await Promise.all([
-        fetchClients(),
-        fetchProjects(),
-        fetchTimeEntries(),
-        fetchInvoices(),
-        fetchActiveTimer()
-      ]);
+      // One round trip instead of five; fall back to separate requests if the batch fails
+      let responses;
+      try {
+        ({ responses } = await batchApi.run([
+          { id: 'clients', path: '/clients' },
+          { id: 'projects', path: '/projects' },
+          { id: 'timeEntries', path: '/time-entries' },
+          { id: 'invoices', path: '/invoices' },
+          { id: 'activeTimer', path: '/timer/active' }
+        ]));
+      } catch (error) {
+        console.error('Batch fetch failed, fetching individually:', error);
+        await Promise.all([
+          fetchClients(),
+          fetchProjects(),
+          fetchTimeEntries(),
+          fetchInvoices(),
+          fetchActiveTimer()
+        ]);
+        return;
+      }
+
+      const bodies = Object.fromEntries(
+        responses.filter(r => r.status === 200).map(r => [r.id, r.body])
+      );
+      const retries = [];
+      if (bodies.clients) {
+        dispatch({ type: ActionTypes.SET_CLIENTS, payload: bodies.clients.map(convertApiToFrontend.client) });
+      } else {
+        retries.push(fetchClients());
+      }
+      if (bodies.projects) {
+        dispatch({ type: ActionTypes.SET_PROJECTS, payload: bodies.projects.map(convertApiToFrontend.project) });
+      } else {
+        retries.push(fetchProjects());
+      }
+      if (bodies.timeEntries) {
+        dispatch({ type: ActionTypes.SET_TIME_ENTRIES, payload: bodies.timeEntries.map(convertApiToFrontend.timeEntry) });
+      } else {
+        retries.push(fetchTimeEntries());
+      }
+      if (bodies.invoices) {
+        dispatch({ type: ActionTypes.SET_INVOICES, payload: bodies.invoices.map(convertApiToFrontend.invoice) });
+      } else {
+        retries.push(fetchInvoices());
+      }
+      if ('activeTimer' in bodies) {
+        const timer = bodies.activeTimer;
+        dispatch({ type: ActionTypes.SET_ACTIVE_TIMER, payload: timer ? convertApiToFrontend.timer(timer) : null });
+      } else {
+        retries.push(fetchActiveTimer());
+      }
+      await Promise.all(retries);
     },
 
     refreshData: async () => {
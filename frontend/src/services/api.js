@@ -12,6 +12,10 @@ const api = axios.create({
   timeout: 10000, // 10 seconds timeout
 });
 
+// Requests carrying an Idempotency-Key are resent this often when their outcome is unknown
+const MAX_RETRIES = 3;
+const RETRY_BASE_DELAY_MS = 500;
+
 // Request interceptor for logging
 api.interceptors.request.use(
   (config) => {
@@ -29,14 +33,33 @@ api.interceptors.response.use(
   (response) => {
     return response.data;
   },
-  (error) => {
+  async (error) => {
     console.error('API Response Error:', error);
     
+    // Resend an idempotent request that timed out, lost its connection or is still
+    // in progress on the server; its key makes the server replay the first response
+    const config = error.config;
+    const retries = config?.retries || 0;
+    const status = error.response?.status;
+    const retryAfter = error.response?.headers?.['retry-after'];
+    if (
+      config?.headers?.['Idempotency-Key']
+      && retries < MAX_RETRIES
+      && (!error.response || (retryAfter && (status === 409 || status === 429 || status === 503)))
+    ) {
+      const delay = retryAfter ? parseFloat(retryAfter) * 1000 : RETRY_BASE_DELAY_MS * 2 ** retries;
+      await new Promise(resolve => setTimeout(resolve, delay));
+      return api({ ...config, retries: retries + 1 });
+    }
+    
     // Handle specific error cases
     if (error.response) {
       // Server responded with error status
       const message = error.response.data?.detail || error.response.data?.message || 'An error occurred';
-      throw new Error(message);
+      const failure = new Error(message);
+      failure.status = status;
+      failure.retryAfter = retryAfter;
+      throw failure;
     } else if (error.request) {
       // Request was made but no response received
       throw new Error('Network error - please check your connection');
@@ -47,11 +70,64 @@ api.interceptors.response.use(
   }
 );
 
+// Idempotency keys of POSTs whose outcome is unknown, by operation (path and body).
+// Kept in sessionStorage, so a double submit, a re-click after a timeout or a
+// reload resends the same key and the server creates nothing twice.
+const PENDING_KEYS = 'timetracker.idempotencyKeys';
+const PENDING_KEY_MAX_AGE_MS = 60 * 60 * 1000;
+
+const readPendingKeys = () => {
+  try {
+    const keys = JSON.parse(window.sessionStorage.getItem(PENDING_KEYS)) || {};
+    const now = Date.now();
+    return Object.fromEntries(Object.entries(keys).filter(([, { at }]) => now - at < PENDING_KEY_MAX_AGE_MS));
+  } catch {
+    return {};
+  }
+};
+
+const writePendingKeys = (keys) => {
+  try {
+    window.sessionStorage.setItem(PENDING_KEYS, JSON.stringify(keys));
+  } catch {
+    // Without storage, keys still cover retries within this page
+  }
+};
+
+const newIdempotencyKey = () => (window.crypto?.randomUUID
+  ? window.crypto.randomUUID()
+  : `${Date.now().toString(36)}-${Math.random().toString(36).slice(2)}`);
+
+// POST once per logical operation: the key is created when the operation is
+// first sent and reused until the server has settled it
+const idempotentPost = async (url, data) => {
+  const operation = `${url} ${JSON.stringify(data ?? null)}`;
+  const pending = readPendingKeys();
+  const key = pending[operation]?.key || newIdempotencyKey();
+  writePendingKeys({ ...pending, [operation]: { key, at: pending[operation]?.at || Date.now() } });
+  const settle = () => {
+    const { [operation]: settled, ...rest } = readPendingKeys();
+    writePendingKeys(rest);
+  };
+  try {
+    const result = await api.post(url, data, { headers: { 'Idempotency-Key': key } });
+    settle();
+    return result;
+  } catch (error) {
+    // Rejected by the server: the rejection is stored under the key, so a retry starts afresh.
+    // No response, a 5xx or a "try again later" (in progress, rate limited) leave the outcome open.
+    if (error.status && error.status < 500 && !error.retryAfter) {
+      settle();
+    }
+    throw error;
+  }
+};
+
 // Client API functions
 export const clientsApi = {
-  getAll: () => api.get('/clients'),
+  getAll: (params) => api.get('/clients', { params }),
   getById: (id) => api.get(`/clients/${id}`),
-  create: (data) => api.post('/clients', {
+  create: (data) => idempotentPost('/clients', {
     name: data.name,
     email: data.email,
     phone: data.phone || null,
@@ -70,9 +146,9 @@ export const clientsApi = {
 
 // Project API functions
 export const projectsApi = {
-  getAll: () => api.get('/projects'),
+  getAll: (params) => api.get('/projects', { params }),
   getById: (id) => api.get(`/projects/${id}`),
-  create: (data) => api.post('/projects', {
+  create: (data) => idempotentPost('/projects', {
     name: data.name,
     description: data.description || null,
     client_id: data.clientId,
@@ -97,9 +173,9 @@ export const projectsApi = {
 
 // Time Entry API functions
 export const timeEntriesApi = {
-  getAll: () => api.get('/time-entries'),
+  getAll: (params) => api.get('/time-entries', { params }),
   getById: (id) => api.get(`/time-entries/${id}`),
-  create: (data) => api.post('/time-entries', {
+  create: (data) => idempotentPost('/time-entries', {
     project_id: data.projectId,
     description: data.description,
     start_time: data.startTime,
@@ -123,18 +199,18 @@ export const timeEntriesApi = {
 // Timer API functions
 export const timerApi = {
   getActive: () => api.get('/timer/active'),
-  start: (data) => api.post('/timer/start', {
+  start: (data) => idempotentPost('/timer/start', {
     project_id: data.projectId,
     description: data.description
   }),
-  stop: () => api.post('/timer/stop')
+  stop: () => idempotentPost('/timer/stop')
 };
 
 // Invoice API functions
 export const invoicesApi = {
-  getAll: () => api.get('/invoices'),
+  getAll: (params) => api.get('/invoices', { params }),
   getById: (id) => api.get(`/invoices/${id}`),
-  create: (data) => api.post('/invoices', {
+  create: (data) => idempotentPost('/invoices', {
     client_id: data.clientId,
     project_id: data.projectId,
     invoice_number: data.invoiceNumber,
@@ -163,6 +239,65 @@ export const invoicesApi = {
   delete: (id) => api.delete(`/invoices/${id}`)
 };
 
+// Search API functions
+export const searchApi = {
+  search: (query, { types, page = 1, pageSize = 20 } = {}) => api.get('/search', {
+    params: {
+      q: query,
+      types: types ? types.join(',') : undefined,
+      page,
+      page_size: pageSize
+    }
+  })
+};
+
+// Reports API: totals are converted to one base currency on the server
+export const reportsApi = {
+  invoiceTotals: ({ baseCurrency, startDate, endDate } = {}) => api.get('/reports/invoices', {
+    params: { base_currency: baseCurrency, start_date: startDate, end_date: endDate }
+  }),
+  revenue: ({ groupBy = 'project', baseCurrency, startDate, endDate } = {}) => api.get('/reports/revenue', {
+    params: { group_by: groupBy, base_currency: baseCurrency, start_date: startDate, end_date: endDate }
+  })
+};
+
+// Periods API: closed months are locked and served from immutable snapshots
+export const periodsApi = {
+  getAll: () => api.get('/periods'),
+  getSnapshot: (period, version) => api.get(`/periods/${period}/snapshots/${version}`),
+  report: (start, end) => api.get('/reports/periods', { params: { start, end } }),
+  close: (period, adminToken) => api.post(`/admin/periods/${period}/close`, null, {
+    headers: { 'X-Admin-Token': adminToken }
+  }),
+  reopen: (period, adminToken) => api.post(`/admin/periods/${period}/reopen`, null, {
+    headers: { 'X-Admin-Token': adminToken }
+  })
+};
+
+// Audit API: recorded changes of a time entry or invoice
+export const auditApi = {
+  getByEntity: (entityId, limit = 100) => api.get(`/audit/${entityId}`, { params: { limit } })
+};
+
+// Batch API: several GET requests in one round trip
+export const batchApi = {
+  run: (requests) => api.post('/batch', { requests })
+};
+
+// Backup API (admin only): full server-side backup and restore
+export const backupApi = {
+  download: (adminToken) => api.get('/admin/backup', {
+    headers: { 'X-Admin-Token': adminToken },
+    responseType: 'blob',
+    timeout: 0
+  }),
+  restore: (file, adminToken, mode = 'merge') => api.post('/admin/restore', file, {
+    headers: { 'X-Admin-Token': adminToken, 'Content-Type': 'application/gzip' },
+    params: { mode },
+    timeout: 0
+  })
+};
+
 // Utility function to convert API response format to frontend format
 export const convertApiToFrontend = {
   client: (apiClient) => ({
@@ -197,6 +332,11 @@ export const convertApiToFrontend = {
     duration: apiEntry.duration,
     date: apiEntry.date,
     isManual: apiEntry.is_manual,
+    projectName: apiEntry.project_name,
+    clientId: apiEntry.client_id,
+    clientName: apiEntry.client_name,
+    billableAmount: apiEntry.billable_amount,
+    currency: apiEntry.currency,
     createdAt: apiEntry.created_at
   }),
   
@@ -213,6 +353,8 @@ export const convertApiToFrontend = {
     status: apiInvoice.status,
     timeEntries: apiInvoice.time_entries,
     customDescription: apiInvoice.custom_description,
+    projectName: apiInvoice.project_name,
+    clientName: apiInvoice.client_name,
     createdAt: apiInvoice.created_at
   }),
   
@@ -0,0 +1,46 @@
+import asyncio
+
+import pytest
+
+from backend.archive import ArchiveRangeError, archive_years, find_entries
+
+CATALOG = {"archived_before": "2023-01-01", "years": [2019, 2020, 2021, 2022]}
+
+
+def test_archive_years_only_for_ranges_reaching_into_archives():
+    assert archive_years(CATALOG, "2023-01-01", "2023-12-31") == []
+    assert archive_years(CATALOG, "2021-06-01", "2023-12-31") == [2021, 2022]
+    assert archive_years(CATALOG, None, "2020-12-31") == [2019, 2020]
+    assert archive_years({"archived_before": None, "years": []}, "2019-01-01") == []
+
+
+def test_listing_caps_the_archived_range():
+    with pytest.raises(ArchiveRangeError):
+        asyncio.run(find_entries(None, None, CATALOG, {}, None, "2015-01-01", "2022-12-31"))
+
+
+class Collection:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def find(self, query, fields):
+        return self
+
+    async def to_list(self, limit):
+        return self.docs
+
+
+def test_open_start_ranges_read_the_archives():
+    hot = Collection([{"id": "hot"}])
+    archives = {f"time_entries_archive_{year}": Collection([{"id": str(year)}]) for year in CATALOG["years"]}
+    catalog = {"archived_before": "2023-01-01", "years": [2020, 2021, 2022]}
+
+    entries = asyncio.run(find_entries(hot, archives, catalog, {}, None, None, "2022-12-31"))
+
+    assert [entry["id"] for entry in entries] == ["hot", "2020", "2021", "2022"]
+    assert asyncio.run(find_entries(hot, archives, catalog, {}, None)) == [{"id": "hot"}]
+
+
+def test_open_start_ranges_are_capped_too():
+    with pytest.raises(ArchiveRangeError):
+        asyncio.run(find_entries(None, None, CATALOG, {}, None, None, "2024-12-31"))
@@ -0,0 +1,88 @@
+import asyncio
+from enum import Enum
+
+from backend.audit import AuditLog, diff
+from backend.metrics import AUDIT_RECORDS
+
+
+class Status(Enum):
+    draft = "draft"
+    paid = "paid"
+
+
+class Records:
+    def __init__(self, fail=False):
+        self.batches = []
+        self.fail = fail
+
+    async def insert_many(self, records, ordered=True):
+        if self.fail:
+            raise RuntimeError("database down")
+        self.batches.append(records)
+
+
+def dropped():
+    return AUDIT_RECORDS.labels("dropped")._value.get()
+
+
+def test_diff_lists_changed_fields_only():
+    before = {"_id": 1, "status": Status.draft, "total": 10, "updated_at": 1, "tags": ("a",)}
+    after = {"_id": 2, "status": Status.paid, "total": 10, "updated_at": 2, "tags": ["a"], "note": "x"}
+
+    assert diff(before, after) == {
+        "note": {"before": None, "after": "x"},
+        "status": {"before": "draft", "after": "paid"},
+    }
+    assert diff(None, {"total": 10}) == {"total": {"before": None, "after": 10}}
+
+
+def test_queued_records_are_written_on_shutdown():
+    records = Records()
+    audit = AuditLog(records, batch_size=2)
+
+    async def scenario():
+        audit.start()
+        for index in range(5):
+            audit.record("invoice", "create", str(index), after={"n": index})
+        # Updates that change nothing are not recorded
+        audit.record("invoice", "update", "0", before={"n": 0}, after={"n": 0})
+        await audit.stop()
+
+    asyncio.run(scenario())
+
+    written = [record["entity_id"] for batch in records.batches for record in batch]
+    assert written == ["0", "1", "2", "3", "4"]
+    assert all(len(batch) <= 2 for batch in records.batches)
+
+
+def test_full_queue_drops_records_without_blocking():
+    records = Records()
+    audit = AuditLog(records, max_queue=2)
+    before = dropped()
+
+    async def scenario():
+        for index in range(3):
+            audit.record("time_entry", "delete", str(index), before={"n": index})
+        # Started late: what fit in the queue is still written
+        audit.start()
+        await audit.stop()
+
+    asyncio.run(scenario())
+
+    assert dropped() == before + 1
+    assert [record["entity_id"] for batch in records.batches for record in batch] == ["0", "1"]
+
+
+def test_failed_writes_are_counted_and_the_writer_keeps_going():
+    audit = AuditLog(Records(fail=True), batch_size=1)
+    before = dropped()
+
+    async def scenario():
+        audit.start()
+        audit.record("time_entry", "create", "1", after={"n": 1})
+        audit.record("time_entry", "create", "2", after={"n": 2})
+        await audit.stop()
+
+    asyncio.run(scenario())
+
+    assert dropped() == before + 2
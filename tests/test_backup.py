@@ -0,0 +1,168 @@
+import asyncio
+import gzip
+import uuid
+
+import pytest
+
+from backend.backup import BackupError, backup_stream, restore_backup, verify_backup
+from backend.storage import from_storage, to_storage
+
+CLIENT_ID, PROJECT_ID = str(uuid.uuid4()), str(uuid.uuid4())
+CLIENTS = [{"id": CLIENT_ID, "name": "Acme"}]
+PROJECTS = [{"id": PROJECT_ID, "client_id": CLIENT_ID, "name": "Site"}]
+ENTRIES = [
+    {"id": str(uuid.uuid4()), "project_id": PROJECT_ID, "date": "2024-03-04", "duration": 60},
+    {"id": str(uuid.uuid4()), "project_id": PROJECT_ID, "date": "2024-03-05", "duration": 30},
+]
+
+
+class Cursor:
+    def __init__(self, docs):
+        self.docs = docs
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda doc: str(doc[field]))
+        return self
+
+    def batch_size(self, size):
+        return self
+
+    async def __aiter__(self):
+        for doc in self.docs:
+            yield doc
+
+
+class Aggregation:
+    def __init__(self, result):
+        self.result = result
+
+    async def to_list(self, length):
+        return self.result
+
+
+class Collection:
+    def __init__(self, db):
+        self.db = db
+        self.docs = []
+
+    def find(self):
+        return Cursor(list(self.docs))
+
+    async def delete_many(self, query):
+        self.docs.clear()
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+    async def bulk_write(self, operations, ordered=True):
+        for operation in operations:
+            key, = operation._filter.items()
+            field, value = key
+            values = value["$in"] if isinstance(value, dict) else [value]
+            self.docs = [doc for doc in self.docs if doc.get(field) not in values]
+            self.docs.append(operation._doc)
+
+    def aggregate(self, pipeline, allowDiskUse=False):
+        # Only the reference check of check_integrity
+        lookup = pipeline[1]["$lookup"]
+        targets = {doc["id"] for doc in self.db[lookup["from"]].docs}
+        orphans = [doc["id"] for doc in self.docs if doc.get(lookup["localField"]) not in targets]
+        return Aggregation([{"count": len(orphans), "sample": orphans[:10]}] if orphans else [])
+
+
+class Db(dict):
+    def __missing__(self, name):
+        self[name] = Collection(self)
+        return self[name]
+
+    async def list_collection_names(self):
+        return [name for name, collection in self.items() if collection.docs]
+
+
+def populated(clients=CLIENTS, projects=PROJECTS, entries=ENTRIES):
+    db = Db()
+    for name, docs in (("clients", clients), ("projects", projects), ("time_entries", entries)):
+        db[name].docs = [dict(to_storage(doc), _id=index) for index, doc in enumerate(docs)]
+    return db
+
+
+def write_backup(db, path):
+    async def collect():
+        return b"".join([chunk async for chunk in backup_stream(db)])
+
+    path.write_bytes(asyncio.run(collect()))
+    return path
+
+
+def stored(db, name):
+    return [{k: v for k, v in from_storage(doc).items() if k != "_id"} for doc in db[name].docs]
+
+
+def test_backup_restore_round_trip(tmp_path):
+    path = write_backup(populated(), tmp_path / "backup.ndjson.gz")
+
+    manifest = verify_backup(str(path))
+    target = Db()
+    result = asyncio.run(restore_backup(target, str(path), mode="replace"))
+
+    assert manifest["collections"]["time_entries"]["count"] == 2
+    assert result["restored"] == {"clients": 1, "projects": 1, "time_entries": 2, "invoices": 0,
+                                  "active_timers": 0}
+    assert stored(target, "time_entries") == ENTRIES
+    assert result["integrity"] == {"ok": True, "orphans": []}
+
+
+def test_merge_keeps_documents_missing_from_the_backup(tmp_path):
+    path = write_backup(populated(), tmp_path / "backup.ndjson.gz")
+    extra = {"id": str(uuid.uuid4()), "name": "Other"}
+    target = populated(clients=[dict(CLIENTS[0], name="Renamed"), extra], projects=[], entries=[])
+
+    asyncio.run(restore_backup(target, str(path), mode="merge"))
+
+    assert sorted(client["name"] for client in stored(target, "clients")) == ["Acme", "Other"]
+
+
+def test_truncated_backups_are_rejected(tmp_path):
+    path = write_backup(populated(), tmp_path / "backup.ndjson.gz")
+    path.write_bytes(path.read_bytes()[:-20])
+    target = populated(entries=[])
+
+    with pytest.raises(BackupError):
+        asyncio.run(restore_backup(target, str(path), mode="replace"))
+    # Nothing is written unless the whole file verifies
+    assert stored(target, "clients") == CLIENTS
+
+
+def test_altered_documents_are_rejected(tmp_path):
+    path = write_backup(populated(), tmp_path / "backup.ndjson.gz")
+    lines = gzip.decompress(path.read_bytes())
+    path.write_bytes(gzip.compress(lines.replace(b'"duration": 30', b'"duration": 31')))
+
+    with pytest.raises(BackupError, match="checksum"):
+        verify_backup(str(path))
+
+
+def test_other_files_are_rejected(tmp_path):
+    path = tmp_path / "notes.txt"
+    path.write_bytes(b"not a backup")
+    with pytest.raises(BackupError, match="damaged"):
+        verify_backup(str(path))
+
+    path.write_bytes(gzip.compress(b'{"hello": "world"}\n'))
+    with pytest.raises(BackupError, match="Not a TimeTracker backup"):
+        verify_backup(str(path))
+
+
+def test_integrity_reports_missing_references(tmp_path):
+    path = write_backup(populated(projects=[]), tmp_path / "backup.ndjson.gz")
+
+    integrity = asyncio.run(restore_backup(Db(), str(path), mode="replace"))["integrity"]
+
+    assert not integrity["ok"]
+    assert integrity["orphans"] == [{
+        "collection": "time_entries",
+        "field": "project_id",
+        "references": "projects",
+        "count": 2,
+        "sample": [entry["id"] for entry in ENTRIES],
+    }]
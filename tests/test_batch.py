@@ -0,0 +1,51 @@
+from fastapi.testclient import TestClient
+
+from backend.batch import MAX_BATCH_SIZE
+from backend.server import create_app
+from backend.settings import Settings
+
+BAD_REPORT = "/reports/periods?start=2024-05&end=2024-01"
+
+
+def client(**settings):
+    return TestClient(create_app(Settings(**settings)))
+
+
+def batch(http, *paths):
+    return http.post("/api/batch", json={"requests": [{"id": str(i), "path": path} for i, path in enumerate(paths)]})
+
+
+def test_sub_requests_run_and_fail_on_their_own():
+    response = batch(client(), "/health/live", "/unknown", BAD_REPORT, "/")
+
+    assert response.status_code == 200
+    responses = response.json()["responses"]
+    assert [r["id"] for r in responses] == ["0", "1", "2", "3"]
+    assert [r["status"] for r in responses] == [200, 404, 400, 200]
+    assert responses[0]["body"]["status"] == "alive"
+    assert responses[2]["body"] == {"detail": "end must not be before start"}
+
+
+def test_only_get_sub_requests_are_accepted():
+    response = client().post("/api/batch", json={"requests": [{"method": "POST", "path": "/clients"}]})
+
+    assert response.status_code == 422
+
+
+def test_batch_size_is_limited():
+    assert batch(client(), *["/"] * MAX_BATCH_SIZE).status_code == 200
+    assert batch(client(), *["/"] * (MAX_BATCH_SIZE + 1)).status_code == 400
+
+
+def test_nested_batches_are_rejected():
+    assert batch(client(), "/batch").status_code == 400
+
+
+def test_expensive_sub_requests_are_charged_one_by_one():
+    http = client(rate_limit_expensive_burst=2, rate_limit_expensive_per_second=0.01)
+
+    statuses = [r["status"] for r in batch(http, BAD_REPORT, BAD_REPORT, BAD_REPORT, "/").json()["responses"]]
+
+    assert statuses == [400, 400, 429, 200]
+    # The budget is shared with requests sent on their own
+    assert http.get("/api" + BAD_REPORT).status_code == 429
@@ -0,0 +1,52 @@
+from backend.exchange_rates import ExchangeRates
+
+RATES = """date,currency,rate
+2024-01-01,USD,1.10
+2024-01-04,USD,1.20
+2024-01-02,CHF,0.95
+"""
+
+
+def rates(tmp_path):
+    path = tmp_path / "rates.csv"
+    path.write_text(RATES)
+    return ExchangeRates(str(path))
+
+
+def literals(expression):
+    """Every $literal array embedded in an aggregation expression"""
+    if isinstance(expression, dict):
+        if "$literal" in expression:
+            return [expression["$literal"]]
+        return [found for value in expression.values() for found in literals(value)]
+    if isinstance(expression, list):
+        return [found for value in expression for found in literals(value)]
+    return []
+
+
+def test_rate_applies_until_the_next_one(tmp_path):
+    table = rates(tmp_path)
+
+    assert table.rate("USD", "2023-12-31") is None
+    assert table.rate("USD", "2024-01-03") == 1.10
+    assert table.rate("USD", "2024-01-04") == 1.20
+    assert table.rate("EUR", "1999-01-01") == 1.0
+    assert round(table.convert(12, "USD", "EUR", "2024-01-05"), 2) == 10.0
+    assert table.convert(5, "CHF", "USD", "2024-01-01") is None
+
+
+def test_daily_rates_cover_the_range(tmp_path):
+    table = rates(tmp_path)
+
+    assert table.daily("USD", "2024-01-03", "2024-01-06") == [1.10, 1.20, 1.20, 1.20]
+    assert table.daily("CHF", "2023-12-31", "2024-01-02") == [None, None, 0.95]
+
+
+def test_factor_expression_embeds_only_the_queried_days(tmp_path):
+    table = rates(tmp_path)
+
+    expression = table.factor_expression("$currency", "$day", "USD", "2024-03-01", "2024-03-31")
+
+    # USD as the base and CHF as a source; EUR is the reference and needs no table
+    assert sorted(len(days) for days in literals(expression)) == [31, 31]
+    assert all(days == [1.20] * 31 for days in literals(expression) if 1.20 in days)
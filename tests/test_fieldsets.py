@@ -0,0 +1,45 @@
+import json
+
+import pytest
+from fastapi import HTTPException
+
+from backend.fieldsets import parse_fields, projection, sparse_response
+from backend.models import Client, TimeEntry
+
+
+def test_id_is_always_included_once():
+    assert parse_fields("name,email", Client) == ("id", "name", "email")
+    assert parse_fields(" name , id,name,", Client) == ("name", "id")
+    assert parse_fields("", Client) is None
+
+
+def test_unknown_fields_are_rejected():
+    with pytest.raises(HTTPException) as raised:
+        parse_fields("name,secret", Client)
+
+    assert raised.value.status_code == 400
+    assert raised.value.detail == "Unknown fields: secret"
+
+
+def test_projection_returns_only_the_fields():
+    assert projection(("id", "name")) == {"_id": 0, "id": 1, "name": 1}
+
+
+def test_sparse_response_keeps_only_the_requested_fields():
+    docs = [{"id": "e1", "duration": 30, "date": "2024-03-04"}]
+
+    response = sparse_response(TimeEntry, ("id", "duration"), docs)
+
+    assert json.loads(response.body) == [{"id": "e1", "duration": 30}]
+
+
+def test_fields_missing_from_stored_documents_are_null():
+    # A legacy document without the field, and one without even an id
+    docs = [{"id": "c1"}, {"name": "Acme"}]
+
+    response = sparse_response(Client, ("id", "name", "is_active"), docs)
+
+    assert json.loads(response.body) == [
+        {"id": "c1", "name": None, "is_active": None},
+        {"id": None, "name": "Acme", "is_active": None},
+    ]
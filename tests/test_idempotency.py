@@ -0,0 +1,108 @@
+import asyncio
+from datetime import datetime, timedelta
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from fastapi.testclient import TestClient
+from pymongo.errors import DuplicateKeyError
+
+from backend.idempotency import LOCK_TIMEOUT, IdempotencyMiddleware
+
+
+class Keys:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        if doc["_id"] in self.docs:
+            raise DuplicateKeyError("duplicate")
+        self.docs[doc["_id"]] = dict(doc)
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def find_one_and_update(self, query, update):
+        doc = self.docs.get(query["_id"])
+        if doc is None or doc["status"] != query["status"] or not doc["created_at"] < query["created_at"]["$lt"]:
+            return None
+        doc.update(update["$set"])
+        return doc
+
+    async def update_one(self, query, update):
+        self.docs[query["_id"]].update(update["$set"])
+
+    async def delete_one(self, query):
+        if self.docs.get(query["_id"], {}).get("status") == query["status"]:
+            del self.docs[query["_id"]]
+
+
+def client():
+    app = FastAPI()
+    calls = []
+
+    @app.post("/api/things")
+    async def create(request: Request):
+        body = await request.json()
+        calls.append(body)
+        if body.get("fail"):
+            return JSONResponse({"detail": "boom"}, status_code=500)
+        return JSONResponse({"created": len(calls)}, status_code=201)
+
+    keys = Keys()
+    app.add_middleware(IdempotencyMiddleware, collection=keys)
+    return TestClient(app), keys, calls
+
+
+def test_replay_returns_the_stored_response():
+    http, keys, calls = client()
+
+    first = http.post("/api/things", json={"name": "a"}, headers={"Idempotency-Key": "k1"})
+    second = http.post("/api/things", json={"name": "a"}, headers={"Idempotency-Key": "k1"})
+
+    assert first.status_code == second.status_code == 201
+    assert second.json() == first.json() == {"created": 1}
+    assert second.headers["idempotent-replayed"] == "true"
+    assert len(calls) == 1
+
+
+def test_same_key_for_another_request_is_rejected():
+    http, keys, calls = client()
+
+    http.post("/api/things", json={"name": "a"}, headers={"Idempotency-Key": "k1"})
+    other_body = http.post("/api/things", json={"name": "b"}, headers={"Idempotency-Key": "k1"})
+    other_path = http.post("/api/things?copy=1", json={"name": "a"}, headers={"Idempotency-Key": "k1"})
+
+    assert other_body.status_code == other_path.status_code == 422
+    assert len(calls) == 1
+
+
+def test_request_during_an_in_progress_claim_is_told_to_retry():
+    keys = Keys()
+    middleware = IdempotencyMiddleware(None, keys)
+
+    assert asyncio.run(middleware._claim("k1", "fingerprint")) is None
+    response = asyncio.run(middleware._claim("k1", "fingerprint"))
+
+    assert response.status_code == 409
+    assert response.headers["retry-after"] == "1"
+
+
+def test_stale_in_progress_claim_is_taken_over():
+    keys = Keys()
+    middleware = IdempotencyMiddleware(None, keys)
+    asyncio.run(middleware._claim("k1", "fingerprint"))
+    keys.docs["k1"]["created_at"] = datetime.utcnow() - LOCK_TIMEOUT - timedelta(seconds=1)
+
+    assert asyncio.run(middleware._claim("k1", "fingerprint")) is None
+    assert keys.docs["k1"]["created_at"] > datetime.utcnow() - LOCK_TIMEOUT
+
+
+def test_server_errors_are_not_stored():
+    http, keys, calls = client()
+
+    first = http.post("/api/things", json={"fail": True}, headers={"Idempotency-Key": "k1"})
+
+    assert first.status_code == 500
+    assert keys.docs == {}
+    http.post("/api/things", json={"fail": True}, headers={"Idempotency-Key": "k1"})
+    assert len(calls) == 2
@@ -0,0 +1,80 @@
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from backend.middleware import CacheControlMiddleware, CompressionMiddleware
+
+ITEMS = [{"id": i, "name": f"item {i}"} for i in range(200)]
+
+
+def client():
+    app = FastAPI()
+
+    @app.get("/api/items")
+    async def items():
+        return ITEMS
+
+    @app.get("/api/small")
+    async def small():
+        return {"ok": True}
+
+    @app.get("/api/timer/active")
+    async def timer():
+        return ITEMS
+
+    # Registered like create_app: cache control inside compression
+    app.add_middleware(CacheControlMiddleware, rules={"/api/timer": "no-store"})
+    app.add_middleware(CompressionMiddleware, minimum_size=1024)
+    return TestClient(app)
+
+
+def test_small_responses_are_not_compressed():
+    response = client().get("/api/small", headers={"Accept-Encoding": "gzip"})
+
+    assert "content-encoding" not in response.headers
+    assert response.headers["etag"].startswith('"')
+
+
+def test_encoding_is_negotiated():
+    http = client()
+
+    gzip = http.get("/api/items", headers={"Accept-Encoding": "gzip"})
+    refused = http.get("/api/items", headers={"Accept-Encoding": "gzip;q=0"})
+    identity = http.get("/api/items", headers={"Accept-Encoding": "identity"})
+
+    assert gzip.headers["content-encoding"] == "gzip"
+    assert gzip.headers["vary"] == "Accept-Encoding"
+    assert gzip.json() == ITEMS
+    assert int(gzip.headers["content-length"]) < len(identity.content)
+    assert "content-encoding" not in refused.headers
+    assert "content-encoding" not in identity.headers
+
+
+def test_not_modified_carries_the_validators_of_the_200():
+    http = client()
+
+    for accept_encoding in ("gzip", "identity"):
+        headers = {"Accept-Encoding": accept_encoding}
+        full = http.get("/api/items", headers=headers)
+        cached = http.get("/api/items", headers={**headers, "If-None-Match": full.headers["etag"]})
+
+        assert full.status_code == 200
+        assert cached.status_code == 304
+        assert cached.content == b""
+        assert cached.headers["etag"] == full.headers["etag"]
+        assert cached.headers.get("vary") == full.headers.get("vary")
+        assert "content-type" not in cached.headers
+        assert "content-length" not in cached.headers
+
+
+def test_changed_body_is_sent_again():
+    response = client().get("/api/items", headers={"If-None-Match": '"stale"'})
+
+    assert response.status_code == 200
+    assert response.headers["cache-control"] == "private, no-cache"
+
+
+def test_no_store_routes_get_no_etag():
+    response = client().get("/api/timer/active")
+
+    assert response.headers["cache-control"] == "no-store"
+    assert "etag" not in response.headers
@@ -0,0 +1,55 @@
+import random
+from datetime import date, datetime, timedelta
+
+from backend.overlaps import days_touched, sweep_overlaps
+from backend.synthetic import DaySlots, entry_days, time_entry_payload
+
+
+def entry(entry_id, start, minutes):
+    start_time = datetime(2024, 3, 4) + timedelta(minutes=start)
+    return {"id": entry_id, "start_time": start_time, "end_time": start_time + timedelta(minutes=minutes)}
+
+
+def test_sweep_overlaps_finds_every_pair():
+    entries = [entry("a", 0, 120), entry("b", 30, 30), entry("c", 90, 60), entry("d", 200, 10)]
+
+    conflicts = sweep_overlaps(entries)
+
+    pairs = {(c["first"]["id"], c["second"]["id"]): c["overlap_minutes"] for c in conflicts}
+    assert pairs == {("a", "b"): 30, ("a", "c"): 30}
+
+
+def test_sweep_overlaps_ignores_touching_entries():
+    assert sweep_overlaps([entry("a", 0, 60), entry("b", 60, 60)]) == []
+
+
+def test_days_touched_covers_ranges_across_midnight():
+    start = datetime(2024, 3, 4, 22)
+
+    assert days_touched(start, start + timedelta(hours=1)) == ["2024-03-04"]
+    assert days_touched(start, datetime(2024, 3, 5)) == ["2024-03-04"]
+    assert days_touched(start, datetime(2024, 3, 5, 1)) == ["2024-03-04", "2024-03-05"]
+
+
+def test_synthetic_entries_do_not_overlap():
+    rng = random.Random(7)
+    slots = DaySlots()
+    payloads = [
+        time_entry_payload(rng, project, day, slots)
+        for project in ("p1", "p2", "p3")
+        for day in entry_days(rng, 300, date(2024, 1, 1))
+    ]
+    entries = sorted(
+        (
+            {
+                "id": index,
+                "start_time": datetime.fromisoformat(p["start_time"]),
+                "end_time": datetime.fromisoformat(p["end_time"]),
+            }
+            for index, p in enumerate(payloads)
+        ),
+        key=lambda e: e["start_time"],
+    )
+
+    assert sweep_overlaps(entries) == []
+    assert all(p["date"] == p["start_time"][:10] for p in payloads)
@@ -0,0 +1,96 @@
+import asyncio
+
+import pytest
+
+from backend import periods
+from backend.periods import PeriodClosed, close_period, open_period_write
+
+
+class PeriodWrites:
+    def __init__(self):
+        self.docs = {}
+
+    async def insert_one(self, doc):
+        self.docs[doc["_id"]] = doc
+
+    async def delete_one(self, query):
+        self.docs.pop(query["_id"], None)
+
+    async def find_one(self, query, projection=None):
+        for doc in self.docs.values():
+            if query["periods"] in doc["periods"] and doc["started_at"] > query["started_at"]["$gt"]:
+                return doc
+        return None
+
+
+class Periods:
+    def __init__(self):
+        self.docs = {}
+
+    async def find_one(self, query):
+        return self.docs.get(query["_id"])
+
+    async def update_one(self, query, update, upsert=False):
+        self.docs.setdefault(query["_id"], {"_id": query["_id"]}).update(update["$set"])
+
+    async def find(self, query, projection=None):
+        for doc in list(self.docs.values()):
+            if doc.get("locked") and doc["_id"] in query["_id"]["$in"]:
+                yield doc
+
+
+class Snapshots:
+    async def find_one(self, query):
+        return None
+
+    async def insert_one(self, doc):
+        pass
+
+
+class Db:
+    def __init__(self):
+        self.period_writes = PeriodWrites()
+        self.periods = Periods()
+        self.period_snapshots = Snapshots()
+
+
+@pytest.fixture
+def db(monkeypatch):
+    async def load_catalog(db):
+        return {}
+
+    async def period_totals(db, catalog, period):
+        return {"projects": [], "clients": [], "totals": {}, "minutes": 0, "entries": len(written)}
+
+    written = []
+    monkeypatch.setattr(periods, "load_catalog", load_catalog)
+    monkeypatch.setattr(periods, "period_totals", period_totals)
+    db = Db()
+    db.written = written
+    return db
+
+
+def test_close_waits_for_writes_that_passed_the_check(db):
+    async def scenario():
+        async with open_period_write(db, "2024-03-04"):
+            closing = asyncio.create_task(close_period(db, "2024-03"))
+            await asyncio.sleep(0.3)
+            # Locked, but the snapshot waits for this write
+            assert db.periods.docs["2024-03"]["locked"]
+            assert not closing.done()
+            db.written.append("entry")
+        return await closing
+
+    assert asyncio.run(scenario())["entries"] == 1
+    assert db.period_writes.docs == {}
+
+
+def test_writes_after_the_lock_are_rejected(db):
+    async def scenario():
+        await close_period(db, "2024-03")
+        async with open_period_write(db, "2024-04-01", "2024-03-31"):
+            pass
+
+    with pytest.raises(PeriodClosed, match="2024-03"):
+        asyncio.run(scenario())
+    assert db.period_writes.docs == {}
@@ -0,0 +1,69 @@
+import asyncio
+
+from fastapi.testclient import TestClient
+from starlette.datastructures import Headers
+
+from backend.rate_limit import BucketPolicy, LocalBuckets, RateLimitMiddleware
+from backend.server import create_app
+from backend.settings import Settings
+
+
+class Clock:
+    def __init__(self):
+        self.now = 100.0
+
+    def __call__(self):
+        return self.now
+
+
+def take(buckets, key, policy):
+    return asyncio.run(buckets.take(key, policy))
+
+
+def test_bucket_allows_burst_then_refills_at_rate():
+    clock = Clock()
+    buckets = LocalBuckets(clock=clock)
+    policy = BucketPolicy(rate=2, burst=3)
+
+    assert [take(buckets, "a", policy)[0] for _ in range(3)] == [True, True, True]
+    allowed, retry_after = take(buckets, "a", policy)
+    assert not allowed
+    assert retry_after == 0.5
+
+    clock.now += 0.5
+    assert take(buckets, "a", policy) == (True, 0)
+    # Refilling never exceeds the burst
+    clock.now += 60
+    assert [take(buckets, "a", policy)[0] for _ in range(4)] == [True, True, True, False]
+
+
+def test_buckets_evict_least_recently_used():
+    buckets = LocalBuckets(max_buckets=2, clock=Clock())
+    policy = BucketPolicy(rate=1, burst=1)
+
+    take(buckets, "a", policy)
+    take(buckets, "b", policy)
+    take(buckets, "a", policy)
+    take(buckets, "c", policy)
+
+    assert list(buckets._buckets) == ["a", "c"]
+
+
+def test_unknown_api_keys_share_the_ip_bucket():
+    limiter = RateLimitMiddleware(None, {}, api_keys=("known",))
+    scope = {"client": ("10.0.0.1", 1234)}
+
+    def key(api_key):
+        return limiter.client_key(scope, Headers({"x-api-key": api_key}))
+
+    assert key("random-1") == key("random-2") == "ip:10.0.0.1"
+    assert key("known").startswith("key:")
+
+
+def test_rejections_carry_cors_headers():
+    http = TestClient(create_app(Settings(rate_limit_cheap_burst=2, rate_limit_cheap_per_second=0.01)))
+    responses = [http.get("/api/unknown", headers={"Origin": "https://app.example"}) for _ in range(3)]
+
+    assert [response.status_code for response in responses] == [404, 404, 429]
+    assert responses[-1].headers["access-control-allow-origin"] == "*"
+    assert "Retry-After" in responses[-1].headers["access-control-expose-headers"]
@@ -0,0 +1,59 @@
+from datetime import date
+
+from backend.rates import OPEN_START, add_rate, billing, initial_history, last_day_before, rate_on
+
+TODAY = date.today().isoformat()
+
+
+def legacy_project():
+    # Written before rate histories existed: no rate_history and no start_date
+    return {"id": "p1", "hourly_rate": 100.0, "currency": "EUR"}
+
+
+def test_rate_change_on_legacy_project_keeps_earlier_amounts():
+    project = legacy_project()
+    before = billing(project, 90, "2023-05-02")
+
+    change = {"rate": 150.0, "currency": "EUR", "valid_from": TODAY}
+    history, window = add_rate(initial_history(project), change)
+    updated = {**project, "rate_history": history}
+
+    assert window == (TODAY, None)
+    assert billing(updated, 90, "2023-05-02") == before == {"billable_amount": 150.0, "currency": "EUR"}
+    assert rate_on(updated, TODAY) == (150.0, "EUR")
+
+
+def test_initial_history_is_open_ended():
+    history = initial_history({"hourly_rate": 80.0, "start_date": "2024-02-01"})
+
+    assert history == [{"rate": 80.0, "currency": "EUR", "valid_from": OPEN_START}]
+
+
+def test_rate_on_picks_the_entry_valid_on_the_day():
+    project = {"hourly_rate": 120.0, "rate_history": [
+        {"rate": 100.0, "currency": "EUR", "valid_from": "2024-01-01"},
+        {"rate": 120.0, "currency": "USD", "valid_from": "2024-07-01"},
+    ]}
+
+    assert rate_on(project, "2023-12-31") == (100.0, "EUR")
+    assert rate_on(project, "2024-06-30") == (100.0, "EUR")
+    assert rate_on(project, "2024-07-01") == (120.0, "USD")
+    assert rate_on({"hourly_rate": 90.0}, "2024-07-01") == (90.0, "EUR")
+
+
+def test_add_rate_window_is_bounded_by_the_next_change():
+    history = [
+        {"rate": 100.0, "currency": "EUR", "valid_from": "2024-01-01"},
+        {"rate": 120.0, "currency": "EUR", "valid_from": "2024-07-01"},
+    ]
+
+    _, middle = add_rate(history, {"rate": 110.0, "currency": "EUR", "valid_from": "2024-03-01"})
+    _, first = add_rate(history, {"rate": 90.0, "currency": "EUR", "valid_from": "2023-01-01"})
+    replaced, last = add_rate(history, {"rate": 130.0, "currency": "EUR", "valid_from": "2024-07-01"})
+
+    assert middle == ("2024-03-01", "2024-07-01")
+    # A change before the first entry also governs the days before it
+    assert first == (None, "2024-01-01")
+    assert last == ("2024-07-01", None)
+    assert [entry["rate"] for entry in replaced] == [100.0, 130.0]
+    assert last_day_before("2024-07-01") == "2024-06-30"
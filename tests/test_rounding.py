@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from backend.models import ProjectUpdate
+from backend.rounding import DEFAULT_RULE, compile_rule, entry_durations
+from backend.server import cleared_fields
+
+
+class Clients:
+    def __init__(self, rule):
+        self.rule = rule
+        self.reads = 0
+
+    async def find_one(self, query, projection=None):
+        self.reads += 1
+        return {"rounding": self.rule}
+
+
+class Db:
+    def __init__(self, client_rule=None):
+        self.clients = Clients(client_rule)
+
+
+def durations(db, project, seconds):
+    return asyncio.run(entry_durations(db, project, seconds))
+
+
+@pytest.mark.parametrize("mode, minutes", [("up", [15, 15, 15, 30]), ("down", [5, 5, 15, 15]),
+                                           ("nearest", [5, 15, 15, 15])])
+def test_compile_rule_modes(mode, minutes):
+    rule = compile_rule({"increment": 15, "mode": mode, "minimum": 5})
+
+    assert [rule(seconds) for seconds in (60, 450, 900, 901)] == minutes
+
+
+def test_default_rule_cuts_to_whole_minutes():
+    rule = compile_rule(DEFAULT_RULE)
+
+    assert [rule(seconds) for seconds in (0, 59, 119, 3600)] == [1, 1, 1, 60]
+
+
+def test_unknown_mode_is_rejected():
+    with pytest.raises(ValueError):
+        compile_rule({"increment": 5, "mode": "sideways"})
+
+
+def test_project_rule_wins_over_client_rule():
+    db = Db({"increment": 30, "mode": "up", "minimum": 30})
+    project = {"id": "p", "client_id": "c", "rounding": {"increment": 15, "mode": "up", "minimum": 15}}
+
+    assert durations(db, project, 10 * 60) == {"raw_duration": 600, "duration": 15}
+    assert db.clients.reads == 0
+
+
+def test_changed_client_rule_applies_to_the_next_entry():
+    db = Db({"increment": 30, "mode": "up", "minimum": 30})
+    project = {"id": "p", "client_id": "c", "rounding": None}
+
+    assert durations(db, project, 20 * 60)["duration"] == 30
+    db.clients.rule = None
+    assert durations(db, project, 20 * 60)["duration"] == 20
+
+
+def test_explicit_null_clears_a_rule():
+    assert cleared_fields(ProjectUpdate(rounding=None), "rounding") == {"$unset": {"rounding": ""}}
+    assert cleared_fields(ProjectUpdate(name="Renamed"), "rounding") == {}
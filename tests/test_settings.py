@@ -0,0 +1,14 @@
+from fastapi.testclient import TestClient
+
+from backend.server import create_app
+from backend.settings import Settings
+
+
+def test_defaults_match_an_empty_environment():
+    assert Settings() == Settings.from_env({})
+
+
+def test_default_app_does_not_store_health_checks():
+    response = TestClient(create_app(Settings())).get("/api/health/live")
+
+    assert response.headers["cache-control"] == "no-store"
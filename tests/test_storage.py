@@ -0,0 +1,67 @@
+import uuid
+from datetime import datetime
+
+import pytest
+from bson import Binary
+
+from backend.storage import date_filter, from_storage, id_match, legacy_fields, storage_format, to_storage
+
+ENTRY_ID = str(uuid.uuid4())
+PROJECT_ID = str(uuid.uuid4())
+ENTRY = {
+    "id": ENTRY_ID,
+    "project_id": PROJECT_ID,
+    "date": "2024-03-04",
+    "description": "review",
+    "start_time": datetime(2024, 3, 4, 9),
+}
+
+
+@pytest.fixture
+def storage(request):
+    compact_writes, legacy_reads = request.param
+    storage_format.configure(compact_writes, legacy_reads)
+    yield storage_format
+    storage_format.configure(True, True)
+
+
+@pytest.mark.parametrize("storage", [(True, True)], indirect=True)
+def test_compact_round_trip(storage):
+    stored = to_storage(ENTRY)
+
+    assert stored["id"] == Binary.from_uuid(uuid.UUID(ENTRY_ID))
+    assert stored["date"] == datetime(2024, 3, 4)
+    assert stored["description"] == "review"
+    assert from_storage(stored) == ENTRY
+
+
+@pytest.mark.parametrize("storage", [(False, True)], indirect=True)
+def test_legacy_writes_keep_strings(storage):
+    assert to_storage(ENTRY) == ENTRY
+    assert from_storage(to_storage(ENTRY)) == ENTRY
+    # Documents written in either format still match
+    assert id_match(ENTRY_ID) == {"$in": [ENTRY_ID, Binary.from_uuid(uuid.UUID(ENTRY_ID))]}
+
+
+@pytest.mark.parametrize("storage", [(True, False)], indirect=True)
+def test_compact_only_queries(storage):
+    assert id_match(ENTRY_ID) == Binary.from_uuid(uuid.UUID(ENTRY_ID))
+    assert date_filter("date", "2024-03-01", "2024-03-31") == {
+        "date": {"$gte": datetime(2024, 3, 1), "$lte": datetime(2024, 3, 31)}
+    }
+
+
+@pytest.mark.parametrize("storage", [(True, True)], indirect=True)
+def test_legacy_documents_are_migrated_and_read(storage):
+    legacy = dict(ENTRY, _id="object-id")
+
+    converted = legacy_fields(legacy)
+
+    assert set(converted) == {"id", "project_id", "date"}
+    assert from_storage(legacy) == dict(ENTRY, _id="object-id")
+    assert from_storage(dict(legacy, **converted)) == dict(ENTRY, _id="object-id")
+
+
+def test_non_uuid_ids_are_kept():
+    assert to_storage({"id": "not-a-uuid"}) == {"id": "not-a-uuid"}
+    assert id_match("not-a-uuid") == "not-a-uuid"
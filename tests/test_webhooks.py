@@ -0,0 +1,47 @@
+import asyncio
+
+from backend.webhooks import OUTBOX, Dispatcher
+
+ENDPOINT = {"name": "accounting", "url": "https://example.test/hook", "secret": "s", "max_concurrency": 1}
+
+
+class Outbox:
+    def __init__(self):
+        self.updates = []
+
+    async def update_one(self, query, update):
+        self.updates.append(update)
+
+
+class Broken:
+    async def post(self, url, **kwargs):
+        raise ValueError("unexpected")
+
+
+def deliver(attempts, max_attempts=3):
+    outbox = Outbox()
+    dispatcher = Dispatcher({OUTBOX: outbox}, None, max_attempts=max_attempts, http_client=Broken())
+    dispatcher._active[ENDPOINT["name"]] = 1
+    doc = {"_id": "d", "attempts": attempts, "event_id": "e", "type": "invoice.paid", "body": "{}"}
+    asyncio.run(dispatcher._deliver(ENDPOINT, doc))
+    assert dispatcher._active[ENDPOINT["name"]] == 0
+    return outbox.updates[0]["$set"]
+
+
+def test_unexpected_errors_are_recorded_as_failed_attempts():
+    update = deliver(attempts=1)
+
+    assert update["status"] == "pending"
+    assert update["attempts"] == 1
+    assert update["last_error"] == "ValueError: unexpected"
+
+
+def test_last_attempt_fails_for_good():
+    assert deliver(attempts=3)["status"] == "failed"
+
+
+def test_claims_that_never_finished_use_up_the_attempts():
+    update = deliver(attempts=4)
+
+    assert update["status"] == "failed"
+    assert update["last_error"] == "Delivery interrupted"